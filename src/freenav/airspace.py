@@ -0,0 +1,239 @@
+"""This module provides compiled airspace boundaries for the freenav program"""
+
+import array
+import math
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+M_2PI = 2 * math.pi
+
+# Minimum number of segments used to tessellate a full circle
+MIN_CIRCLE_SEGMENTS = 16
+
+# Tessellation tolerance, in metres, of arcs in polygons used for point and
+# proximity queries. Fixed so results don't depend on the display scale
+ARC_TOLERANCE = 5
+
+def tessellate_arc(x, y, radius, start, length, tolerance):
+    """Return list of points along an arc. The chords deviate from the arc by
+       no more than tolerance"""
+    max_step = M_2PI / MIN_CIRCLE_SEGMENTS
+    if tolerance < radius:
+        step = min(2 * math.acos(1 - float(tolerance) / radius), max_step)
+    else:
+        step = max_step
+
+    num = max(1, int(math.ceil(abs(length) / step)))
+    points = []
+    for n in range(num + 1):
+        ang = start + length * n / num
+        points.append((x + radius * math.cos(ang), y + radius * math.sin(ang)))
+    return points
+
+class AirspacePolygon:
+    """Airspace boundary compiled to arrays of edges, with bounding box"""
+    def __init__(self, lines, arcs, tolerance):
+        """Class initialisation from airspace line and arc records"""
+        x1 = array.array('d')
+        y1 = array.array('d')
+        x2 = array.array('d')
+        y2 = array.array('d')
+
+        for line in lines:
+            x1.append(line['x1'])
+            y1.append(line['y1'])
+            x2.append(line['x2'])
+            y2.append(line['y2'])
+
+        for arc in arcs:
+            points = tessellate_arc(arc['x'], arc['y'], arc['radius'],
+                                    arc['start'], arc['length'], tolerance)
+            for (xa, ya), (xb, yb) in zip(points, points[1:]):
+                x1.append(xa)
+                y1.append(ya)
+                x2.append(xb)
+                y2.append(yb)
+
+        if x1:
+            self.x_min = min(min(x1), min(x2))
+            self.x_max = max(max(x1), max(x2))
+            self.y_min = min(min(y1), min(y2))
+            self.y_max = max(max(y1), max(y2))
+        else:
+            self.x_min = self.y_min = 0
+            self.x_max = self.y_max = -1
+
+        if numpy:
+            x1, y1, x2, y2 = [numpy.array(a, dtype=float)
+                              for a in (x1, y1, x2, y2)]
+        self.x1, self.y1, self.x2, self.y2 = x1, y1, x2, y2
+
+    def in_bbox(self, x, y):
+        """Return True if point is inside the bounding box"""
+        return (self.x_min <= x <= self.x_max and
+                self.y_min <= y <= self.y_max)
+
+    def contains(self, x, y):
+        """Return True if point is inside the boundary.
+
+           Works by counting the number of times a line to the left of the
+           position crosses the boundary. If it's odd then point is inside."""
+        if not self.in_bbox(x, y):
+            return False
+
+        if numpy:
+            y1, y2 = self.y1, self.y2
+            cross = (y1 < y) != (y2 < y)
+            x1, y1 = self.x1[cross], y1[cross]
+            x2, y2 = self.x2[cross], y2[cross]
+            xc = x1 + (y - y1) / (y2 - y1) * (x2 - x1)
+            return bool(numpy.count_nonzero(xc < x) % 2)
+
+        odd_node = False
+        for x1, y1, x2, y2 in zip(self.x1, self.y1, self.x2, self.y2):
+            if (y1 < y) != (y2 < y):
+                if (x1 + (y - y1) / (y2 - y1) * (x2 - x1)) < x:
+                    odd_node = not odd_node
+        return odd_node
+
+    def bbox_distance(self, x, y):
+        """Return distance from point to the bounding box, zero if inside"""
+        dx = max(self.x_min - x, 0, x - self.x_max)
+        dy = max(self.y_min - y, 0, y - self.y_max)
+        return math.hypot(dx, dy)
+
+    def boundary_distance(self, x, y):
+        """Return distance from point to the nearest boundary edge"""
+        dist2 = None
+        for x1, y1, x2, y2 in zip(self.x1, self.y1, self.x2, self.y2):
+            dx = x2 - x1
+            dy = y2 - y1
+            len2 = dx * dx + dy * dy
+            if len2 == 0:
+                t = 0
+            else:
+                t = min(max(((x - x1) * dx + (y - y1) * dy) / len2, 0), 1)
+
+            ex = x1 + t * dx - x
+            ey = y1 + t * dy - y
+            e2 = ex * ex + ey * ey
+            if dist2 is None or e2 < dist2:
+                dist2 = e2
+
+        if dist2 is None:
+            return float('inf')
+        return math.sqrt(dist2)
+
+    def intersect(self, xa, ya, xb, yb):
+        """Return fraction along line a-b of its first crossing of the
+           boundary, or None if it doesn't cross"""
+        dx = xb - xa
+        dy = yb - ya
+
+        first = None
+        for x1, y1, x2, y2 in zip(self.x1, self.y1, self.x2, self.y2):
+            ex = x2 - x1
+            ey = y2 - y1
+            denom = dx * ey - dy * ex
+            if denom == 0:
+                # Parallel
+                continue
+
+            t = ((x1 - xa) * ey - (y1 - ya) * ex) / denom
+            u = ((x1 - xa) * dy - (y1 - ya) * dx) / denom
+            if 0 <= t <= 1 and 0 <= u <= 1:
+                if first is None or t < first:
+                    first = t
+
+        return first
+
+def simplify(points, tolerance):
+    """Simplify polyline using the Douglas-Peucker algorithm. Points closer
+       than tolerance to the simplified line are removed"""
+    num = len(points)
+    if num < 3:
+        return list(points)
+
+    keep = [False] * num
+    keep[0] = keep[-1] = True
+    tolerance2 = tolerance * tolerance
+
+    stack = [(0, num - 1)]
+    while stack:
+        first, last = stack.pop()
+        x1, y1 = points[first]
+        x2, y2 = points[last]
+        dx = x2 - x1
+        dy = y2 - y1
+        len2 = dx * dx + dy * dy
+
+        # Find point furthest from the line between first and last
+        max_dist2 = 0
+        index = None
+        for n in range(first + 1, last):
+            x, y = points[n]
+            if len2 == 0:
+                dist2 = (x - x1) ** 2 + (y - y1) ** 2
+            else:
+                cross = dx * (y - y1) - dy * (x - x1)
+                dist2 = cross * cross / len2
+
+            if dist2 > max_dist2:
+                max_dist2 = dist2
+                index = n
+
+        if index is not None and max_dist2 > tolerance2:
+            keep[index] = True
+            stack.append((first, index))
+            stack.append((index, last))
+
+    return [p for p, k in zip(points, keep) if k]
+
+def boundary_paths(lines, arcs, tolerance):
+    """Return airspace boundary as a list of simplified polylines. Lines and
+       tessellated arcs are joined end to end, in either direction"""
+    pieces = [[(line['x1'], line['y1']), (line['x2'], line['y2'])]
+              for line in lines]
+    for arc in arcs:
+        pieces.append(tessellate_arc(arc['x'], arc['y'], arc['radius'],
+                                     arc['start'], arc['length'], tolerance))
+
+    # Index of pieces by (rounded) end points
+    ends = {}
+    for n, piece in enumerate(pieces):
+        for point in (piece[0], piece[-1]):
+            ends.setdefault(round_point(point), []).append(n)
+
+    paths = []
+    used = [False] * len(pieces)
+    for n, piece in enumerate(pieces):
+        if used[n]:
+            continue
+
+        used[n] = True
+        path = list(piece)
+        while True:
+            # Find an unused piece joining the end of the path
+            end = round_point(path[-1])
+            for m in ends[end]:
+                if not used[m]:
+                    break
+            else:
+                break
+
+            used[m] = True
+            if round_point(pieces[m][0]) == end:
+                path.extend(pieces[m][1:])
+            else:
+                path.extend(pieces[m][-2::-1])
+
+        paths.append(simplify(path, tolerance))
+
+    return paths
+
+def round_point(point):
+    """Round point to nearest metre, for matching end points"""
+    return int(round(point[0])), int(round(point[1]))
@@ -0,0 +1,146 @@
+"""This module provides airspace proximity and penetration warnings for the
+freenav program"""
+
+import math
+
+import airspace
+import nmeaparser
+
+# Time to project position forward along the track, in seconds
+LOOKAHEAD_TIME = 120
+
+# Airspace is fetched from the database within this distance of the
+# position, and re-fetched after moving more than REFRESH_DIST
+SEARCH_RADIUS = 30000
+REFRESH_DIST = 10000
+
+# Vertical buffer added to airspace base and top, in metres
+VERTICAL_MARGIN = 100
+
+def parse_level(level_str):
+    """Convert airspace level string (as stored by import_air) to a level in
+       metres and a datum, one of 'FL', 'ALT' or 'AGL'"""
+    if level_str == 'SFC':
+        return 0, 'AGL'
+    elif level_str.startswith('FL'):
+        return int(level_str[2:]) * 100 * nmeaparser.FT_TO_M, 'FL'
+    elif level_str.endswith('AGL'):
+        return int(level_str[:-3]) * nmeaparser.FT_TO_M, 'AGL'
+    else:
+        return int(level_str[:-3]) * nmeaparser.FT_TO_M, 'ALT'
+
+class AirspaceWarning:
+    """Warn of airspace ahead on the current track, or already entered"""
+    def __init__(self, db):
+        """Class initialisation"""
+        self.db = db
+
+        # Nearby airspace, keyed by id
+        self.candidates = {}
+        self.refresh_x = None
+        self.refresh_y = None
+
+        # Current warnings and the ids they were raised for
+        self.warnings = []
+        self.warning_ids = set()
+
+    def refresh(self, x, y):
+        """Fetch airspace around the given position, keeping the state of
+           airspace already held"""
+        records = self.db.get_area_airspace(x, y, 2 * SEARCH_RADIUS,
+                                            2 * SEARCH_RADIUS)
+        new_ids = [rec['id'] for rec in records
+                   if rec['id'] not in self.candidates]
+        lines, arcs = self.db.get_airspace_geometry(new_ids)
+
+        candidates = {}
+        for rec in records:
+            as_id = rec['id']
+            cand = self.candidates.get(as_id)
+            if cand is None:
+                polygon = airspace.AirspacePolygon(lines[as_id], arcs[as_id],
+                                                   airspace.ARC_TOLERANCE)
+                cand = {'airspace': rec,
+                        'polygon': polygon,
+                        'base': parse_level(rec['base']),
+                        'top': parse_level(rec['top']),
+                        'x': None, 'y': None, 'dist': 0,
+                        'inside': False, 'time': None}
+            candidates[as_id] = cand
+
+        self.candidates = candidates
+        self.refresh_x, self.refresh_y = x, y
+
+    def update(self, x, y, track, ground_speed, levels):
+        """Update warnings for a new position. levels is a dictionary of
+           current level (in metres) for each of the 'FL', 'ALT' and 'AGL'
+           datums. Returns True if there is a new warning"""
+        if (self.refresh_x is None or
+            math.hypot(x - self.refresh_x, y - self.refresh_y) > REFRESH_DIST):
+            self.refresh(x, y)
+
+        lookahead = ground_speed * LOOKAHEAD_TIME
+        xa = x + lookahead * math.sin(track)
+        ya = y + lookahead * math.cos(track)
+
+        warnings = []
+        for cand in self.candidates.itervalues():
+            base, base_datum = cand['base']
+            top, top_datum = cand['top']
+            if (levels[base_datum] < base - VERTICAL_MARGIN or
+                levels[top_datum] > top + VERTICAL_MARGIN):
+                continue
+
+            # Re-test only if the boundary could have been reached since the
+            # last test
+            if cand['x'] is not None:
+                moved = math.hypot(x - cand['x'], y - cand['y'])
+                retest = (moved + lookahead) >= cand['dist']
+            else:
+                retest = True
+
+            if retest:
+                self.test(cand, x, y, xa, ya, lookahead, ground_speed)
+
+            if cand['inside'] or cand['time'] is not None:
+                rec = cand['airspace']
+                warnings.append({'id': rec['id'], 'name': rec['name'],
+                                 'base': rec['base'], 'top': rec['top'],
+                                 'inside': cand['inside'],
+                                 'time': cand['time']})
+
+        # Airspace already entered first, then soonest to be entered
+        warnings.sort(key=lambda w: (not w['inside'], w['time']))
+        self.warnings = warnings
+
+        warning_ids = set([w['id'] for w in warnings])
+        new_warning = bool(warning_ids - self.warning_ids)
+        self.warning_ids = warning_ids
+
+        return new_warning
+
+    def test(self, cand, x, y, xa, ya, lookahead, ground_speed):
+        """Test airspace for entry and time to entry along the track"""
+        polygon = cand['polygon']
+        cand['x'], cand['y'] = x, y
+
+        # Distance to bounding box is a lower bound for the distance to the
+        # boundary, and is good enough if the boundary is out of reach
+        dist = polygon.bbox_distance(x, y)
+        if dist > lookahead:
+            cand['dist'] = dist
+            cand['inside'] = False
+            cand['time'] = None
+            return
+
+        cand['dist'] = polygon.boundary_distance(x, y)
+        cand['inside'] = polygon.contains(x, y)
+        cand['time'] = None
+        if not cand['inside'] and ground_speed > 0:
+            t = polygon.intersect(x, y, xa, ya)
+            if t is not None:
+                cand['time'] = t * lookahead / ground_speed
+
+    def get_warnings(self):
+        """Return list of current warnings"""
+        return self.warnings
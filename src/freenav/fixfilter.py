@@ -0,0 +1,93 @@
+"""This module provides the GPS fix front end for the freenav flight model.
+
+Fixes are passed to the flight model at full rate for the thermal and ground
+speed calculations, and at a reduced rate for the task, glide and display
+updates. Recent fixes are kept to interpolate positions for display."""
+
+import bisect
+import collections
+import time
+
+# Default interval between decimated flight model updates, in seconds
+UPDATE_INTERVAL = 1.0
+
+# Allowance for jitter in fix times, in seconds
+TIME_TOLERANCE = 0.05
+
+# Number of recent fixes kept for interpolation
+HISTORY_LEN = 20
+
+# Maximum time to extrapolate beyond the latest fix, in seconds
+MAX_EXTRAPOLATE_TIME = 2.0
+
+class FixFilter:
+    """Split GPS fixes into full rate and decimated flight model updates"""
+    def __init__(self, flight, interval=UPDATE_INTERVAL, clock=time.time):
+        """Class initialisation"""
+        self.flight = flight
+        self.interval = interval
+        self.clock = clock
+
+        self.update_time = None
+
+        # Difference between fix time and clock at the latest fix
+        self.clock_offset = 0
+
+        # Recent fix times and projected positions
+        self.times = collections.deque()
+        self.positions = collections.deque()
+
+    def update(self, utc_secs, latitude, longitude, altitude, ground_speed,
+               track, num_satellites, fix_quality):
+        """Process a new fix. Returns True if the decimated flight update
+           was made"""
+        x, y = self.flight.update_fix(utc_secs, latitude, longitude, altitude,
+                                      ground_speed)
+
+        if self.times and utc_secs < self.times[-1]:
+            # Time has gone backwards, start again
+            self.times.clear()
+            self.positions.clear()
+            self.update_time = None
+
+        self.clock_offset = utc_secs - self.clock()
+        self.times.append(utc_secs)
+        self.positions.append((x, y))
+        if len(self.times) > HISTORY_LEN:
+            self.times.popleft()
+            self.positions.popleft()
+
+        if (self.update_time is None or
+            (utc_secs - self.update_time) >= (self.interval - TIME_TOLERANCE)):
+            self.update_time = utc_secs
+            self.flight.update_position(utc_secs, latitude, longitude,
+                                        altitude, ground_speed, track,
+                                        num_satellites, fix_quality, (x, y))
+            return True
+        else:
+            return False
+
+    def get_position(self, utc_secs):
+        """Return position at given time, interpolated between recent fixes
+           or extrapolated (for a limited time) from the latest two"""
+        if not self.times:
+            return None
+        elif len(self.times) == 1:
+            return self.positions[0]
+
+        times = list(self.times)
+        utc_secs = min(max(utc_secs, times[0]),
+                       times[-1] + MAX_EXTRAPOLATE_TIME)
+        n = min(max(bisect.bisect_right(times, utc_secs), 1), len(times) - 1)
+
+        t1, t2 = times[n - 1], times[n]
+        (x1, y1), (x2, y2) = self.positions[n - 1], self.positions[n]
+        if t2 == t1:
+            return x2, y2
+
+        frac = (utc_secs - t1) / float(t2 - t1)
+        return x1 + frac * (x2 - x1), y1 + frac * (y2 - y1)
+
+    def get_display_position(self):
+        """Return position now, for display between flight model updates"""
+        return self.get_position(self.clock() + self.clock_offset)
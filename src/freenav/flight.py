@@ -5,15 +5,33 @@ import datetime
 
 import altimetry
 import flight_sm
+import flightstore
 import freelog
 import projection
 import task
 import thermal
+import wind
 
 KTS_TO_MPS = 1852.0 / 3600
 
 INIT_COUNT = 5
-GROUND_SPEED_DEQUE_LEN = 10
+
+# Period over which ground speed is averaged, in seconds
+GROUND_SPEED_TIME = 10
+
+# States in which thermal and wind calculations are made
+THERMAL_STATES = set(['Air', 'Launch', 'Start', 'Sector', 'Line', 'Resume',
+                      'Task', 'Divert'])
+
+# Minimum interval between task wind updates, in seconds
+TASK_WIND_INTERVAL = 10
+
+# Air speed is ignored if older than this, in seconds
+AIR_SPEED_TIMEOUT = 5
+
+# Wind calculations. drift is from the drift over whole thermal circles,
+# circle is from a circle fit to ground velocities
+WIND_ENGINES = ('drift', 'circle')
 
 SHORT_NAMES = {'Init':   'Init',
                'Ground': 'Grnd',
@@ -58,11 +76,24 @@ class Flight:
         self.pressure_alt = altimetry.PressureAltimetry()
         self.thermal = thermal.ThermalCalculator()
 
+        # Wind calculation, defaults to thermal drift
+        self.wind = self.thermal
+
+        # Straight flight wind, from air speed
+        self.air_wind = wind.AirSpeedWind()
+        self.air_speed = 0
+        self.air_speed_time = None
+
+        # Time of last task wind update and flag for a pending update
+        self.task_wind_time = None
+        self.task_wind_pending = False
+
         # Get projection from database
         lambert = self.db.get_projection()
         self.projection = projection.Lambert(
                 lambert['parallel1'], lambert['parallel2'],
                 lambert['latitude'], lambert['longitude'])
+        self.projection.set_reverse_cache()
 
         # Position, etc
         self.x = 0
@@ -77,9 +108,16 @@ class Flight:
 
         self.ground_speed_deque = collections.deque()
 
+        # Set when full rate fixes are supplied via update_fix
+        self.full_rate_flag = False
+        self.new_wind_flag = False
+
         # Track log
         self.track_log = freelog.FreeLog()
 
+        # Whole flight store
+        self.flight_store = flightstore.FlightStore()
+
         # List of model observers
         self.subscriber_list = set()
 
@@ -93,14 +131,42 @@ class Flight:
         """Add a subscriber"""
         self.subscriber_list.add(subscriber)
 
+    def set_wind_engine(self, engine):
+        """Select wind calculation, one of WIND_ENGINES"""
+        if engine == 'circle':
+            self.wind = wind.CircleFitWind()
+        elif engine == 'drift':
+            self.wind = self.thermal
+        else:
+            raise ValueError("Unknown wind engine %s" % engine)
+
     #------------------------------------------------------------------------
     # Flight change methods
 
+    def update_fix(self, utc_secs, latitude, longitude, altitude,
+                   ground_speed):
+        """Update model with full rate position data. Updates ground speed
+           average and thermal calculations. Returns projected position"""
+        self.full_rate_flag = True
+
+        x, y = self.projection.forward(latitude, longitude)
+        self.update_ground_speed(utc_secs, ground_speed)
+
+        if self.get_state() in THERMAL_STATES:
+            if self.update_wind(x, y, altitude, utc_secs):
+                self.new_wind_flag = True
+
+        return x, y
+
     def update_position(self, utc_secs, latitude, longitude, altitude,
-                        ground_speed, track, num_satellites, fix_quality):
-        "Update model with new position data"""
+                        ground_speed, track, num_satellites, fix_quality,
+                        xy=None):
+        """Update model with new position data. xy is the projected
+           position, if already calculated by update_fix"""
         self.utc_secs = utc_secs
-        x, y = [int(p) for p in self.projection.forward(latitude, longitude)]
+        if xy is None:
+            xy = self.projection.forward(latitude, longitude)
+        x, y = [int(p) for p in xy]
         self.x, self.y = x, y
         self.altitude = altitude
         self.track = track
@@ -108,17 +174,74 @@ class Flight:
         self.num_satellites = num_satellites
         self.fix_quality = fix_quality
 
-        self.ground_speed_deque.append(ground_speed)
-        if len(self.ground_speed_deque) > GROUND_SPEED_DEQUE_LEN:
-            self.ground_speed_deque.popleft()
-        self.average_ground_speed = (sum(self.ground_speed_deque) / 
-                                     float(len(self.ground_speed_deque)))
+        if not self.full_rate_flag:
+            self.update_ground_speed(utc_secs, ground_speed)
 
         # Update track log
         self.track_log.update(x, y, utc_secs)
+        self.flight_store.append(utc_secs, x, y, altitude,
+                                 self.pressure_alt.pressure_level,
+                                 ground_speed, track)
 
         self._fsm.new_position()
 
+    def update_ground_speed(self, utc_secs, ground_speed):
+        """Update average ground speed"""
+        if (self.ground_speed_deque and
+            utc_secs < self.ground_speed_deque[-1][0]):
+            # Time has gone backwards, start again
+            self.ground_speed_deque.clear()
+
+        self.ground_speed_deque.append((utc_secs, ground_speed))
+        while (utc_secs - self.ground_speed_deque[0][0]) >= GROUND_SPEED_TIME:
+            self.ground_speed_deque.popleft()
+
+        self.average_ground_speed = (sum([s for _t, s in
+                                          self.ground_speed_deque]) /
+                                     float(len(self.ground_speed_deque)))
+
+    def update_thermal(self):
+        """Update thermal calculation, unless already updated at full rate,
+           and set task wind if there's a new value"""
+        if self.full_rate_flag:
+            new_wind = self.new_wind_flag
+            self.new_wind_flag = False
+        else:
+            new_wind = self.update_wind(self.x, self.y, self.altitude,
+                                        self.utc_secs)
+
+        if new_wind:
+            # Restart straight flight wind from the circling wind
+            self.air_wind.set_wind(self.wind.wind_speed,
+                                   self.wind.wind_direction)
+        elif (self.air_speed_time is not None and
+              (self.utc_secs - self.air_speed_time) <= AIR_SPEED_TIMEOUT):
+            new_wind = self.air_wind.update(self.utc_secs, self.ground_speed,
+                                            self.track, self.air_speed)
+
+        # Limit the rate of task (glide) recalculations
+        if new_wind:
+            self.task_wind_pending = True
+        if self.task_wind_pending and (
+                self.task_wind_time is None or
+                (self.utc_secs - self.task_wind_time) >= TASK_WIND_INTERVAL):
+            self.task.set_wind(self.get_wind())
+            self.task_wind_time = self.utc_secs
+            self.task_wind_pending = False
+
+    def update_wind(self, x, y, altitude, utc_secs):
+        """Update thermal and wind calculations. Return True if there's a
+           new wind value"""
+        new_wind = self.thermal.update(x, y, altitude, utc_secs)
+        if self.wind is not self.thermal:
+            new_wind = self.wind.update(x, y, altitude, utc_secs)
+        return new_wind
+
+    def update_air_speed(self, air_speed):
+        """Update model with new true air speed"""
+        self.air_speed = air_speed
+        self.air_speed_time = self.utc_secs
+
     def update_maccready(self, maccready):
         """Update model with new Maccready parameters"""
         self.task.set_maccready(maccready)
@@ -172,11 +295,29 @@ class Flight:
         return {'speed': self.ground_speed, 'track': self.track}
 
     def get_wind(self):
-        """Return wind speed and direction"""
-        speed = self.thermal.wind_speed
-        dirn = self.thermal.wind_direction
+        """Return wind speed and direction. The straight flight wind
+           starts from each new circling wind, so is the latest value"""
+        speed = self.air_wind.wind_speed
+        dirn = self.air_wind.wind_direction
         return {'speed': speed, 'direction': dirn}
 
+    def get_levels(self):
+        """Return flight level, altitude and height, falling back to GPS
+           altitude if pressure levels aren't available"""
+        flight_level = self.pressure_alt.get_flight_level()
+        if flight_level is None:
+            flight_level = self.altitude
+
+        altitude = self.pressure_alt.get_pressure_altitude()
+        if altitude is None:
+            altitude = self.altitude
+
+        height = self.pressure_alt.get_pressure_height()
+        if height is None:
+            height = altitude - (self.pressure_alt.takeoff_altitude or 0)
+
+        return {'FL': flight_level, 'ALT': altitude, 'AGL': height}
+
     def get_state(self):
         """Return flight state"""
         if self._fsm.isInTransition():
@@ -256,8 +397,7 @@ class Flight:
 
     def do_divert_position(self):
         """Update diverted task with new position data"""
-        if self.thermal.update(self.x, self.y, self.altitude, self.utc_secs):
-            self.task.set_wind(self.get_wind())
+        self.update_thermal()
 
         self.task.divert_position(self.x, self.y, self.altitude)
 
@@ -265,8 +405,7 @@ class Flight:
 
     def do_task_position(self):
         """Update task with new position data"""
-        if self.thermal.update(self.x, self.y, self.altitude, self.utc_secs):
-            self.task.set_wind(self.get_wind())
+        self.update_thermal()
 
         is_sector = self.task.task_position(self.x, self.y, self.altitude,
                                             self.utc_secs)
@@ -288,6 +427,7 @@ class Flight:
         self.db.commit()
 
         self.track_log.start()
+        self.flight_store.clear()
         self.notify_subscribers(TAKEOFF_EVT)
 
     def do_launch(self):
@@ -0,0 +1,158 @@
+"""This module provides an in-memory store of the whole flight for the freenav
+program"""
+
+import array
+import bisect
+import math
+
+# Maximum number of fixes held, enough for 10 hours at 1Hz
+MAX_FIXES = 36000
+
+# Size of spatial index buckets, in metres
+BUCKET_SIZE = 5000
+
+# Pressure altitude value used when there is no pressure data
+NO_LEVEL = -99999
+
+class FlightStore:
+    """Append-only columnar store of flight fixes, indexed by time and by
+       position. When the store is full alternate fixes are discarded and
+       the interval between stored fixes is doubled"""
+    def __init__(self, max_fixes=MAX_FIXES, bucket_size=BUCKET_SIZE):
+        """Class initialisation"""
+        self.max_fixes = max_fixes
+        self.bucket_size = bucket_size
+        self.clear()
+
+    def clear(self):
+        """Remove all fixes"""
+        self.times = array.array('d')
+        self.xs = array.array('i')
+        self.ys = array.array('i')
+        self.gps_alts = array.array('i')
+        self.pressure_alts = array.array('i')
+        self.ground_speeds = array.array('f')
+        self.tracks = array.array('f')
+
+        # Lists of fix indices, keyed by bucket
+        self.buckets = {}
+
+        # Minimum interval between stored fixes
+        self.interval = 0
+
+    def __len__(self):
+        return len(self.times)
+
+    def columns(self):
+        """Return list of all the column arrays"""
+        return [self.times, self.xs, self.ys, self.gps_alts,
+                self.pressure_alts, self.ground_speeds, self.tracks]
+
+    def bucket(self, x, y):
+        """Return spatial index bucket for the given position"""
+        return int(x // self.bucket_size), int(y // self.bucket_size)
+
+    def append(self, utc, x, y, gps_alt, pressure_alt, ground_speed, track):
+        """Add a fix. Fixes closer than the current interval to the previous
+           one are ignored, the store is cleared if time goes backwards"""
+        if self.times:
+            if utc < self.times[-1]:
+                # Time has gone backwards, start again
+                self.clear()
+            elif (utc - self.times[-1]) < max(self.interval, 1e-3):
+                return
+
+        if pressure_alt is None:
+            pressure_alt = NO_LEVEL
+
+        n = len(self.times)
+        self.times.append(utc)
+        self.xs.append(int(x))
+        self.ys.append(int(y))
+        self.gps_alts.append(int(gps_alt))
+        self.pressure_alts.append(int(pressure_alt))
+        self.ground_speeds.append(ground_speed)
+        self.tracks.append(track)
+        self.buckets.setdefault(self.bucket(x, y), array.array('i')).append(n)
+
+        if len(self.times) > self.max_fixes:
+            self.decimate()
+
+    def decimate(self):
+        """Discard alternate fixes (keeping the latest) and rebuild the
+           spatial index"""
+        start = (len(self.times) - 1) % 2
+        for col in self.columns():
+            col[:] = col[start::2]
+
+        if len(self.times) > 1:
+            self.interval = max(2 * self.interval,
+                                (self.times[-1] - self.times[0]) /
+                                (len(self.times) - 1))
+
+        self.buckets = {}
+        for n, (x, y) in enumerate(zip(self.xs, self.ys)):
+            self.buckets.setdefault(self.bucket(x, y),
+                                    array.array('i')).append(n)
+
+    def get_fix(self, n):
+        """Return fix record"""
+        pressure_alt = self.pressure_alts[n]
+        if pressure_alt == NO_LEVEL:
+            pressure_alt = None
+
+        return {'utc': self.times[n],
+                'x': self.xs[n], 'y': self.ys[n],
+                'gps_alt': self.gps_alts[n],
+                'pressure_alt': pressure_alt,
+                'ground_speed': self.ground_speeds[n],
+                'track': self.tracks[n]}
+
+    def time_range(self, utc1, utc2):
+        """Return start and stop indices of fixes with utc1 <= time <= utc2"""
+        return (bisect.bisect_left(self.times, utc1),
+                bisect.bisect_right(self.times, utc2))
+
+    def get_fixes(self, utc1, utc2):
+        """Return list of fix records between the given times"""
+        start, stop = self.time_range(utc1, utc2)
+        return [self.get_fix(n) for n in range(start, stop)]
+
+    def query_area(self, x_min, y_min, x_max, y_max, utc1=None, utc2=None):
+        """Return sorted list of indices of fixes inside the given box,
+           optionally limited to a time range"""
+        if utc1 is None:
+            start, stop = 0, len(self.times)
+        else:
+            start, stop = self.time_range(utc1, utc2)
+
+        i1, j1 = self.bucket(x_min, y_min)
+        i2, j2 = self.bucket(x_max, y_max)
+
+        indices = []
+        for i in range(i1, i2 + 1):
+            for j in range(j1, j2 + 1):
+                bucket = self.buckets.get((i, j))
+                if not bucket:
+                    continue
+
+                # Bucket indices are sorted, so bisect for the time range
+                for n in bucket[bisect.bisect_left(bucket, start):
+                                bisect.bisect_left(bucket, stop)]:
+                    if (x_min <= self.xs[n] <= x_max and
+                        y_min <= self.ys[n] <= y_max):
+                        indices.append(n)
+
+        indices.sort()
+        return indices
+
+    def get_path_length(self, start=0, stop=None):
+        """Return length of the track between the given indices"""
+        if stop is None:
+            stop = len(self.times)
+
+        dist = 0
+        for n in range(start + 1, stop):
+            dist += math.hypot(self.xs[n] - self.xs[n - 1],
+                               self.ys[n] - self.ys[n - 1])
+        return dist
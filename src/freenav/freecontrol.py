@@ -14,6 +14,8 @@ try:
 except ImportError:
     IS_HILDON_APP = False
 
+import airwarn
+import fixfilter
 import freeview
 import freenav
 import flight
@@ -82,6 +84,9 @@ class FreeControl:
         self.flarm_display = False
         self.flarm_detections = {}
 
+        # Airspace warnings
+        self.airspace_warning = airwarn.AirspaceWarning(db)
+
         # WP name display control
         self.wp_display = True
         self.view.set_wp_display(self.wp_display)
@@ -96,6 +101,7 @@ class FreeControl:
         self.task_display_type = collections.deque(["start_time",
                                                     "task_speed",
                                                     "task_time",
+                                                    "leg_time",
                                                     "thermal_average"])
         # Get GPS device
         dev_name = config.get('Device-Names', db.get_settings()['gps_device'])
@@ -105,12 +111,30 @@ class FreeControl:
         else:
             baud_rate = None
 
+        # Fix filter, decimates high rate GPS fixes
+        if config.has_option(dev_name, 'Update-Interval'):
+            interval = config.getfloat(dev_name, 'Update-Interval')
+        else:
+            interval = fixfilter.UPDATE_INTERVAL
+        self.fix_filter = fixfilter.FixFilter(self.flight, interval)
+        self.view.set_position_source(self.fix_filter.get_display_position)
+
+        # Wind calculation
+        if config.has_option('Wind', 'Engine'):
+            self.flight.set_wind_engine(config.get('Wind', 'Engine'))
+
+        # Track log duration
+        if config.has_option('Track-Log', 'Duration'):
+            self.flight.track_log.set_duration(
+                config.getint('Track-Log', 'Duration'))
+
         # Open NMEA device and connect signals
         self.nmea_parser = nmeaparser.NmeaParser()
         self.nmea_dev = freenmea.FreeNmea(self.nmea_parser)
         self.nmea_dev.open(dev, baud_rate)
         self.nmea_dev.connect('new-position', self.position_changed)
         self.nmea_dev.connect('new-pressure', self.pressure_level_changed)
+        self.nmea_dev.connect('new-airspeed', self.air_speed_changed)
         self.nmea_dev.connect('flarm-alarm', self.flarm_alarm)
 
         # Handle user interface events
@@ -308,15 +332,22 @@ class FreeControl:
                 del nmea.flarm_traffic[f]
         self.flight.flarm_traffic = nmea.flarm_traffic
 
-        # Update model with new position
-        self.flight.update_position(nmea.time, nmea.latitude, nmea.longitude,
-                                    nmea.gps_altitude, nmea.speed, nmea.track,
-                                    nmea.num_satellites, nmea.fix_quality)
+        # Update model with new position. The display is redrawn for fixes
+        # between flight model updates, with interpolated positions
+        if not self.fix_filter.update(nmea.time, nmea.latitude,
+                                      nmea.longitude, nmea.gps_altitude,
+                                      nmea.speed, nmea.track,
+                                      nmea.num_satellites, nmea.fix_quality):
+            self.view.redraw()
 
     def pressure_level_changed(self, _source, nmea):
         """Callback for new pressure altitude"""
         self.flight.update_pressure_level(nmea.pressure_alt)
 
+    def air_speed_changed(self, _source, nmea):
+        """Callback for new true air speed"""
+        self.flight.update_air_speed(nmea.air_speed)
+
     def flarm_alarm(self, _source, nmea):
         """Callback for FLARM alarm"""
         if self.flarm_mute or nmea.flarm_alarm_type < 2:
@@ -355,6 +386,9 @@ class FreeControl:
             # Enter sector, play sound
             self.sound.play('sector')
 
+        if event == flight.NEW_POSITION_EVT:
+            self.check_airspace()
+
         self.display_task_info()
 
         if event != flight.INIT_POSITION_EVT:
@@ -451,6 +485,16 @@ class FreeControl:
                 ete = min(self.flight.task.task_ete, 35940)
                 tim_str = time.strftime("%H:%M", time.gmtime(ete))
                 info_str = tim_str[1:]
+
+            elif display_type == "leg_time":
+                # Time for the current leg, limited to 9:59
+                legs = self.flight.task.get_ete_legs()
+                if legs:
+                    ete = min(legs[0]['time'], 35940)
+                    tim_str = time.strftime("%H:%M", time.gmtime(ete))
+                    info_str = tim_str[1:]
+                else:
+                    info_str = "-:--"
             else:
                 # Total thermal average
                 info_str = "%.1f" % (self.flight.thermal.thermal_average /
@@ -528,6 +572,21 @@ class FreeControl:
         flarm_radar = not self.view.flarm_radar_flag
         self.view.set_flarm_radar(flarm_radar)
 
+    def check_airspace(self):
+        """Update airspace warnings, play sound on new warning"""
+        if self.flight.get_state() in ('Init', 'Ground'):
+            return
+
+        x, y = self.flight.get_position()
+        velocity = self.flight.get_velocity()
+        new_warning = self.airspace_warning.update(x, y, velocity['track'],
+                                                   velocity['speed'],
+                                                   self.flight.get_levels())
+        if new_warning:
+            self.sound.play('airspace')
+
+        self.view.set_airspace_warnings(self.airspace_warning.get_warnings())
+
     def display_airspace(self, x, y, extra_info):
         """Display airspace info"""
         info = self.view.mapcache.get_airspace_info(x, y)
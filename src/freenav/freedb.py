@@ -8,8 +8,13 @@ import time
 
 import sqlite3
 
+import spatial
+
 GPS_DEVS = ['Serial-1', 'Serial-2', 'Bluetooth-1', 'Bluetooth-2']
 
+# Maximum number of SQL parameters in a single query
+MAX_SQL_VARS = 500
+
 def dict_factory(cursor, row):
     """Row factory for database"""
     column_dict = {}
@@ -67,22 +72,56 @@ SCHEMA = {
                  ('safety_height', 'INTEGER'),
                  ('gps_device', 'TEXT')]}
 
+# R*Tree index of airspace bounding boxes. The id column is the rowid of the
+# corresponding Airspace record
+AIRSPACE_INDEX_SQL = '''CREATE VIRTUAL TABLE Airspace_Index USING rtree
+                        (id, x_min, x_max, y_min, y_max)'''
+
 class Freedb:
     """Database wrapper class"""
     def __init__(self, db_file=''):
         """Class initialisation"""
         if not db_file:
             db_file = os.path.join(os.getenv('HOME'), '.freeflight', 'free.db')
+        self.db_file = db_file
         self.db = sqlite3.connect(db_file)
         self.db.row_factory = dict_factory
         self.cursor = self.db.cursor()
 
+        # In-memory spatial indices, built on first use
+        self.waypoint_index = None
+        self.landable_index = None
+
+        # Upgrade old databases with an airspace R*Tree index
+        if (self.has_table('Airspace') and
+            not self.has_table('Airspace_Index')):
+            self.create_airspace_index()
+            self.commit()
+
+    def has_table(self, table_name):
+        """Return True if the named table exists"""
+        sql = "SELECT name FROM sqlite_master WHERE type='table' AND name=?"
+        self.cursor.execute(sql, (table_name,))
+        return self.cursor.fetchone() is not None
+
     def create_table(self, table_name, columns):
         """Utility function to create table from SCHEMA information"""
         col_str = ','.join([cname + ' ' + ctype for (cname, ctype) in columns])
         sql = 'CREATE TABLE %s (%s)' % (table_name, col_str)
         self.cursor.execute(sql)
 
+    def create_airspace_index(self):
+        """Create airspace R*Tree index and populate from Airspace table"""
+        self.cursor.execute(AIRSPACE_INDEX_SQL)
+        self.cursor.execute('''INSERT INTO Airspace_Index
+                            (id, x_min, x_max, y_min, y_max)
+                            SELECT rowid, x_min, x_max, y_min, y_max
+                            FROM Airspace''')
+
+        # Single column indices are superseded by the R*Tree
+        for index in ('Xmin_Index', 'Xmax_Index', 'Ymin_Index', 'Ymax_Index'):
+            self.cursor.execute('DROP INDEX IF EXISTS %s' % index)
+
     def commit(self):
         """Commit changes"""
         self.db.commit()
@@ -110,10 +149,7 @@ class Freedb:
 
         self.cursor.execute('CREATE INDEX X_Index ON Waypoints (x)')
         self.cursor.execute('CREATE INDEX Y_Index ON Waypoints (y)')
-        self.cursor.execute('CREATE INDEX Xmin_Index ON Airspace (x_min)')
-        self.cursor.execute('CREATE INDEX Xmax_Index ON Airspace (x_max)')
-        self.cursor.execute('CREATE INDEX Ymin_Index ON Airspace (y_min)')
-        self.cursor.execute('CREATE INDEX Ymax_Index ON Airspace (y_max)')
+        self.create_airspace_index()
         self.cursor.execute('CREATE INDEX Id1 ON Airspace_Lines (airspace_id)')
         self.cursor.execute('CREATE INDEX Id2 ON Airspace_Arcs (airspace_id)')
 
@@ -128,6 +164,7 @@ class Freedb:
     def delete_waypoints(self):
         """Delete all the waypoints"""
         self.cursor.execute('DELETE FROM Waypoints')
+        self.waypoint_index = None
 
     def insert_waypoint(self, name, wp_id, x, y, latitude, longitude, altitude,
                         turnpoint, comment):
@@ -137,6 +174,7 @@ class Freedb:
             VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)'''
         self.cursor.execute(sql, (name, wp_id, x, y, latitude, longitude,
                                   altitude, turnpoint, comment))
+        self.waypoint_index = None
 
     def get_waypoint(self, wp_id):
         """Return waypoint data"""
@@ -152,24 +190,23 @@ class Freedb:
 
     def get_area_waypoint_list(self, x, y, width, height):
         """Return list of waypoints filtered by area"""
-        sql = """SELECT * FROM Waypoints WHERE rowid IN
-                 (SELECT rowid FROM Waypoints Where x > ? INTERSECT
-                  SELECT rowid FROM Waypoints Where x < ? INTERSECT
-                  SELECT rowid FROM Waypoints Where y > ? INTERSECT
-                  SELECT rowid FROM Waypoints Where y < ?)"""
-        self.cursor.execute(sql, (x - width/2, x + width/2,
-                             y - height/2, y + height/2))
-        return self.cursor.fetchall()
+        if self.waypoint_index is None:
+            self.waypoint_index = make_index(self.get_waypoint_list())
+
+        return self.waypoint_index.query(x - width/2, y - height/2,
+                                         x + width/2, y + height/2)
 
     def delete_landables(self):
         """Delete all the landing fields"""
         self.cursor.execute('DELETE FROM Landables')
+        self.landable_index = None
 
     def insert_landable(self, name, wp_id, x, y, altitude):
         """Add a new landing field"""
         sql = '''INSERT INTO Landables (name, id, x, y, altitude)
               VALUES (?, ?, ?, ?, ?)'''
         self.cursor.execute(sql, (name, wp_id, x, y, altitude))
+        self.landable_index = None
 
     def get_landable_list(self):
         """Return a list of all landing fields"""
@@ -180,10 +217,8 @@ class Freedb:
     def get_area_airspace(self, x, y, width, height):
         """Return list of airspace filtered by area"""
         sql = '''SELECT * FROM Airspace WHERE rowid IN
-                 (SELECT rowid FROM Airspace WHERE ? < x_max INTERSECT
-                  SELECT rowid FROM Airspace WHERE ? > x_min INTERSECT
-                  SELECT rowid FROM Airspace WHERE ? < y_max INTERSECT
-                  SELECT rowid FROM Airspace WHERE ? > y_min)'''
+                 (SELECT id FROM Airspace_Index
+                  WHERE ? < x_max AND ? > x_min AND ? < y_max AND ? > y_min)'''
         self.cursor.execute(sql, (x - width/2, x + width/2,
                              y - height/2, y + height/2))
         return self.cursor.fetchall()
@@ -200,6 +235,29 @@ class Freedb:
         self.cursor.execute(sql, (wp_id,))
         return self.cursor.fetchall()
 
+    def get_airspace_geometry(self, as_ids):
+        """Return dictionaries of boundary lines and arcs, keyed by airspace
+           id, for all the given airspace ids"""
+        lines = dict((as_id, []) for as_id in as_ids)
+        arcs = dict((as_id, []) for as_id in as_ids)
+
+        as_ids = list(as_ids)
+        for n in range(0, len(as_ids), MAX_SQL_VARS):
+            ids = as_ids[n:n + MAX_SQL_VARS]
+            params = ','.join('?' * len(ids))
+
+            sql = 'SELECT * FROM Airspace_Lines WHERE airspace_id IN (%s)'
+            self.cursor.execute(sql % params, ids)
+            for line in self.cursor.fetchall():
+                lines[line['airspace_id']].append(line)
+
+            sql = 'SELECT * FROM Airspace_Arcs WHERE airspace_id IN (%s)'
+            self.cursor.execute(sql % params, ids)
+            for arc in self.cursor.fetchall():
+                arcs[arc['airspace_id']].append(arc)
+
+        return lines, arcs
+
     def set_task(self, task, task_id=0):
         """Delete old task data and add new"""
         sql = 'DELETE FROM Turnpoints WHERE task_id=?'
@@ -243,6 +301,7 @@ class Freedb:
     def delete_airspace(self):
         """Delete all airspace data"""
         self.cursor.execute('DELETE FROM Airspace')
+        self.cursor.execute('DELETE FROM Airspace_Index')
         self.cursor.execute('DELETE FROM Airspace_Lines')
         self.cursor.execute('DELETE FROM Airspace_Arcs')
 
@@ -254,6 +313,11 @@ class Freedb:
         self.cursor.execute(sql, (as_id, name, base, top,
                                   int(xmin), int(ymin), int(xmax), int(ymax)))
 
+        sql = '''INSERT INTO Airspace_Index (id, x_min, x_max, y_min, y_max)
+              VALUES (?, ?, ?, ?, ?)'''
+        self.cursor.execute(sql, (self.cursor.lastrowid,
+                                  int(xmin), int(xmax), int(ymin), int(ymax)))
+
     def insert_airspace_line(self, as_id, x1, y1, x2, y2):
         """Insert an airspace line segment"""
         sql = '''INSERT INTO Airspace_Lines (airspace_id, x1, y1, x2, y2)
@@ -318,22 +382,16 @@ class Freedb:
         sql = "UPDATE Settings SET safety_height=?"
         self.cursor.execute(sql, (safety_height,))
 
-    def get_nearest_landables(self, xpos, ypos):
-        """Get list of landing fields sorted by distance"""
-        sql = 'SELECT * FROM Landables'
-        self.cursor.execute(sql)
-        wps = self.cursor.fetchall()
-
-        def dist_cmp(arg1, arg2):
-            """Compare function for sort"""
-            res = (((arg1['x'] - xpos)**2 + (arg1['y'] - ypos)**2) -
-                   ((arg2['x'] - xpos)**2 + (arg2['y'] - ypos)**2))
-            if res > 0:
-                return 1
-            elif res < 0:
-                return -1
-            else:
-                return 0
-
-        wps.sort(dist_cmp)
-        return wps
+    def get_nearest_landables(self, xpos, ypos, num=1):
+        """Get list of the nearest landing fields sorted by distance"""
+        if self.landable_index is None:
+            self.landable_index = make_index(self.get_landable_list())
+
+        return self.landable_index.nearest(xpos, ypos, num)
+
+def make_index(wps):
+    """Return a spatial index of the given waypoint records"""
+    index = spatial.GridIndex()
+    for wp in wps:
+        index.insert(wp['x'], wp['y'], wp)
+    return index
@@ -1,15 +1,69 @@
-from collections import deque
+"""This module provides the track log for the freenav program"""
 
-class FreeLog(deque):
-    """Class to store a log of recent x/y fixes"""
-    def __init__(self, max_duration=600):
-        deque.__init__(self)
-        self.max_duration = max_duration
+import array
+
+# Default duration of the log, in seconds
+DEFAULT_DURATION = 1800
+
+# Minimum interval between logged fixes, in seconds
+LOG_INTERVAL = 1
+
+class FreeLog:
+    """Class to store a log of recent x/y fixes. Fixes are held in a ring
+       buffer of integer arrays, with a decimated copy for display"""
+    def __init__(self, max_duration=DEFAULT_DURATION):
         self.log_flag = False
+        self.max_duration = max_duration
+        self.capacity = int(max_duration / LOG_INTERVAL) + 1
+        self.reset()
+
+    def set_duration(self, max_duration):
+        """Set log duration, keeping as many of the latest fixes as fit"""
+        fixes = list(self)
+
+        self.max_duration = max_duration
+        self.capacity = int(max_duration / LOG_INTERVAL) + 1
+        self.reset()
+
+        for utc, (x, y) in fixes[-self.capacity:]:
+            self.append(x, y, utc)
+
+    def reset(self):
+        """Empty the log"""
+        # Times are stored relative to the first fix
+        self.utc0 = None
+        self.times = array.array('i', [0]) * self.capacity
+        self.xs = array.array('i', [0]) * self.capacity
+        self.ys = array.array('i', [0]) * self.capacity
+        self.head = 0
+        self.count = 0
+
+        # Decimated copy for display
+        self.display_tolerance = None
+        self.display_times = array.array('i')
+        self.display_xs = array.array('i')
+        self.display_ys = array.array('i')
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, n):
+        """Return (utc, (x, y)) of fix n, oldest first"""
+        if n < 0:
+            n += self.count
+        if not (0 <= n < self.count):
+            raise IndexError("track log index out of range")
+
+        i = (self.head + n) % self.capacity
+        return self.times[i] + self.utc0, (self.xs[i], self.ys[i])
+
+    def __iter__(self):
+        for n in range(self.count):
+            yield self[n]
 
     def start(self):
-        """Start logging, create a new deque"""
-        self.clear()
+        """Start logging, discarding any previous fixes"""
+        self.reset()
         self.log_flag = True
 
     def stop(self):
@@ -19,8 +73,90 @@ class FreeLog(deque):
     def update(self, x, y, utc):
         """Log a single fix"""
         if self.log_flag:
-            self.append((utc, (x, y)))
+            self.append(x, y, utc)
+
+    def append(self, x, y, utc):
+        """Add fix to the ring buffer, dropping the oldest if it is full or
+           has expired"""
+        if self.utc0 is None:
+            self.utc0 = int(utc)
+        tim = int(utc) - self.utc0
+
+        if self.count:
+            last = (self.head + self.count - 1) % self.capacity
+            if (tim - self.times[last]) < LOG_INTERVAL:
+                return
+
+        if self.count == self.capacity:
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+
+        i = (self.head + self.count) % self.capacity
+        self.times[i] = tim
+        self.xs[i] = int(x)
+        self.ys[i] = int(y)
+        self.count += 1
+
+        # Truncate to maximum duration
+        while (tim - self.times[self.head]) > self.max_duration:
+            self.head = (self.head + 1) % self.capacity
+            self.count -= 1
+
+    def get_display_track(self, tolerance):
+        """Return arrays of x and y positions, decimated so that points are
+           at least tolerance apart. The latest fix is always included"""
+        if tolerance != self.display_tolerance:
+            # Start a new decimated copy
+            self.display_tolerance = tolerance
+            self.display_times = array.array('i')
+            self.display_xs = array.array('i')
+            self.display_ys = array.array('i')
+
+        if self.count == 0:
+            return array.array('i'), array.array('i')
+
+        # Drop expired points from the start of the decimated copy
+        oldest = self.times[self.head]
+        num_expired = 0
+        for tim in self.display_times:
+            if tim >= oldest:
+                break
+            num_expired += 1
+        if num_expired:
+            del self.display_times[:num_expired]
+            del self.display_xs[:num_expired]
+            del self.display_ys[:num_expired]
+
+        # Add fixes logged since the last update
+        if self.display_times:
+            last_tim = self.display_times[-1]
+            start = self.count
+            while start > 0:
+                i = (self.head + start - 1) % self.capacity
+                if self.times[i] <= last_tim:
+                    break
+                start -= 1
+        else:
+            start = 0
+
+        tolerance2 = tolerance * tolerance
+        for n in range(start, self.count):
+            i = (self.head + n) % self.capacity
+            x, y = self.xs[i], self.ys[i]
+            if self.display_xs:
+                dx = x - self.display_xs[-1]
+                dy = y - self.display_ys[-1]
+                if (dx * dx + dy * dy) < tolerance2:
+                    continue
+
+            self.display_times.append(self.times[i])
+            self.display_xs.append(x)
+            self.display_ys.append(y)
 
-            # Truncate to maximum length
-            if (self[-1][0] - self[0][0]) > self.max_duration:
-                self.popleft()
+        xs = self.display_xs[:]
+        ys = self.display_ys[:]
+        last = (self.head + self.count - 1) % self.capacity
+        if self.display_times[-1] != self.times[last]:
+            xs.append(self.xs[last])
+            ys.append(self.ys[last])
+        return xs, ys
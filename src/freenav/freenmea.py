@@ -26,6 +26,8 @@ class FreeNmea(gobject.GObject):
                            gobject.TYPE_NONE, [gobject.TYPE_PYOBJECT])
         gobject.signal_new("new-pressure", FreeNmea, gobject.SIGNAL_ACTION,
                            gobject.TYPE_NONE, [gobject.TYPE_PYOBJECT])
+        gobject.signal_new("new-airspeed", FreeNmea, gobject.SIGNAL_ACTION,
+                           gobject.TYPE_NONE, [gobject.TYPE_PYOBJECT])
         gobject.signal_new("flarm-alarm", FreeNmea, gobject.SIGNAL_ACTION,
                            gobject.TYPE_NONE, [gobject.TYPE_PYOBJECT])
         gobject.signal_new("flarm-traffic", FreeNmea, gobject.SIGNAL_ACTION,
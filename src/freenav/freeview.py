@@ -3,6 +3,7 @@
 import math
 import os.path
 
+import cairo
 import gobject
 import gtk
 import gtk.gdk
@@ -18,6 +19,9 @@ except ImportError:
 
 import mapcache
 import nmeaparser
+import prefetch
+import render
+import spatial
 
 # Constants for drawing arcs
 M_2PI = 2 * math.pi
@@ -39,6 +43,15 @@ INFO_BOX_SIZE = 90
 # Size of waypoint symbol
 WP_SIZE = 5
 
+# Maximum number of cached waypoint labels
+MAX_LABEL_CACHE = 500
+
+# Margin (in pixels) around the window of the cached static layers
+LAYER_MARGIN = 100
+
+# Track log simplification tolerance, in pixels
+TRACK_TOLERANCE = 1
+
 # Size of final glide indicator
 FG_WIDTH = 30
 FG_INC = 15
@@ -166,8 +179,24 @@ class FreeView(APP_BASE):
         self.viewy = 0
         self.view_scale = DEFAULT_SCALE
 
-        # Cache of displayed waypoints and airspace
+        # Cache of displayed waypoints and airspace, loaded in the background
         self.mapcache = mapcache.MapCache(flight)
+        self.prefetcher = prefetch.TilePrefetcher(self.mapcache,
+                                                  flight.db.db_file,
+                                                  self.redraw)
+        self.mapcache.loader = self.prefetcher
+
+        # Redraw scheduling, the view position is updated at the start of
+        # each frame
+        self.render = render.RenderScheduler(self.queue_draw)
+        self.render.add_frame_func(self.frame_position)
+        self.position_source = None
+
+        # Cached surface with airspace, waypoints and task
+        self.static_layer = None
+
+        # Cached waypoint label surfaces, keyed by waypoint id
+        self.label_cache = {}
 
         # Display element states
         self.divert_flag = False
@@ -177,6 +206,7 @@ class FreeView(APP_BASE):
         self.flarm_radar_flag = False
         self.matrix_flag = False
         self.wp_display_flag = True
+        self.airspace_warnings = []
 
         # Pixmaps
         self.glider_pixbuf = find_pixbuf("free_glider.png")
@@ -296,8 +326,17 @@ class FreeView(APP_BASE):
 
     def area_expose(self, area, _event):
         """Repaint the display"""
+        self.render.begin()
+        self.draw_layers(area)
+        self.render.end()
+
+        return True
+
+    def draw_layers(self, area):
+        """Draw each layer of the display"""
         win = area.window
         win_width, win_height = win.get_size()
+        draw = self.render.draw
 
         # Start with a clean white sheet...
         cr = win.cairo_create()
@@ -308,48 +347,102 @@ class FreeView(APP_BASE):
 
         if self.matrix_flag:
             # Input button matrix
-            self.draw_matrix(cr, win_width, win_height)
-            return True
+            draw('matrix', self.draw_matrix, cr, win_width, win_height)
+            return
 
         if self.flarm_radar_flag:
-            self.draw_flarm_radar(cr, win_width, win_height)
+            draw('flarm_radar', self.draw_flarm_radar, cr, win_width,
+                 win_height)
         else:
-            # Airspace
-            self.draw_airspace(cr, win_width, win_height)
-
-            # Waypoints
-            self.draw_waypoints(cr)
+            # Airspace, waypoints and task
+            self.draw_static_layers(cr, win_width, win_height)
 
             # Stop drawing if info mode is set
             if self.info_flag:
-                return True
+                return
 
             # Draw track log
             if self.track_log:
-                self.draw_track_log(cr, win_width, win_height)
-
-            # Task and turnpoint sectors
-            self.draw_task(cr, win_width, win_height)
+                draw('track_log', self.draw_track_log, cr, win_width,
+                     win_height)
 
             # Heading symbol
-            self.draw_heading(cr, win_height, win_width)
+            draw('heading', self.draw_heading, cr, win_height, win_width)
 
             # Number of satellites
-            self.draw_satellites(cr, win_width, win_height)
+            draw('satellites', self.draw_satellites, cr, win_width,
+                 win_height)
 
         # Final glide indicator
-        self.draw_glide(cr, win_height)
+        draw('glide', self.draw_glide, cr, win_height)
 
         # Next turnpoint annotation and navigation
-        self.draw_nav(cr, win_height)
+        draw('nav', self.draw_nav, cr, win_height)
 
         # Wind arrow
-        self.draw_wind(cr, win_width, win_height)
+        draw('wind', self.draw_wind, cr, win_width, win_height)
 
         # Mute indicator
-        self.draw_mute(cr, win_width)
+        draw('mute', self.draw_mute, cr, win_width)
 
-        return True
+        # Airspace warning
+        draw('airspace_warning', self.draw_airspace_warning, cr, win_width)
+
+    def static_layer_key(self, win_width, win_height):
+        """Return values which, if changed, invalidate the static layers"""
+        divert_state = self.flight.get_state() == 'Divert'
+        if divert_state:
+            divert_id = self.flight.task.divert_wp['id']
+        else:
+            divert_id = None
+
+        return (self.view_scale, win_width, win_height, self.mapcache.version,
+                self.divert_flag, self.wp_display_flag, self.info_flag,
+                divert_state, divert_id)
+
+    def draw_static_layers(self, cr, win_width, win_height):
+        """Draw airspace, waypoints and task from a cached surface. The
+           surface is re-drawn if its contents have changed or the view has
+           moved beyond its margin"""
+        key = self.static_layer_key(win_width, win_height)
+
+        layer = self.static_layer
+        if layer and layer['key'] == key:
+            dx = int(round(float(layer['x'] - self.viewx) / self.view_scale))
+            dy = int(round(float(self.viewy - layer['y']) / self.view_scale))
+            if abs(dx) > LAYER_MARGIN or abs(dy) > LAYER_MARGIN:
+                layer = None
+        else:
+            layer = None
+
+        if layer is None:
+            layer = self.make_static_layer(cr, key, win_width, win_height)
+            self.static_layer = layer
+            dx = dy = 0
+
+        cr.set_source_surface(layer['surface'], dx - LAYER_MARGIN,
+                              dy - LAYER_MARGIN)
+        cr.paint()
+        cr.set_source_rgba(1, 1, 1, 1)
+
+    def make_static_layer(self, cr, key, win_width, win_height):
+        """Draw airspace, waypoints and task to a new surface, with a margin
+           around the window"""
+        surface = cr.get_target().create_similar(cairo.CONTENT_COLOR_ALPHA,
+                                                 win_width + 2 * LAYER_MARGIN,
+                                                 win_height + 2 * LAYER_MARGIN)
+        layer_cr = gtk.gdk.CairoContext(cairo.Context(surface))
+        layer_cr.translate(LAYER_MARGIN, LAYER_MARGIN)
+        layer_cr.set_source_rgba(1, 1, 1, 1)
+
+        draw = self.render.draw
+        draw('airspace', self.draw_airspace, layer_cr, win_width, win_height)
+        draw('waypoints', self.draw_waypoints, layer_cr)
+        if not self.info_flag:
+            draw('task', self.draw_task, layer_cr, win_width, win_height)
+
+        return {'surface': surface, 'key': key,
+                'x': self.viewx, 'y': self.viewy}
 
     def draw_matrix(self, cr, win_width, win_height):
         """Draw user input matrix"""
@@ -469,17 +562,20 @@ class FreeView(APP_BASE):
         cr.scale(1.0 / self.view_scale, -1.0 / self.view_scale)
         cr.translate(-self.viewx, -self.viewy)
 
-        utc, sp = self.flight.track_log[0]
-        cr.move_to(*sp)
-        for utc, p in self.flight.track_log:
-            cr.line_to(*p)
+        xs, ys = self.flight.track_log.get_display_track(
+            self.view_scale * TRACK_TOLERANCE)
+        cr.move_to(xs[0], ys[0])
+        for x, y in zip(xs, ys):
+            cr.line_to(x, y)
 
         cr.restore()
         cr.set_line_width(2)
         cr.stroke()
 
     def draw_waypoints(self, cr):
-        """Draw waypoints"""
+        """Draw waypoints, with labels that don't overlap"""
+        task_ids = set([tp['id'] for tp in self.flight.task.tp_list])
+
         if self.divert_flag:
             # Landable waypoints
             fill = True
@@ -491,22 +587,22 @@ class FreeView(APP_BASE):
             fill = False
             if self.view_scale > 71 or not self.wp_display_flag:
                 # Task waypoints
-                tps = [tp['id'] for tp in self.flight.task.tp_list]
-                wps = filter(lambda x: x['id'] in tps, self.mapcache.wps)
+                wps = [wp for wp in self.mapcache.wps if wp['id'] in task_ids]
             else:
-                # All waypoints
-                wps = self.mapcache.wps
-
+                # All waypoints, task waypoints first so their labels take
+                # precedence
+                wps = ([wp for wp in self.mapcache.wps
+                        if wp['id'] in task_ids] +
+                       [wp for wp in self.mapcache.wps
+                        if wp['id'] not in task_ids])
+
+        positions = []
         for wp in wps:
             # Draw a circle
             x, y = self.view_to_win(wp['x'], wp['y'])
             cr.new_sub_path()
             cr.arc(x, y, WP_SIZE, 0, M_2PI)
-
-            # Waypoint ID text
-            self.wp_layout.set_text(wp['id'])
-            cr.move_to(x + WP_SIZE, y + WP_SIZE)
-            cr.show_layout(self.wp_layout)
+            positions.append((x, y))
 
         if fill:
             # Draw landables as filled circle
@@ -516,32 +612,50 @@ class FreeView(APP_BASE):
             cr.set_line_width(2)
             cr.stroke()
 
+        # Waypoint ID labels, skipping any which overlap those already drawn
+        label_grid = spatial.RectGrid()
+        for wp, (x, y) in zip(wps, positions):
+            surface, width, height = self.get_label(cr, wp['id'])
+            x1, y1 = x + WP_SIZE, y + WP_SIZE
+            if label_grid.place(x1, y1, x1 + width, y1 + height):
+                cr.set_source_surface(surface, x1, y1)
+                cr.paint()
+
+        cr.set_source_rgba(1, 1, 1, 1)
+
+    def get_label(self, cr, label):
+        """Return cached surface, width and height of a waypoint label"""
+        cached = self.label_cache.get(label)
+        if cached is None:
+            if len(self.label_cache) >= MAX_LABEL_CACHE:
+                self.label_cache.clear()
+
+            self.wp_layout.set_text(label)
+            width, height = self.wp_layout.get_pixel_size()
+            surface = cr.get_target().create_similar(cairo.CONTENT_COLOR_ALPHA,
+                                                     width, height)
+            label_cr = gtk.gdk.CairoContext(cairo.Context(surface))
+            label_cr.set_source_rgba(1, 1, 1, 1)
+            label_cr.show_layout(self.wp_layout)
+
+            cached = (surface, width, height)
+            self.label_cache[label] = cached
+        return cached
+
     def draw_airspace(self, cr, win_width, win_height):
-        """Draw airspace boundary lines and arcs"""
+        """Draw airspace boundaries"""
         # Transform view to window coordinates
         cr.save()
         cr.translate(win_width / 2, win_height / 2)
         cr.scale(1.0 / self.view_scale, -1.0 / self.view_scale)
         cr.translate(-self.viewx, -self.viewy)
 
-        # Airspace lines
-        for as_id in self.mapcache.airspace_lines:
-            for line in self.mapcache.airspace_lines[as_id]:
-                cr.move_to(line['x1'], line['y1'])
-                cr.line_to(line['x2'], line['y2'])
-
-        # Airspace arcs & circles
-        for as_id in self.mapcache.airspace_arcs:
-            for arc in self.mapcache.airspace_arcs[as_id]:
-                angle1 = arc['start']
-                angle2 = angle1 + arc['length']
-
-                cr.new_sub_path()
-                if arc['length'] > 0:
-                    cr.arc(arc['x'], arc['y'], arc['radius'], angle1, angle2)
-                else:
-                    cr.arc_negative(arc['x'], arc['y'], arc['radius'], angle1,
-                                    angle2)
+        # Airspace boundaries, simplified for the current scale
+        for airspace in self.mapcache.airspace:
+            for path in self.mapcache.get_paths(airspace['id']):
+                cr.move_to(*path[0])
+                for point in path[1:]:
+                    cr.line_to(*point)
 
         # Restore transform
         cr.restore()
@@ -807,14 +921,57 @@ class FreeView(APP_BASE):
             cr.paint()
             cr.restore()
 
+    def draw_airspace_warning(self, cr, win_width):
+        """Draw name and time to entry of most urgent airspace warning"""
+        if not self.airspace_warnings:
+            return
+
+        warning = self.airspace_warnings[0]
+        if warning['inside']:
+            txt = "%s IN" % warning['name']
+        else:
+            secs = int(warning['time'])
+            txt = "%s %d:%02d" % (warning['name'], secs / 60, secs % 60)
+
+        self.fg_layout.set_text(txt)
+        x, y = self.fg_layout.get_pixel_size()
+        cr.move_to((win_width - x) / 2, 40)
+
+        # Draw text with black outline
+        cr.layout_path(self.fg_layout)
+        cr.save()
+        cr.set_line_width(5)
+        cr.set_source_rgba(0, 0, 0, 1)
+        cr.stroke_preserve()
+        cr.set_source_rgba(1, 0.3, 0.3, 1)
+        cr.fill()
+        cr.restore()
+
+    def queue_draw(self):
+        """Queue expose of the window"""
+        self.window.queue_draw()
+
     # External methods - for use by controller
     def redraw(self, reload_map=False):
         """Redraw display"""
         if reload_map:
             width, height = self.get_view_size()
-            self.mapcache.reload(self.viewx, self.viewy, width, height)
+            self.mapcache.reload(self.viewx, self.viewy, width, height,
+                                 self.view_scale)
 
-        self.window.queue_draw()
+        self.render.request()
+
+    def set_position_source(self, position_source):
+        """Set function returning the current position, for display between
+           position updates"""
+        self.position_source = position_source
+
+    def frame_position(self):
+        """Move view to current position at the start of a frame"""
+        if self.position_source:
+            position = self.position_source()
+            if position is not None:
+                self.viewx, self.viewy = position
 
     def update_position(self, x, y):
         """Update position of view and redraw"""
@@ -822,7 +979,8 @@ class FreeView(APP_BASE):
         self.viewy = y
 
         width, height = self.get_view_size()
-        self.mapcache.update(x, y, width, height)
+        self.mapcache.update(x, y, width, height, self.view_scale)
+        self.prefetcher.prefetch(self.flight, width, height, self.view_scale)
 
         self.redraw()
 
@@ -834,7 +992,8 @@ class FreeView(APP_BASE):
         # Big change in view, so reload the cache
         if reload_map:
             width, height = self.get_view_size()
-            self.mapcache.reload(self.viewx, self.viewy, width, height)
+            self.mapcache.reload(self.viewx, self.viewy, width, height,
+                                 self.view_scale)
 
     def zoom_out(self, reload_map=True):
         """See some more"""
@@ -888,6 +1047,10 @@ class FreeView(APP_BASE):
         self.divert_flag = flag
         self.redraw()
 
+    def set_airspace_warnings(self, warnings):
+        """Set list of airspace warnings to display"""
+        self.airspace_warnings = warnings
+
     def set_mute_indicator(self, flag):
         """Set indicator showing mute is active"""
         self.mute_flag = flag
@@ -1,92 +1,261 @@
 """This module provides a cache store of waypoing and airspace for the freenav
 program"""
 
+import collections
 import math
-M_2PI = 2 * math.pi
+
+import airspace
+
+# Size of a map tile, in pixels
+TILE_PIXELS = 256
+
+# Scale bands, each entry is the largest map scale (metres per pixel) in
+# the band. Tiles are sized for the band so adjacent zoom levels share tiles
+SCALE_BANDS = [17, 71, 400]
+
+# Tolerance, in pixels, of simplified airspace boundary paths for display
+PATH_TOLERANCE = 0.5
+
+# Smallest display scale in each band (see freeview.SCALE). Paths are
+# simplified for this scale so the simplification isn't visible at any zoom
+# level in the band
+PATH_SCALES = [6, 25, 100]
+
+# Default cache size limit, as number of waypoint and airspace boundary
+# records
+MAX_CACHE_SIZE = 20000
+
+def scale_band(scale):
+    """Return scale band for the given map scale"""
+    for band, max_scale in enumerate(SCALE_BANDS):
+        if scale <= max_scale:
+            return band
+    return len(SCALE_BANDS) - 1
+
+def tile_size(band):
+    """Return width (and height) of tiles in given band, in metres"""
+    return SCALE_BANDS[band] * TILE_PIXELS
+
+def tile_keys(x, y, width, height, scale):
+    """Return list of keys for tiles covering the given area"""
+    band = scale_band(scale)
+    size = tile_size(band)
+
+    tx1 = int(math.floor((x - width / 2) / size))
+    tx2 = int(math.floor((x + width / 2) / size))
+    ty1 = int(math.floor((y - height / 2) / size))
+    ty2 = int(math.floor((y + height / 2) / size))
+
+    return [(tx, ty, band) for tx in range(tx1, tx2 + 1)
+                           for ty in range(ty1, ty2 + 1)]
+
+def load_tile(db, key, held_ids=()):
+    """Load waypoints and airspace for a tile from the database. Boundary
+       geometry isn't loaded for airspace ids in held_ids"""
+    tx, ty, band = key
+    size = tile_size(band)
+    x0, y0 = tx * size, ty * size
+    xc, yc = x0 + size / 2, y0 + size / 2
+
+    # Area query excludes points on the boundary, so pad then clip to tile
+    wps = [wp for wp in db.get_area_waypoint_list(xc, yc, size + 2, size + 2)
+           if (x0 <= wp['x'] < x0 + size) and (y0 <= wp['y'] < y0 + size)]
+
+    airspace = db.get_area_airspace(xc, yc, size, size)
+    lines, arcs = db.get_airspace_geometry(
+            [a['id'] for a in airspace if a['id'] not in held_ids])
+
+    return {'wps': wps, 'airspace': airspace, 'lines': lines, 'arcs': arcs}
 
 class MapCache():
-    """Cached waypoints and airspace"""
-    def __init__(self, flight):
+    """Cached waypoints and airspace, stored as tiles with least recently
+       used eviction"""
+    def __init__(self, flight, max_size=MAX_CACHE_SIZE):
         self.flight = flight
+        self.max_size = max_size
+
+        # Tiles in least recently used order, and their total size
+        self.tiles = collections.OrderedDict()
+        self.cache_size = 0
+
+        # Airspace boundaries shared by tiles, keyed by airspace id. Values
+        # are [lines, arcs, tile reference count]
+        self.geometry = {}
 
-        self.x = 0
-        self.y = 0
-        self.width = 0
-        self.height = 0
+        # Airspace polygons for point queries, compiled on demand
+        self.polygons = {}
 
+        # Simplified boundary paths for display, keyed by id and scale band
+        self.paths = {}
+
+        # Tiles covering the current view
+        self.view_keys = []
+
+        # Background tile loader. If not set tiles are loaded synchronously
+        self.loader = None
+
+        # Waypoints and airspace for the current view
         self.wps = []
         self.airspace = []
         self.airspace_lines = {}
         self.airspace_arcs = {}
 
-    def update(self, x, y, width, height):
-        """Reload cache if there has been significant movement"""
-        dx = abs(x - self.x)
-        dy = abs(y - self.y)
-        if (dx > (width / 20)) or (dy > (height / 20)):
-            self.reload(x, y, width, height)
+        # Incremented each time the view contents change
+        self.version = 0
 
-    def reload(self, x, y, width, height):
+    def update(self, x, y, width, height, scale):
+        """Update cache if the view has moved onto different tiles"""
+        keys = tile_keys(x, y, width, height, scale)
+        if keys != self.view_keys:
+            self.load(keys)
+
+    def reload(self, x, y, width, height, scale):
         """Reload waypoint and airspace caches"""
-        self.x = x
-        self.y = y
-        self.width = width
-        self.height = height
+        self.load(tile_keys(x, y, width, height, scale))
+
+    def clear(self):
+        """Discard all cached tiles"""
+        self.tiles.clear()
+        self.cache_size = 0
+        self.geometry = {}
+        self.polygons = {}
+        self.paths = {}
+        self.view_keys = []
+        self.assemble()
 
-        # Get waypoints
-        self.wps = self.flight.db.get_area_waypoint_list(x, y, width, height)
+    def load(self, keys):
+        """Make given tiles the current view, loading any not in the cache"""
+        missing = []
+        for key in keys:
+            tile = self.tiles.pop(key, None)
+            if tile is not None:
+                # Re-insert to mark tile as most recently used
+                self.tiles[key] = tile
+            elif self.loader:
+                missing.append(key)
+            else:
+                tile = load_tile(self.flight.db, key, self.geometry)
+                self.add_tile(key, tile)
 
-        # Get airspace
-        self.airspace = self.flight.db.get_area_airspace(x, y, width, height)
+        if missing:
+            # View is assembled from the available tiles and updated as the
+            # missing ones arrive
+            self.loader.request(missing)
+
+        self.view_keys = keys
+        self.evict()
+        self.assemble()
+
+    def add_loaded_tile(self, key, tile):
+        """Add a tile from the background loader. Returns True if the view
+           has changed"""
+        if key in self.tiles:
+            return False
+
+        self.add_tile(key, tile)
+        self.evict()
+        if key in self.view_keys:
+            self.assemble()
+            return True
+        else:
+            return False
+
+    def add_tile(self, key, tile):
+        """Add a newly loaded tile to the cache. Boundaries already in the
+           shared store take precedence over those loaded with the tile"""
+        size = len(tile['wps'])
+        for airspace in tile['airspace']:
+            as_id = airspace['id']
+            geometry = self.geometry.get(as_id)
+            if geometry is None:
+                geometry = [tile['lines'][as_id], tile['arcs'][as_id], 0]
+                self.geometry[as_id] = geometry
+
+            geometry[2] += 1
+            size += len(geometry[0]) + len(geometry[1])
+
+        # Geometry is now held in the shared store
+        del tile['lines'], tile['arcs']
+
+        tile['size'] = size
+        self.tiles[key] = tile
+        self.cache_size += size
+
+    def evict(self):
+        """Drop least recently used tiles until the cache is within its size
+           limit. Tiles in the current view are never dropped"""
+        for key in list(self.tiles):
+            if self.cache_size <= self.max_size:
+                break
+            if key in self.view_keys:
+                continue
+
+            tile = self.tiles.pop(key)
+            self.cache_size -= tile['size']
+            for airspace in tile['airspace']:
+                geometry = self.geometry[airspace['id']]
+                geometry[2] -= 1
+                if geometry[2] == 0:
+                    del self.geometry[airspace['id']]
+                    self.polygons.pop(airspace['id'], None)
+                    for band in range(len(SCALE_BANDS)):
+                        self.paths.pop((airspace['id'], band), None)
+
+    def assemble(self):
+        """Collect waypoints and airspace from the view tiles"""
+        self.version += 1
+        self.wps = []
+        self.airspace = []
         self.airspace_lines = {}
         self.airspace_arcs = {}
-        db = self.flight.db
-        for airspace in self.airspace:
-            as_id = airspace['id']
-            self.airspace_lines[as_id] = db.get_airspace_lines(as_id)
-            self.airspace_arcs[as_id] = db.get_airspace_arcs(as_id)
 
-    def get_airspace_info(self, x, y):
-        """Returns list of airspace info at the given x,y position.
+        for key in self.view_keys:
+            tile = self.tiles.get(key)
+            if tile is None:
+                # Not loaded yet
+                continue
+
+            self.wps.extend(tile['wps'])
 
-           Works by counting the number of times a line to the left of the
-           position cross the boundary. If it's odd then point is inside."""
+            for airspace in tile['airspace']:
+                as_id = airspace['id']
+                if as_id not in self.airspace_lines:
+                    self.airspace.append(airspace)
+                    lines, arcs, _count = self.geometry[as_id]
+                    self.airspace_lines[as_id] = lines
+                    self.airspace_arcs[as_id] = arcs
+
+    def get_polygon(self, as_id):
+        """Return compiled polygon for airspace in the current view. Unlike
+           the display paths it doesn't depend on the scale"""
+        polygon = self.polygons.get(as_id)
+        if polygon is None:
+            polygon = airspace.AirspacePolygon(self.airspace_lines[as_id],
+                                               self.airspace_arcs[as_id],
+                                               airspace.ARC_TOLERANCE)
+            self.polygons[as_id] = polygon
+        return polygon
+
+    def get_paths(self, as_id):
+        """Return boundary paths, simplified for the current scale band, for
+           airspace in the current view"""
+        band = self.view_keys[0][2]
+        paths = self.paths.get((as_id, band))
+        if paths is None:
+            tolerance = PATH_SCALES[band] * PATH_TOLERANCE
+            paths = airspace.boundary_paths(self.airspace_lines[as_id],
+                                            self.airspace_arcs[as_id],
+                                            tolerance)
+            self.paths[(as_id, band)] = paths
+        return paths
+
+    def get_airspace_info(self, x, y):
+        """Returns list of airspace info at the given x,y position"""
         airspace_info = []
-        for airspace in self.airspace:
-            odd_node = count_crossings(x, y, airspace['id'],
-                                       self.airspace_lines, self.airspace_arcs)
-            if odd_node:
-                airspace_info.append((airspace['name'], airspace['base'],
-                                      airspace['top']))
+        for airspace_rec in self.airspace:
+            if self.get_polygon(airspace_rec['id']).contains(x, y):
+                airspace_info.append((airspace_rec['name'],
+                                      airspace_rec['base'],
+                                      airspace_rec['top']))
 
         return airspace_info
-
-def count_crossings(x, y, as_id, airspace_lines, airspace_arcs):
-    """Count boundary crossings"""
-    odd_node = False
-
-    # Count boundary line crossings
-    for line in airspace_lines[as_id]:
-        x1, y1 = (line['x1'], line['y1'])
-        x2, y2 = (line['x2'], line['y2'])
-        if (y1 < y and y2 >= y) or (y2 < y and y1 >= y):
-            if (x1 + (y - y1) / (y2 - y1) * (x2 -x1)) < x:
-                odd_node = not odd_node
-
-    # Count boundary arc (and circle) crossings
-    for arc in airspace_arcs[as_id]:
-        x_cent, y_cent, radius = (arc['x'], arc['y'], arc['radius'])
-        start, arc_len = (arc['start'], arc['length'])
-        if y >= (y_cent - radius) and y < (y_cent + radius):
-            # Each arc has potentially two crossings
-            ang1 = math.asin((y - y_cent) / radius)
-            ang2 = math.pi - ang1
-
-            for ang in (ang1, ang2):
-                if ((arc_len > 0 and ((ang - start) % M_2PI) < arc_len) or
-                    (arc_len < 0 and ((start - ang) % M_2PI) < -arc_len)):
-                    x1 = x_cent + radius * math.cos(ang)
-                    if x1 < x:
-                        odd_node = not odd_node
-
-    return odd_node
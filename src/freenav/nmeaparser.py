@@ -3,6 +3,8 @@
 import calendar
 import logging
 import math
+import operator
+import struct
 import time
 
 # GGA fields
@@ -46,6 +48,9 @@ FLAA_CLIMB_RATE = 10
 # GCS (Volkslogger pressure altitude) fields
 GCS_ALTITUDE = 3
 
+# LXWP0 (LX Navigation flight data) fields
+LXWP0_AIR_SPEED = 2
+
 # Fix quality values
 FIX_QUALITY_INVALID = 0
 FIX_QUALITY_GPS = 1
@@ -53,14 +58,67 @@ FIX_QUALITY_DGPS = 2
 
 KTS_TO_MPS = 1852 / 3600.0
 FT_TO_M = 12 * 25.4 / 1000
+KMH_TO_MPS = 1000 / 3600.0
+
+DAY_SECS = 24 * 3600
+HALF_DAY_SECS = 12 * 3600
+
+# Same factor as used by math.radians
+DEG_TO_RAD = math.pi / 180
+
+# Checksum strings for all checksum values
+CHECKSUM_STRS = ["%02X" % n for n in range(256)]
+
+# Checksums are calculated eight characters at a time on data up to
+# CHECKSUM_WORDS * 8 characters long
+CHECKSUM_WORDS = 16
+CHECKSUM_STRUCTS = [struct.Struct("<%dQ" % n)
+                    for n in range(CHECKSUM_WORDS + 1)]
+CHECKSUM_PADS = ['\0' * n for n in range(8)]
+
+# Values of two and three digit latitude and longitude degree fields
+DEGREES = dict([("%02d" % n, n) for n in range(91)] +
+               [("%03d" % n, n) for n in range(181)])
+
+# Values of small integer fields, fix quality and number of satellites
+SMALL_INTS = dict([(str(n), n) for n in range(100)] +
+                  [("%02d" % n, n) for n in range(100)])
+
+# Fixed layout field extraction for GGA, RMC and FLAA sentences
+GGA_FIELDS = operator.itemgetter(GGA_TIME, GGA_LATITUDE, GGA_LONGITUDE,
+                                 GGA_EW, GGA_FIX_QUALITY, GGA_NUM_SATELLITES,
+                                 GGA_ALTITUDE)
+RMC_FIELDS = operator.itemgetter(RMC_TIME, RMC_DATE, RMC_LATITUDE,
+                                 RMC_LONGITUDE, RMC_EW, RMC_SPEED, RMC_TRACK)
+FLAA_FIELDS = operator.itemgetter(FLAA_RELATIVE_NORTH, FLAA_RELATIVE_EAST,
+                                  FLAA_RELATIVE_VERTICAL, FLAA_ID)
 
 def calc_checksum_str(data_str):
     """Return two digit string checksum - XOR of all characters in the data"""
-    csum = 0
-    for c in data_str:
-        csum = csum ^ ord(c)
-
-    return "%02X" % csum
+    num_words = (len(data_str) + 7) >> 3
+    if num_words > CHECKSUM_WORDS:
+        return CHECKSUM_STRS[reduce(operator.xor, bytearray(data_str), 0)]
+
+    # XOR data as 64 bit words, then fold the word down to a byte
+    data_str += CHECKSUM_PADS[num_words * 8 - len(data_str)]
+    csum = reduce(operator.xor, CHECKSUM_STRUCTS[num_words].unpack(data_str),
+                  0)
+    csum ^= csum >> 32
+    csum ^= csum >> 16
+    csum ^= csum >> 8
+    return CHECKSUM_STRS[csum & 0xff]
+
+def decode_lat(lat_str):
+    """Convert ddmm.mmm latitude string to radians"""
+    return (DEGREES[lat_str[:2]] + float(lat_str[2:]) / 60) * DEG_TO_RAD
+
+def decode_lon(lon_str, ew_str):
+    """Convert dddmm.mmm longitude string and E/W to radians"""
+    lon = (DEGREES[lon_str[:3]] + float(lon_str[3:]) / 60) * DEG_TO_RAD
+    if ew_str == 'W':
+        return -lon
+    else:
+        return lon
 
 def check_checksum(data_str, checksum_str):
     """Return True if no checksum or calculated checksum matches given
@@ -89,7 +147,7 @@ class NmeaParser:
         self.logger.addHandler(null_handler)
 
         # Buffer for NMEA data
-        self.buf = ''
+        self.buf = bytearray()
 
         # Signals generated from parsing the data
         self.signals = set()
@@ -101,7 +159,8 @@ class NmeaParser:
                            'PFLAU': self.proc_flau,
                            'PFLAA': self.proc_flaa,
                            'PFLAC': self.proc_flac,
-                           'PGCS': self.proc_gcs}
+                           'PGCS': self.proc_gcs,
+                           'LXWP0': self.proc_lxwp0}
 
         # Initialise variables
         self.flarm_alarm_level = 0
@@ -111,12 +170,17 @@ class NmeaParser:
         self.num_satellites = 0
         self.gps_altitude = 0
         self.pressure_alt = 0
+        self.air_speed = 0
         self.flarm_traffic = {}
 
         self.date = "010100"
         self.rmc_time = 0
         self.gga_time = 0
 
+        # Cached UTC time of midnight for the current date
+        self.midnight_date = None
+        self.midnight = 0
+
         self.expect_str = None
 
     def expect(self, expect_str, expect_cb):
@@ -125,77 +189,77 @@ class NmeaParser:
 
     def parse(self, data):
         """Parse NMEA data. Return list of signals"""
-        # Prepend new data to old
-        buf = ''.join([self.buf, data])
+        # Append new data to old
+        buf = self.buf
+        buf.extend(data)
 
-        # Clear signal list then process the data
+        # Clear signal list then process each complete sentence
         self.signals.clear()
-        self.buf = self.parse_buf(buf)
+        start = 0
+        while True:
+            end = buf.find("\r\n", start)
+            if end == -1:
+                break
 
-        return self.signals
+            self.parse_sentence(str(buf[start:end]))
+            start = end + 2
 
-    def parse_buf(self, buf):
-        """Extract NMEA data from data buffer. Return any unparsed data"""
-        # Split data buffer at first newline
-        sentence, separator, remainder = buf.partition("\r\n")
+        # Keep only the unterminated tail
+        del buf[:start]
 
+        # Expect callback on arbitrary pattern match
+        if self.expect_str and (self.expect_str in buf):
+            self.expect_str = None
+            self.expect_cb()
+
+        return self.signals
+
+    def parse_sentence(self, sentence):
+        """Process a single NMEA sentence"""
         # Expect callback on arbitrary pattern match
         if self.expect_str and (self.expect_str in sentence):
             self.expect_str = None
             self.expect_cb()
 
-        if separator:
-            if sentence[0:1] == '$':
-                # Split sentence into message body and checksum
-                body, _sep, checksum = sentence[1:].partition('*')
-
-                if check_checksum(body, checksum):
-                    self.logger.debug(sentence)
-                    # Split body into comma separated fields and process
-                    fields = body.split(',')
-                    try:
-                        self.proc_funcs.get(fields[0], self.proc_unknown)(fields)
-                    except IndexError:
-                        self.logger.warning("Malformed sentence: " + sentence)
-                else:
-                    self.logger.warning("Checksum error: " + sentence)
+        if sentence[0:1] == '$':
+            # Split sentence into message body and checksum
+            body, _sep, checksum = sentence[1:].partition('*')
+
+            if check_checksum(body, checksum):
+                self.logger.debug(sentence)
+                # Split body into comma separated fields and process
+                fields = body.split(',')
+                try:
+                    self.proc_funcs.get(fields[0], self.proc_unknown)(fields)
+                except IndexError:
+                    self.logger.warning("Malformed sentence: " + sentence)
             else:
-                self.logger.warning("Incorrect sentence header: " + sentence)
-
-            # Recurse function to process remaining data in buffer
-            return self.parse_buf(remainder)
+                self.logger.warning("Checksum error: " + sentence)
         else:
-            return sentence
+            self.logger.warning("Incorrect sentence header: " + sentence)
 
     def proc_gga(self, fields):
         """Process GGA GPS data. Time, lat/lon, altitude and num satellites"""
-        quality = fields[GGA_FIX_QUALITY]
-        if quality == '0':
+        if fields[GGA_FIX_QUALITY] == '0':
             # Bail out early if fix quality is invalid
             return
 
-        try:
-            # Time
-            tim = fields[GGA_TIME]
+        tim, lat, lon, ew, quality, num_sats, alt = GGA_FIELDS(fields)
 
+        try:
             # Latitude and longitude
-            lat = fields[GGA_LATITUDE]
-            self.latitude = math.radians(int(lat[:2]) + float(lat[2:]) / 60)
-
-            lon = fields[GGA_LONGITUDE]
-            self.longitude = math.radians(int(lon[:3]) + float(lon[3:]) / 60)
-            if fields[GGA_EW] == 'W':
-                self.longitude = -self.longitude
+            self.latitude = decode_lat(lat)
+            self.longitude = decode_lon(lon, ew)
 
             # Fix quality
-            self.fix_quality = int(fields[GGA_FIX_QUALITY])
+            self.fix_quality = SMALL_INTS[quality]
 
             # Number of satellites
-            self.num_satellites = int(fields[GGA_NUM_SATELLITES])
+            self.num_satellites = SMALL_INTS[num_sats]
 
             # Altitude above MSL
-            self.gps_altitude = float(fields[GGA_ALTITUDE])
-        except ValueError:
+            self.gps_altitude = float(alt)
+        except (ValueError, KeyError):
             self.logger.error("Error processing: " + ','.join(fields))
             return
 
@@ -213,28 +277,19 @@ class NmeaParser:
             # Bail out early if inactive fix
             return
 
+        tim, self.date, lat, lon, ew, speed_str, track_str = RMC_FIELDS(fields)
         try:
-            tim = fields[RMC_TIME]
-            self.date = fields[RMC_DATE]
-
             # Latitude and longitude
-            lat = fields[RMC_LATITUDE]
-            self.latitude = math.radians(int(lat[:2]) + float(lat[2:]) / 60)
-
-            lon = fields[RMC_LONGITUDE]
-            self.longitude = math.radians(int(lon[:3]) + float(lon[3:]) / 60)
-            if fields[RMC_EW] == 'W':
-                self.longitude = -self.longitude
+            self.latitude = decode_lat(lat)
+            self.longitude = decode_lon(lon, ew)
 
             # Speed and track
-            speed_str = fields[RMC_SPEED]
             if speed_str:
                 self.speed = float(speed_str) * KTS_TO_MPS
 
-            track_str = fields[RMC_TRACK]
             if track_str:
-                self.track = math.radians(float(track_str))
-        except ValueError:
+                self.track = float(track_str) * DEG_TO_RAD
+        except (ValueError, KeyError):
             self.logger.error("Error processing: " + ','.join(fields))
             return
 
@@ -280,11 +335,11 @@ class NmeaParser:
     def proc_flaa(self, fields):
         """Process FLARM traffic data"""
         f = FlarmTraffic(self.time)
+        north, east, vertical, f.id = FLAA_FIELDS(fields)
         try:
-            f.north = int(fields[FLAA_RELATIVE_NORTH])
-            f.east = int(fields[FLAA_RELATIVE_EAST])
-            f.vertical = int(fields[FLAA_RELATIVE_VERTICAL])
-            f.id = fields[FLAA_ID]
+            f.north = int(north)
+            f.east = int(east)
+            f.vertical = int(vertical)
         except ValueError:
             self.logger.error("Error processing: " + ','.join(fields))
             return
@@ -292,7 +347,7 @@ class NmeaParser:
         # Some fields are empty in stealth mode
         f.stealth = False
         try:
-            f.track = math.radians(float(fields[FLAA_TRACK]))
+            f.track = float(fields[FLAA_TRACK]) * DEG_TO_RAD
             f.climb_rate = float(fields[FLAA_CLIMB_RATE])
         except ValueError:
             f.stealth = True
@@ -319,11 +374,39 @@ class NmeaParser:
 
         self.signals.add('new-pressure')
 
+    def proc_lxwp0(self, fields):
+        """Process LX Navigation true air speed"""
+        air_speed_str = fields[LXWP0_AIR_SPEED]
+        if not air_speed_str:
+            # No air speed sensor
+            return
+
+        try:
+            self.air_speed = float(air_speed_str) * KMH_TO_MPS
+        except ValueError:
+            self.logger.error("Error processing: " + ','.join(fields))
+            return
+
+        self.signals.add('new-airspeed')
+
     def proc_unknown(self, fields):
         """Do nothing for unknown sentence"""
         pass
 
     def set_time(self, tim):
         """Construct time from RMC data string and RMC/GGA time string"""
-        tm = time.strptime(self.date + tim[:6], "%d%m%y%H%M%S")
-        self.time = calendar.timegm(tm)
+        if self.date != self.midnight_date:
+            tm = time.strptime(self.date, "%d%m%y")
+            self.midnight = calendar.timegm(tm)
+            self.midnight_date = self.date
+
+        secs = (self.midnight + int(tim[:2]) * 3600 + int(tim[2:4]) * 60 +
+                int(tim[4:6]))
+        if tim[6:7] == '.':
+            secs += float(tim[6:])
+
+        # GGA time may pass midnight before the next RMC date
+        if -DAY_SECS - HALF_DAY_SECS < (secs - self.time) < -HALF_DAY_SECS:
+            secs += DAY_SECS
+
+        self.time = secs
@@ -0,0 +1,113 @@
+"""This module provides background loading of map tiles for the freenav
+program"""
+
+import itertools
+import math
+import Queue
+import threading
+
+import gobject
+
+import freedb
+import mapcache
+
+# Request priorities
+VIEW_PRIORITY = 0
+PREFETCH_PRIORITY = 1
+
+# Look ahead time along the current track, in seconds
+PREFETCH_TIME = 300
+
+# Number of positions along the track to prefetch
+PREFETCH_STEPS = 3
+
+# Maximum distance to the next turnpoint for its tiles to be prefetched
+MAX_TP_DISTANCE = 100000
+
+class TilePrefetcher:
+    """Load map tiles in a worker thread and hand them to the map cache in
+       the main loop"""
+    def __init__(self, cache, db_file, callback=None):
+        """Class initialisation"""
+        gobject.threads_init()
+
+        self.cache = cache
+        self.db_file = db_file
+        self.callback = callback
+
+        # Priority of tiles queued or being loaded, keyed by tile. Stale
+        # queue entries, for tiles since re-queued at a higher priority or
+        # already loaded, are skipped by the worker
+        self.pending = {}
+        self.lock = threading.Lock()
+
+        self.queue = Queue.PriorityQueue()
+        self.counter = itertools.count()
+
+        self.thread = threading.Thread(target=self.run)
+        self.thread.setDaemon(True)
+        self.thread.start()
+
+    def request(self, keys, priority=VIEW_PRIORITY):
+        """Queue loading of any tiles not already cached, or pending at a
+           lower priority"""
+        self.lock.acquire()
+        try:
+            for key in keys:
+                if (key not in self.cache.tiles and
+                    self.pending.get(key, priority + 1) > priority):
+                    self.pending[key] = priority
+                    self.queue.put((priority, self.counter.next(), key))
+        finally:
+            self.lock.release()
+
+    def prefetch(self, flight, width, height, scale):
+        """Request tiles for the view area ahead along the current track and
+           around the next turnpoint"""
+        x, y = flight.get_position()
+        dist = flight.average_ground_speed * PREFETCH_TIME
+        sin_track = math.sin(flight.track)
+        cos_track = math.cos(flight.track)
+
+        positions = []
+        for n in range(1, PREFETCH_STEPS + 1):
+            step = dist * n / PREFETCH_STEPS
+            positions.append((x + step * sin_track, y + step * cos_track))
+
+        tp = flight.task.nav_wp
+        if math.hypot(tp['x'] - x, tp['y'] - y) < MAX_TP_DISTANCE:
+            positions.append((tp['x'], tp['y']))
+
+        for x1, y1 in positions:
+            keys = mapcache.tile_keys(x1, y1, width, height, scale)
+            self.request(keys, PREFETCH_PRIORITY)
+
+    def run(self):
+        """Worker thread, loads tiles using its own database connection"""
+        db = freedb.Freedb(self.db_file)
+        while True:
+            priority, _count, key = self.queue.get()
+
+            self.lock.acquire()
+            try:
+                stale = self.pending.get(key) != priority
+            finally:
+                self.lock.release()
+            if stale:
+                continue
+
+            tile = mapcache.load_tile(db, key)
+            gobject.idle_add(self.tile_loaded, key, tile)
+
+    def tile_loaded(self, key, tile):
+        """Main loop callback with a newly loaded tile"""
+        self.lock.acquire()
+        try:
+            self.pending.pop(key, None)
+        finally:
+            self.lock.release()
+
+        if self.cache.add_loaded_tile(key, tile) and self.callback:
+            self.callback()
+
+        return False
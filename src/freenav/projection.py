@@ -5,14 +5,58 @@ Only Lambert Conformal Conical implemented
 
 __all__ = ['EARTH_RADIUS', 'Lambert']
 
+import array
 from math import sin, cos, tan, asin, atan, atan2, log, sqrt, pi
 
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
 EARTH_RADIUS = 6371000.0
 
-class Projection:
+# Maximum projected distance for planar distance and course calculations.
+# Over the UK projection (see utils/make_db.py) the planar distance error is
+# less than 0.003% and the course error less than 0.1 degrees at this
+# distance. Use utils/bench_projection.py to check other projections
+PLANAR_MAX_DIST = 150000
+
+# Default maximum number of entries in the reverse projection cache
+REVERSE_CACHE_SIZE = 1000
+
+class Projection(object):
     """Projection base case"""
+    __slots__ = ('planar_limit',)
+
+    def __init__(self):
+        """Class initialisation, planar calculations are disabled"""
+        self.planar_limit = 0
+
+    def set_planar_limit(self, limit=PLANAR_MAX_DIST):
+        """Use planar distance and course calculations for points closer
+           than limit, and great circle calculations otherwise"""
+        self.planar_limit = limit
+
     def dist(self, x1, y1, x2, y2):
         """Calculate true distance between two projected points"""
+        if self.planar_limit:
+            grid_dist = sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+            if grid_dist <= self.planar_limit:
+                return self.planar_dist(x1, y1, x2, y2)
+
+        return self.great_circle_dist(x1, y1, x2, y2)
+
+    def course(self, x1, y1, x2, y2):
+        """Calculate (initial) course between two projected point"""
+        if self.planar_limit:
+            grid_dist = sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+            if grid_dist <= self.planar_limit:
+                return self.planar_course(x1, y1, x2, y2)
+
+        return self.great_circle_course(x1, y1, x2, y2)
+
+    def great_circle_dist(self, x1, y1, x2, y2):
+        """Calculate great circle distance between two projected points"""
         lat1, lon1 = self.reverse(x1, y1)
         lat2, lon2 = self.reverse(x2, y2)
         dist_ang = (2 * asin(sqrt((sin((lat1 - lat2) / 2)) ** 2 +
@@ -20,8 +64,9 @@ class Projection:
 
         return EARTH_RADIUS * dist_ang
 
-    def course(self, x1, y1, x2, y2):
-        """Calculate (initial) course between two projected point"""
+    def great_circle_course(self, x1, y1, x2, y2):
+        """Calculate initial great circle course between two projected
+           points"""
         lat1, lon1 = self.reverse(x1, y1)
         lat2, lon2 = self.reverse(x2, y2)
         tc1 = atan2(sin(lon2 - lon1) * cos(lat2),
@@ -31,8 +76,13 @@ class Projection:
 
 class Lambert(Projection):
     """Lambert projection class"""
+    __slots__ = ('ref_lon', 'n', 'f', 'rho0', 'inv_n', 'sgn', 'r_f', 'r_rho0',
+                 'reverse_cache', 'reverse_cache_size')
+
     def __init__(self, parallel1, parallel2, lat, lon):
         """Class initialisation"""
+        Projection.__init__(self)
+
         self.ref_lon = lon
         self.n = (log(cos(parallel1) / cos(parallel2)) / 
                   log(tan(pi/4 + parallel2 / 2) / tan(pi/4 + parallel1 / 2)))
@@ -42,28 +92,121 @@ class Lambert(Projection):
 
         self.rho0 = self.f * (1 / tan(pi / 4 + lat / 2)) ** self.n
 
+        # Constants folded for forward and reverse projections
+        self.inv_n = 1 / self.n
+        if self.n > 0:
+            self.sgn = 1
+        elif self.n < 0:
+            self.sgn = -1
+        else:
+            self.sgn = 0
+        self.r_f = EARTH_RADIUS * self.f
+        self.r_rho0 = EARTH_RADIUS * self.rho0
+
+        # Reverse projection cache is disabled by default
+        self.reverse_cache = None
+        self.reverse_cache_size = 0
+
+    def set_reverse_cache(self, size=REVERSE_CACHE_SIZE):
+        """Cache the results of reverse projections. Intended for integer
+           positions which are reverse projected repeatedly"""
+        self.reverse_cache = {}
+        self.reverse_cache_size = size
+
     def forward(self, lat, lon):
         """Project lat-lon position to X-Y position"""
-        rho = self.f * (1 / tan(pi / 4 + lat / 2)) ** self.n
+        rho = self.r_f * tan(pi / 4 + lat / 2) ** -self.n
+        theta = self.n * (lon - self.ref_lon)
 
-        x = EARTH_RADIUS * rho * sin(self.n * (lon - self.ref_lon))
-        y = EARTH_RADIUS * (self.rho0 - rho * cos(self.n *
-                                                  (lon - self.ref_lon)))
-        return x, y
+        return rho * sin(theta), self.r_rho0 - rho * cos(theta)
 
-    def reverse(self, x, y):
-        """Convert projected X-Y position back to lat-lon"""
+    def forward_many(self, lats, lons):
+        """Project sequences of lat-lon positions to arrays of X and Y
+           positions"""
+        if numpy:
+            lats = numpy.asarray(lats, dtype=float)
+            lons = numpy.asarray(lons, dtype=float)
+            rho = self.f * (1 / numpy.tan(pi / 4 + lats / 2)) ** self.n
+            theta = self.n * (lons - self.ref_lon)
+
+            x = EARTH_RADIUS * rho * numpy.sin(theta)
+            y = EARTH_RADIUS * (self.rho0 - rho * numpy.cos(theta))
+            return x, y
+
+        xs = array.array('d')
+        ys = array.array('d')
+        for lat, lon in zip(lats, lons):
+            x, y = self.forward(lat, lon)
+            xs.append(x)
+            ys.append(y)
+        return xs, ys
+
+    def scale_factor(self, x, y):
+        """Return projection scale factor at projected X-Y position"""
         x = x / EARTH_RADIUS
         y = y / EARTH_RADIUS
-        theta = atan2(x, (self.rho0 - y))
-        if self.n > 0:
-            sgn = 1
-        elif self.n < 0:
-            sgn = -1
-        else:
-            sgn = 0
-        phi = sgn * sqrt(x * x + (self.rho0-y) ** 2)
+        rho = sqrt(x * x + (self.rho0 - y) ** 2)
+
+        # t = tan(pi/4 + lat/2), so cos(lat) = 2t / (1 + t^2)
+        t = (self.f / rho) ** (1 / self.n)
+        return self.n * rho * (1 + t * t) / (2 * t)
+
+    def convergence(self, x, y):
+        """Return angle between grid north and true north at projected X-Y
+           position"""
+        return atan2(x, self.rho0 * EARTH_RADIUS - y)
+
+    def planar_dist(self, x1, y1, x2, y2):
+        """Calculate distance from projected points, corrected by the scale
+           factor at the mid-point"""
+        grid_dist = sqrt((x2 - x1) ** 2 + (y2 - y1) ** 2)
+        return grid_dist / self.scale_factor((x1 + x2) / 2, (y1 + y2) / 2)
+
+    def planar_course(self, x1, y1, x2, y2):
+        """Calculate course from projected points, corrected by the
+           convergence at the start point"""
+        grid_course = atan2(x2 - x1, y2 - y1)
+        return (grid_course + self.convergence(x1, y1)) % (2 * pi)
+
+    def reverse(self, x, y):
+        """Convert projected X-Y position back to lat-lon"""
+        cache = self.reverse_cache
+        if cache is not None:
+            latlon = cache.get((x, y))
+            if latlon is not None:
+                return latlon
+
+        dy = self.r_rho0 - y
+        theta = atan2(x, dy)
+        phi = self.sgn * sqrt(x * x + dy * dy)
+
+        latlon = (2 * atan((self.r_f / phi) ** self.inv_n) - pi / 2,
+                  self.ref_lon + theta * self.inv_n)
+
+        if cache is not None:
+            if len(cache) >= self.reverse_cache_size:
+                cache.clear()
+            cache[(x, y)] = latlon
+
+        return latlon
+
+    def reverse_many(self, xs, ys):
+        """Convert sequences of projected X-Y positions back to arrays of
+           latitude and longitude"""
+        if numpy:
+            x = numpy.asarray(xs, dtype=float) / EARTH_RADIUS
+            y = numpy.asarray(ys, dtype=float) / EARTH_RADIUS
+            theta = numpy.arctan2(x, (self.rho0 - y))
+            phi = numpy.sign(self.n) * numpy.hypot(x, self.rho0 - y)
+
+            lat = 2 * numpy.arctan((self.f / phi) ** (1 / self.n)) - pi / 2
+            lon = self.ref_lon + theta / self.n
+            return lat, lon
 
-        lat = 2 * atan((self.f / phi) ** (1 / self.n)) - pi / 2
-        lon = self.ref_lon + theta / self.n
-        return lat, lon
+        lats = array.array('d')
+        lons = array.array('d')
+        for x, y in zip(xs, ys):
+            lat, lon = self.reverse(x, y)
+            lats.append(lat)
+            lons.append(lon)
+        return lats, lons
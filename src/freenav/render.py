@@ -0,0 +1,125 @@
+"""This module provides redraw scheduling for the freenav display"""
+
+import logging
+import time
+
+# Maximum frame rate
+FRAME_RATE = 5
+
+# Maximum fraction of time spent rendering
+RENDER_BUDGET = 0.5
+
+# Smoothing factor for average layer times
+AVERAGE_FACTOR = 0.1
+
+# Number of frames between logging of layer times
+LOG_FRAMES = 100
+
+class RenderScheduler:
+    """Coalesce redraw requests into frames limited by frame rate and by
+       the time taken to render previous frames"""
+    def __init__(self, queue_draw, frame_rate=FRAME_RATE,
+                 budget=RENDER_BUDGET, clock=time.time, timeout_add=None):
+        """Class initialisation. queue_draw is called to start a frame,
+           clock and timeout_add default to time.time and
+           gobject.timeout_add"""
+        self.logger = logging.getLogger('freelog')
+
+        if timeout_add is None:
+            import gobject
+            timeout_add = gobject.timeout_add
+
+        self.queue_draw = queue_draw
+        self.clock = clock
+        self.timeout_add = timeout_add
+        self.frame_interval = 1.0 / frame_rate
+        self.budget = budget
+
+        self.timeout_id = None
+        self.draw_pending = False
+
+        self.frame_start_time = 0
+        self.next_frame_time = 0
+        self.frame_count = 0
+
+        # Functions called at the start of each frame
+        self.frame_funcs = []
+
+        # Average time for each layer, and for the whole frame
+        self.layer_times = {}
+        self.frame_time = 0
+
+    def add_frame_func(self, func):
+        """Add function to be called at the start of each frame"""
+        self.frame_funcs.append(func)
+
+    def request(self):
+        """Request a redraw. Requests made before the frame is drawn are
+           merged"""
+        if self.timeout_id is not None or self.draw_pending:
+            return
+
+        delay = self.next_frame_time - self.clock()
+        if delay <= 0:
+            self.start_frame()
+        else:
+            self.timeout_id = self.timeout_add(int(delay * 1000) + 1,
+                                               self.on_timeout)
+
+    def on_timeout(self):
+        """Timeout callback at start of next frame"""
+        self.timeout_id = None
+        self.start_frame()
+        return False
+
+    def start_frame(self):
+        """Queue the expose for a new frame"""
+        self.draw_pending = True
+        self.queue_draw()
+
+    def begin(self):
+        """Called at the start of the expose handler"""
+        self.draw_pending = False
+        self.frame_start_time = self.clock()
+
+        for func in self.frame_funcs:
+            func()
+
+    def end(self):
+        """Called at the end of the expose handler. Sets the earliest time
+           for the next frame"""
+        now = self.clock()
+        duration = now - self.frame_start_time
+        self.frame_time = self.average(self.frame_time, duration)
+
+        # Leave at least (1 - budget) of the time for everything else
+        self.next_frame_time = max(
+            self.frame_start_time + self.frame_interval,
+            now + duration * (1 - self.budget) / self.budget)
+
+        self.frame_count += 1
+        if self.frame_count % LOG_FRAMES == 0:
+            self.log_times()
+
+    def draw(self, name, draw_func, *args):
+        """Call a layer draw function and record the time it takes"""
+        tim = self.clock()
+        result = draw_func(*args)
+        self.layer_times[name] = self.average(self.layer_times.get(name, 0),
+                                              self.clock() - tim)
+        return result
+
+    def average(self, avg, value):
+        """Update exponential moving average"""
+        return avg + AVERAGE_FACTOR * (value - avg)
+
+    def get_layer_times(self):
+        """Return average time, in seconds, for each layer"""
+        return self.layer_times
+
+    def log_times(self):
+        """Log average frame and layer times"""
+        layers = ["%s %.1f" % (name, tim * 1000)
+                  for name, tim in sorted(self.layer_times.items())]
+        self.logger.debug("Frame %.1fms: %s" % (self.frame_time * 1000,
+                                                ", ".join(layers)))
@@ -136,11 +136,13 @@ def main():
         proj = projection.Lambert(math.radians(49), math.radians(55),
                                   math.radians(52), math.radians(0))
 
-        for rec in in_file:
-            if rec[0] == 'B':
-                break
-        dt1, lat1, lon1, gps_alt, pressure_alt = igc_parse(rec)
-        x1, y1 = proj.forward(lat1, lon1)
+        # Parse all the fixes and project them in one go
+        fixes = [igc_parse(rec) for rec in in_file if rec[0] == 'B']
+        xs, ys = proj.forward_many([fix[1] for fix in fixes],
+                                   [fix[2] for fix in fixes])
+        in_file = zip(fixes, xs, ys)
+
+        (dt1, lat1, lon1, gps_alt, pressure_alt), x1, y1 = in_file.pop(0)
 
     sleep_time = 1.0
 
@@ -151,21 +153,19 @@ def main():
                 time.sleep(sleep_time)
 
             else:
-                if rec[0] == 'B':
-                    dt, lat, lon, gps_alt, pressure_alt = igc_parse(rec)
-                    x, y = proj.forward(lat, lon)
+                (dt, lat, lon, gps_alt, pressure_alt), x, y = rec
 
-                    tdelta = dt - dt1
-                    dist = math.sqrt((x - x1) ** 2 + (y - y1) ** 2)
-                    speed = dist / tdelta.seconds
-                    track = math.atan2(x - x1, y - y1)
+                tdelta = dt - dt1
+                dist = math.sqrt((x - x1) ** 2 + (y - y1) ** 2)
+                speed = dist / tdelta.seconds
+                track = math.atan2(x - x1, y - y1)
 
-                    dt1, x1, y1 = dt, x, y
+                dt1, x1, y1 = dt, x, y
 
-                    os.write(master_fd, gen_gprmc(lat, lon, speed, track, dt))
-                    os.write(master_fd, gen_gpgga(lat, lon, gps_alt, dt))
-                    os.write(master_fd, gen_pgrmz(pressure_alt))
-                    time.sleep(sleep_time)
+                os.write(master_fd, gen_gprmc(lat, lon, speed, track, dt))
+                os.write(master_fd, gen_gpgga(lat, lon, gps_alt, dt))
+                os.write(master_fd, gen_pgrmz(pressure_alt))
+                time.sleep(sleep_time)
 
             try:
                 c = sys.stdin.read(1)
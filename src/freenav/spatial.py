@@ -0,0 +1,139 @@
+"""This module provides an in-memory spatial index for the freenav programs"""
+
+import heapq
+import itertools
+import math
+
+# Default grid cell size, in metres
+CELL_SIZE = 10000
+
+# Default cell size of rectangle grid, in pixels
+RECT_CELL_SIZE = 32
+
+class GridIndex:
+    """Uniform grid index of items at x,y positions"""
+    def __init__(self, cell_size=CELL_SIZE):
+        """Class initialisation"""
+        self.cell_size = cell_size
+        self.cells = {}
+        self.size = 0
+
+        # Extent of occupied cells
+        self.i_min = self.j_min = 0
+        self.i_max = self.j_max = -1
+
+    def __len__(self):
+        return self.size
+
+    def cell(self, x, y):
+        """Return grid cell indices for the given position"""
+        return int(math.floor(x / self.cell_size)), \
+               int(math.floor(y / self.cell_size))
+
+    def insert(self, x, y, item):
+        """Add an item to the index"""
+        i, j = self.cell(x, y)
+        self.cells.setdefault((i, j), []).append((x, y, item))
+
+        if self.size == 0:
+            self.i_min = self.i_max = i
+            self.j_min = self.j_max = j
+        else:
+            self.i_min = min(self.i_min, i)
+            self.i_max = max(self.i_max, i)
+            self.j_min = min(self.j_min, j)
+            self.j_max = max(self.j_max, j)
+        self.size += 1
+
+    def clear(self):
+        """Remove all items"""
+        self.cells.clear()
+        self.size = 0
+        self.i_min = self.j_min = 0
+        self.i_max = self.j_max = -1
+
+    def query(self, x_min, y_min, x_max, y_max):
+        """Return list of items strictly inside the given box"""
+        i1, j1 = self.cell(x_min, y_min)
+        i2, j2 = self.cell(x_max, y_max)
+        i1, j1 = max(i1, self.i_min), max(j1, self.j_min)
+        i2, j2 = min(i2, self.i_max), min(j2, self.j_max)
+
+        items = []
+        for i in range(i1, i2 + 1):
+            for j in range(j1, j2 + 1):
+                for x, y, item in self.cells.get((i, j), ()):
+                    if x_min < x < x_max and y_min < y < y_max:
+                        items.append(item)
+        return items
+
+    def nearest(self, x, y, num=1):
+        """Return list of the num items nearest to x,y, nearest first.
+
+           Searches rings of cells outward from the cell containing x,y. A
+           point outside ring r is at least r cell sizes away, so the search
+           stops as soon as the num'th nearest item is closer than that"""
+        if self.size == 0 or num <= 0:
+            return []
+
+        ic, jc = self.cell(x, y)
+        max_ring = max(abs(ic - self.i_min), abs(ic - self.i_max),
+                       abs(jc - self.j_min), abs(jc - self.j_max))
+
+        candidates = []
+        counter = itertools.count()
+        for ring in range(max_ring + 1):
+            for i, j in ring_cells(ic, jc, ring):
+                for x1, y1, item in self.cells.get((i, j), ()):
+                    dist2 = (x1 - x) ** 2 + (y1 - y) ** 2
+                    candidates.append((dist2, counter.next(), item))
+
+            if len(candidates) >= num:
+                candidates = heapq.nsmallest(num, candidates)
+                if candidates[-1][0] <= (ring * self.cell_size) ** 2:
+                    break
+
+        candidates.sort()
+        return [item for _dist2, _n, item in candidates[:num]]
+
+class RectGrid:
+    """Uniform grid of non-overlapping rectangles, for placing labels"""
+    def __init__(self, cell_size=RECT_CELL_SIZE):
+        """Class initialisation"""
+        self.cell_size = cell_size
+        self.cells = {}
+
+    def clear(self):
+        """Remove all rectangles"""
+        self.cells.clear()
+
+    def place(self, x1, y1, x2, y2):
+        """Add rectangle unless it overlaps one already placed. Return True
+           if it was added"""
+        size = self.cell_size
+        cells = [(i, j) for i in range(int(x1 // size), int(x2 // size) + 1)
+                        for j in range(int(y1 // size), int(y2 // size) + 1)]
+
+        for cell in cells:
+            for xa, ya, xb, yb in self.cells.get(cell, ()):
+                if x1 < xb and xa < x2 and y1 < yb and ya < y2:
+                    return False
+
+        rect = (x1, y1, x2, y2)
+        for cell in cells:
+            self.cells.setdefault(cell, []).append(rect)
+        return True
+
+def ring_cells(ic, jc, ring):
+    """Return list of cells on the square ring, distance ring, around ic,jc"""
+    if ring == 0:
+        return [(ic, jc)]
+
+    cells = []
+    for i in range(ic - ring, ic + ring + 1):
+        cells.append((i, jc - ring))
+        cells.append((i, jc + ring))
+    for j in range(jc - ring + 1, jc + ring):
+        cells.append((ic - ring, j))
+        cells.append((ic + ring, j))
+    return cells
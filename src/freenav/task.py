@@ -1,4 +1,5 @@
 """Module to do task calculations for the freenav program"""
+import array
 import math
 
 MIN_TASK_SPEED_TIME = 15 * 60
@@ -6,6 +7,11 @@ MIN_TASK_SPEED_DISTANCE = 10000
 
 DEFAULT_MACCREADY = 1 * 1852 / 3600.0
 
+# Changes smaller than these don't trigger re-calculation of the task leg
+# glides. Wind change is the magnitude of the vector difference, in m/s
+WIND_THRESHOLD = 0.5
+MACCREADY_THRESHOLD = 0.01
+
 def tp_minxy(tp):
     """Return turnpoint sector coordinates for min task distance"""
     if tp.has_key('mindistx'):
@@ -37,6 +43,24 @@ class Task:
         self.wind_speed = 0
         self.wind_direction = 0
 
+        # Task legs, leg n is from turnpoint n - 1 to turnpoint n (leg 0 is
+        # unused). Distance and course are fixed, height loss and time are
+        # for a MacCready glide in the current wind
+        num_tps = len(tp_list)
+        self.leg_distance = array.array('d', [0]) * num_tps
+        self.leg_course = array.array('d', [0]) * num_tps
+        self.leg_height_loss = array.array('d', [0]) * num_tps
+        self.leg_glide_time = array.array('d', [0]) * num_tps
+        self.calculate_legs()
+
+        # Cumulative height loss and time from each turnpoint to the finish,
+        # recalculated when the wind or polar changes
+        self.tp_height_loss = array.array('d', [0]) * num_tps
+        self.tp_glide_time = array.array('d', [0]) * num_tps
+        self.tp_glides_dirty = True
+        self.glide_wind_speed = 0
+        self.glide_wind_direction = 0
+
         # Turnpoint parameters
         self.nav_wp = tp_list[0]
         self.tp_index = 0
@@ -45,8 +69,9 @@ class Task:
         self.tp_log = [None] * len(tp_list)
         self.tp_sector_flag = False
 
-        # Set Maccready (and do initial glide calculations)
-        self.set_maccready(DEFAULT_MACCREADY)
+        # Set Maccready
+        self.maccready = DEFAULT_MACCREADY
+        self.calculate_maccready()
         self.glide_ete = 0
         self.glide_arrival_height = 0
         self.glide_margin = 0
@@ -58,6 +83,9 @@ class Task:
         self.task_ete = 0
         self.task_calc_time = 0
 
+        # Time and arrival height for each leg of the last ETE calculation
+        self.ete_legs = []
+
         # Glide calculation mode
         self.glide_mode = "Task"
 
@@ -69,12 +97,14 @@ class Task:
         self.tp_index = 1
         self.tp_sector_flag = False
         self.start_time = 0
+        self.ete_legs = []
 
     def resume(self, x, y, altitude, start_time, resume_time):
         """Resume task after program re-start"""
         self.tp_index = 1
         self.tp_sector_flag = False
         self.start_time = start_time
+        self.ete_legs = []
 
         self.tp_log[0] = {'x': x, 'y': y, 'alt': altitude, 'tim': resume_time}
 
@@ -83,6 +113,7 @@ class Task:
         self.start_time = start_time
         self.task_speed = 0
         self.task_air_speed = 0
+        self.ete_legs = []
 
         self.tp_sector_flag = False
         self.tp_log[0] = {'x': x, 'y': y, 'alt': altitude, 'tim': start_time}
@@ -94,6 +125,7 @@ class Task:
                                           'tim': tim}
             self.tp_index += 1
             self.tp_sector_flag = False
+            self.ete_legs = []
 
             self.task_position(x, y, altitude, tim)
 
@@ -102,6 +134,7 @@ class Task:
         if self.tp_index > 1:
             self.tp_index -= 1
             self.tp_sector_flag = False
+            self.ete_legs = []
 
             self.task_position(x, y, altitude, tim)
 
@@ -114,16 +147,26 @@ class Task:
     # Set parameters
 
     def set_wind(self, wind):
-        """Set a new wind vector"""
+        """Set a new wind vector. Turnpoint glides are only re-calculated if
+           the wind has changed significantly since they were last done"""
         self.wind_speed = wind['speed']
         self.wind_direction = wind['direction']
 
-        self.calculate_tp_glides()
+        dx = (self.wind_speed * math.sin(self.wind_direction) -
+              self.glide_wind_speed * math.sin(self.glide_wind_direction))
+        dy = (self.wind_speed * math.cos(self.wind_direction) -
+              self.glide_wind_speed * math.cos(self.glide_wind_direction))
+        if math.hypot(dx, dy) > WIND_THRESHOLD:
+            self.tp_glides_dirty = True
 
     def set_maccready(self, maccready):
         """Set new Maccready parameters"""
-        self.maccready = maccready
+        if abs(maccready - self.maccready) >= MACCREADY_THRESHOLD:
+            self.maccready = maccready
+            self.calculate_maccready()
 
+    def calculate_maccready(self):
+        """Calculate MacCready speed and sink rate"""
         # Adjust polar coefficients for ballast and bugs
         a = self.polar['a'] / math.sqrt(self.ballast) * self.bugs
         b = self.polar['b'] * self.bugs
@@ -133,7 +176,7 @@ class Task:
         self.vmac = math.sqrt((c - self.maccready) / a)
         self.vmac_sink_rate = -(a * self.vmac ** 2 + b * self.vmac + c)
 
-        self.calculate_tp_glides()
+        self.tp_glides_dirty = True
 
     def set_glide_mode(self, mode):
         self.glide_mode = mode
@@ -154,6 +197,11 @@ class Task:
                 'ete': self.glide_ete,
                 'maccready': self.maccready}
 
+    def get_ete_legs(self):
+        """Return list of time and arrival height (above finish) for each
+           remaining leg of the task, from the last ETE calculation"""
+        return self.ete_legs
+
     def get_turnpoint_id(self):
         """Return ID of active TP"""
         return self.nav_wp["id"]
@@ -189,6 +237,9 @@ class Task:
         """Update position for task"""
         # First check for sector (and possibly increment TP)
         sector_entry = self.check_sector(x, y, altitude, tim)
+        if sector_entry:
+            # Legs from the last ETE calculation no longer apply
+            self.ete_legs = []
         tp_index = self.tp_index
         self.nav_wp = self.tp_list[tp_index]
 
@@ -206,20 +257,19 @@ class Task:
         if self.glide_mode == 'TP':
             self.calculate_glide_to_tp(x, y, altitude, self.tp_list[tp_index])
         else:
-            self.calculate_glide_to_finish(x, y, altitude,
-                                           self.tp_list[tp_index:])
+            self.calculate_glide_to_finish(x, y, altitude, tp_index)
 
         # Calculate speed on current leg and time to complete task
         if self.start_time and (tim - self.task_calc_time) >= 30:
             self.task_calc_time = tim
+            self.ete_legs = []
             if self.vmac > self.wind_speed:
                 self.calculate_task_speed(x, y, altitude, tim,
                                     self.tp_log[self.tp_index - 1])
 
                 if self.task_air_speed > self.wind_speed:
                     height = altitude - self.tp_list[-1]['altitude']
-                    ete = self.calculate_ete(x, y, height,
-                                             self.tp_list[tp_index:])
+                    ete = self.calculate_ete(x, y, height, tp_index)
                     self.task_ete = tim - self.start_time + ete
 
         return sector_entry
@@ -266,18 +316,19 @@ class Task:
         # Wind corrected speed
         self.task_air_speed = self.calculate_air_speed(self.task_speed, course)
 
-    def calculate_glide_to_finish(self, x, y, altitude, tp_list):
-        """Calculate glide around remainder of task"""
+    def calculate_glide_to_finish(self, x, y, altitude, tp_index):
+        """Calculate glide via turnpoint tp_index around remainder of task"""
         if self.vmac > self.wind_speed:
-            tp = tp_list[0]
-            tpx, tpy = tp_minxy(tp)
+            self.update_tp_glides()
+
+            tpx, tpy = tp_minxy(self.tp_list[tp_index])
             height_loss, tim = self.calculate_glide(x, y, tpx, tpy)
 
-            self.glide_ete = tim + tp.get('glide_time', 0)
-            height_loss = height_loss + tp.get('height_loss', 0)
+            self.glide_ete = tim + self.tp_glide_time[tp_index]
+            height_loss = height_loss + self.tp_height_loss[tp_index]
 
             self.glide_arrival_height = (
-                altitude - height_loss - tp_list[-1]['altitude'])
+                altitude - height_loss - self.tp_list[-1]['altitude'])
             self.glide_margin = (
                 (self.glide_arrival_height - self.safety_height) / height_loss)
         else:
@@ -300,82 +351,121 @@ class Task:
             self.glide_arrival_height = 0
             self.glide_margin = 0
 
-    def calculate_tp_glides(self):
-        """Calculate height loss and time around all task turnpoints"""
-        if self.vmac <= self.wind_speed:
-            return
-
-        # Calculate glides between consecutive turnpoints
-        glides = [self.calculate_glide(p1['x'], p1['y'], p2['x'], p2['y'])
-                  for  p1, p2 in zip(self.tp_list, self.tp_list[1:])]
+    def update_tp_glides(self):
+        """Re-calculate turnpoint glides if the wind or polar has changed"""
+        if self.tp_glides_dirty and self.vmac > self.wind_speed:
+            self.calculate_tp_glides()
 
-        # Add zeroes for final TP and split into two lists
-        glides.append((0, 0))
-        height_loss, glide_time = map(list, zip(*glides))
+    def calculate_legs(self):
+        """Calculate distance and course of each task leg"""
+        for i in range(1, len(self.tp_list)):
+            x1, y1 = tp_minxy(self.tp_list[i - 1])
+            x2, y2 = tp_minxy(self.tp_list[i])
+            self.leg_distance[i], self.leg_course[i] = calculate_nav(x1, y1,
+                                                                     x2, y2)
 
-        # Calculate cumulative sums
-        for i in range(-1, -len(glides), -1):
-            height_loss[i - 1] += height_loss[i]
-            glide_time[i - 1] += glide_time[i]
-
-        # Add to TP list
-        for tp, tp_height_loss, tp_glide_time in zip(self.tp_list,
-                                                     height_loss, glide_time):
-            tp['height_loss'] = tp_height_loss
-            tp['glide_time'] = tp_glide_time
+    def calculate_tp_glides(self):
+        """Calculate height loss and time around all task turnpoints"""
+        self.tp_glides_dirty = False
+        self.glide_wind_speed = self.wind_speed
+        self.glide_wind_direction = self.wind_direction
+
+        # Glide for each leg and cumulative sums working back from the finish
+        height_loss = glide_time = 0
+        for i in range(len(self.tp_list) - 1, 0, -1):
+            ground_speed = self.calculate_ground_speed(self.vmac,
+                                                       self.leg_course[i])
+            leg_height_loss, leg_time = self.glide_leg(self.leg_distance[i],
+                                                       ground_speed)
+            self.leg_height_loss[i] = leg_height_loss
+            self.leg_glide_time[i] = leg_time
+
+            height_loss += leg_height_loss
+            glide_time += leg_time
+            self.tp_height_loss[i - 1] = height_loss
+            self.tp_glide_time[i - 1] = glide_time
 
     def calculate_glide(self, x1, y1, x2, y2):
         """Return wind corrected glide height loss and time"""
-        dx = x2 - x1
-        dy = y2 - y1
-        dist = math.hypot(dx, dy)
-        course = math.atan2(dx, dy)
+        dist, course = calculate_nav(x1, y1, x2, y2)
 
         # Get wind correct ground speed
         ground_speed = self.calculate_ground_speed(self.vmac, course)
 
-        # Height loss and time
+        return self.glide_leg(dist, ground_speed)
+
+    def glide_leg(self, dist, ground_speed):
+        """Return glide height loss and time for given distance and ground
+           speed"""
         height_loss = dist * self.vmac_sink_rate / ground_speed
         tim = dist / ground_speed
 
         return height_loss, tim
 
-    def calculate_ete(self, x, y, height, tp_list):
-        """Recursively calculate time to complete the task"""
-        if not tp_list:
-            return 0
-
-        # Get distance, bearing and glide to next TP
-        tp = tp_list[0]
-        tpx, tpy = tp_minxy(tp)
-
-        tp_dist, tp_bearing = calculate_nav(x, y, tpx, tpy)
-        g_speed = self.calculate_ground_speed(self.task_air_speed, tp_bearing)
-
-        if height < tp['height_loss']:
-            # If height is less than needed for glide at next TP then recuse
-            # rest of TPs
-            tim = (tp_dist / g_speed) + self.calculate_ete(tpx, tpy, height,
-                                                           tp_list[1:])
-        else:
-            # Calculate fraction of leg at task speed and remainder at glide
-            # speed
-            height_diff = height - tp['height_loss']
-            glide_height_loss, glide_time = self.calculate_glide(x, y, tpx, tpy)
-            height_ratio = height_diff / glide_height_loss
+    def calculate_ete(self, x, y, height, tp_index):
+        """Calculate time to complete the task, via turnpoint tp_index.
+
+           Legs are flown at task speed until there's enough height to glide
+           to the finish. Sets ete_legs with the time and arrival height of
+           each leg"""
+        self.update_tp_glides()
+        self.ete_legs = []
+
+        tim = 0
+        for i in range(tp_index, len(self.tp_list)):
+            tp = self.tp_list[i]
+            if i == tp_index:
+                # First leg is from current position
+                tpx, tpy = tp_minxy(tp)
+                dist, course = calculate_nav(x, y, tpx, tpy)
+            else:
+                dist, course = self.leg_distance[i], self.leg_course[i]
+
+            g_speed = self.calculate_ground_speed(self.task_air_speed,
+                                                  course)
+
+            if height < self.tp_height_loss[i]:
+                # Not enough height to glide from the next TP, so whole leg
+                # at task speed
+                leg_time = dist / g_speed
+                tim += leg_time
+                self.ete_legs.append({'id': tp['id'], 'time': leg_time,
+                                      'height': height})
+                continue
+
+            # Glide for this leg
+            if i == tp_index:
+                glide_height_loss, glide_time = self.calculate_glide(
+                    x, y, tpx, tpy)
+            else:
+                glide_height_loss = self.leg_height_loss[i]
+                glide_time = self.leg_glide_time[i]
 
-            if height_ratio > 1:
+            height_diff = height - self.tp_height_loss[i]
+            if height_diff >= glide_height_loss:
                 # Above glide, so just do glide to finish
-                tim = glide_time + tp['glide_time']
+                leg_time = glide_time
+                height -= glide_height_loss
             else:
                 # Below glide, so calculate part of time at task speed and
                 # part at glide
-                t_dist = tp_dist * (1 - height_ratio)
-                t_time = t_dist / g_speed
-
-                g_time = glide_time * height_ratio
-
-                tim = t_time + g_time + tp['glide_time']
+                height_ratio = height_diff / glide_height_loss
+                leg_time = (dist * (1 - height_ratio) / g_speed +
+                            glide_time * height_ratio)
+                height = self.tp_height_loss[i]
+
+            tim += leg_time
+            self.ete_legs.append({'id': tp['id'], 'time': leg_time,
+                                  'height': height})
+
+            # Glide the remaining legs
+            for j in range(i + 1, len(self.tp_list)):
+                height -= self.leg_height_loss[j]
+                tim += self.leg_glide_time[j]
+                self.ete_legs.append({'id': self.tp_list[j]['id'],
+                                      'time': self.leg_glide_time[j],
+                                      'height': height})
+            break
 
         return tim
 
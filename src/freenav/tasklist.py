@@ -45,6 +45,8 @@ class TaskListStore(gtk.ListStore):
         self.projection = freenav.projection.Lambert(
             proj['parallel1'], proj['parallel2'],
             proj['latitude'], proj['longitude'])
+        self.projection.set_planar_limit()
+        self.projection.set_reverse_cache()
 
         gobject.signal_new("task_changed", TaskListStore,
                            gobject.SIGNAL_RUN_FIRST, gobject.TYPE_NONE, ())
@@ -0,0 +1,89 @@
+import math
+
+import nose.tools
+
+import freenav.airspace
+
+class TestClass:
+    def setup(self):
+        # Square with a semi-circular bite out of the right hand side
+        lines = [{'x1': 1000, 'y1': 1000, 'x2': -1000, 'y2': 1000},
+                 {'x1': -1000, 'y1': 1000, 'x2': -1000, 'y2': -1000},
+                 {'x1': -1000, 'y1': -1000, 'x2': 1000, 'y2': -1000},
+                 {'x1': 1000, 'y1': -1000, 'x2': 1000, 'y2': -500},
+                 {'x1': 1000, 'y1': 500, 'x2': 1000, 'y2': 1000}]
+        arcs = [{'x': 1000, 'y': 0, 'radius': 500,
+                 'start': -math.pi / 2, 'length': -math.pi}]
+        self.polygon = freenav.airspace.AirspacePolygon(lines, arcs, 1)
+
+        circle = [{'x': 0, 'y': 0, 'radius': 5000,
+                   'start': 0, 'length': 2 * math.pi}]
+        self.circle = freenav.airspace.AirspacePolygon([], circle, 10)
+
+    def test_tessellate(self):
+        points = freenav.airspace.tessellate_arc(0, 0, 1000, 0, math.pi, 1)
+        nose.tools.assert_almost_equal(points[0][0], 1000)
+        nose.tools.assert_almost_equal(points[-1][0], -1000)
+
+        # Check chord mid-points are within tolerance of the arc
+        for (x1, y1), (x2, y2) in zip(points, points[1:]):
+            dist = math.hypot((x1 + x2) / 2, (y1 + y2) / 2)
+            nose.tools.assert_true(1000 - dist <= 1)
+
+    def test_contains(self):
+        nose.tools.assert_true(self.polygon.contains(0, 0))
+        nose.tools.assert_true(self.polygon.contains(-900, 900))
+        nose.tools.assert_false(self.polygon.contains(900, 0))
+        nose.tools.assert_true(self.polygon.contains(900, 700))
+        nose.tools.assert_false(self.polygon.contains(2000, 0))
+        nose.tools.assert_false(self.polygon.contains(0, -1001))
+
+    def test_circle(self):
+        nose.tools.assert_true(self.circle.contains(0, 0))
+        nose.tools.assert_true(self.circle.contains(3500, 3500))
+        nose.tools.assert_false(self.circle.contains(3600, 3600))
+        nose.tools.assert_false(self.circle.in_bbox(5100, 0))
+
+    def test_distance(self):
+        nose.tools.assert_almost_equal(
+                self.polygon.boundary_distance(-500, 0), 500)
+
+        # Arc is tessellated to within 1m
+        dist = self.polygon.boundary_distance(100, 0)
+        nose.tools.assert_true(abs(dist - 400) <= 1)
+        nose.tools.assert_almost_equal(self.polygon.bbox_distance(4000, 5000),
+                                       5000)
+
+    def test_intersect(self):
+        t = self.circle.intersect(-10000, 0, 0, 0)
+        nose.tools.assert_almost_equal(t, 0.5, 2)
+        nose.tools.assert_equal(self.circle.intersect(-10000, 0, -6000, 0),
+                                None)
+
+class TestPaths:
+    def test_simplify(self):
+        points = [(n * 100, 0) for n in range(11)]
+        nose.tools.assert_equal(freenav.airspace.simplify(points, 1),
+                                [(0, 0), (1000, 0)])
+
+        points = [(0, 0), (500, 10), (1000, 0), (1500, 200), (2000, 0)]
+        nose.tools.assert_equal(freenav.airspace.simplify(points, 20),
+                                [(0, 0), (1000, 0), (1500, 200), (2000, 0)])
+
+    def test_chain(self):
+        # Square with lines in mixed directions
+        lines = [{'x1': 0, 'y1': 0, 'x2': 1000, 'y2': 0},
+                 {'x1': 1000, 'y1': 1000, 'x2': 1000, 'y2': 0},
+                 {'x1': 1000, 'y1': 1000, 'x2': 0, 'y2': 1000},
+                 {'x1': 0, 'y1': 0, 'x2': 0, 'y2': 1000}]
+        paths = freenav.airspace.boundary_paths(lines, [], 1)
+        nose.tools.assert_equal(paths, [[(0, 0), (1000, 0), (1000, 1000),
+                                         (0, 1000), (0, 0)]])
+
+    def test_circle(self):
+        arcs = [{'x': 0, 'y': 0, 'radius': 10000, 'start': 0,
+                 'length': 2 * math.pi}]
+        fine = freenav.airspace.boundary_paths([], arcs, 1)
+        coarse = freenav.airspace.boundary_paths([], arcs, 100)
+        nose.tools.assert_equal(len(fine), 1)
+        nose.tools.assert_true(len(coarse[0]) < len(fine[0]) / 5)
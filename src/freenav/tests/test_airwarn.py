@@ -0,0 +1,72 @@
+import math
+
+import nose.tools
+
+import freenav.airwarn
+import freenav.freedb
+
+PARALLEL1 = math.radians(49)
+PARALLEL2 = math.radians(55)
+REF_LAT = math.radians(52)
+REF_LON = math.radians(0)
+
+LEVELS = {'FL': 1000, 'ALT': 1000, 'AGL': 1000}
+
+class TestClass:
+    def setup(self):
+        db = freenav.freedb.Freedb(':memory:')
+        db.create(PARALLEL1, PARALLEL2, REF_LAT, REF_LON)
+
+        db.insert_airspace('A1', 'Square', 'SFC', 'FL065',
+                           -1000, -1000, 1000, 1000)
+        db.insert_airspace_line('A1', -1000, -1000, 1000, -1000)
+        db.insert_airspace_line('A1', 1000, -1000, 1000, 1000)
+        db.insert_airspace_line('A1', 1000, 1000, -1000, 1000)
+        db.insert_airspace_line('A1', -1000, 1000, -1000, -1000)
+
+        db.insert_airspace('A2', 'High', 'FL100', 'FL195',
+                           -1000, -1000, 1000, 1000)
+        db.insert_airspace_circle('A2', 0, 0, 1000)
+
+        self.warning = freenav.airwarn.AirspaceWarning(db)
+
+    def test_parse_level(self):
+        nose.tools.assert_equal(freenav.airwarn.parse_level('SFC'), (0, 'AGL'))
+        level, datum = freenav.airwarn.parse_level('FL065')
+        nose.tools.assert_almost_equal(level, 1981.2)
+        nose.tools.assert_equal(datum, 'FL')
+        level, datum = freenav.airwarn.parse_level('3500ALT')
+        nose.tools.assert_almost_equal(level, 1066.8)
+        nose.tools.assert_equal(datum, 'ALT')
+
+    def test_ahead(self):
+        # Heading east towards airspace, 2000m away at 25m/s
+        new = self.warning.update(-3000, 0, math.pi / 2, 25, LEVELS)
+        nose.tools.assert_true(new)
+
+        warnings = self.warning.get_warnings()
+        nose.tools.assert_equal([w['id'] for w in warnings], ['A1'])
+        nose.tools.assert_false(warnings[0]['inside'])
+        nose.tools.assert_almost_equal(warnings[0]['time'], 80)
+
+        # Same warning isn't new
+        new = self.warning.update(-2900, 0, math.pi / 2, 25, LEVELS)
+        nose.tools.assert_false(new)
+
+    def test_away(self):
+        # Heading west, away from airspace
+        self.warning.update(-3000, 0, -math.pi / 2, 25, LEVELS)
+        nose.tools.assert_equal(self.warning.get_warnings(), [])
+
+    def test_inside(self):
+        self.warning.update(-3000, 0, math.pi / 2, 25, LEVELS)
+        self.warning.update(0, 0, math.pi / 2, 25, LEVELS)
+        warnings = self.warning.get_warnings()
+        nose.tools.assert_equal([w['id'] for w in warnings], ['A1'])
+        nose.tools.assert_true(warnings[0]['inside'])
+
+    def test_vertical(self):
+        levels = {'FL': 3000, 'ALT': 3000, 'AGL': 3000}
+        self.warning.update(0, 0, 0, 25, levels)
+        warnings = self.warning.get_warnings()
+        nose.tools.assert_equal([w['id'] for w in warnings], ['A2'])
@@ -0,0 +1,103 @@
+import nose.tools
+
+import freenav.fixfilter
+import freenav.render
+
+class Flight:
+    def __init__(self):
+        self.fixes = []
+        self.updates = []
+
+    def update_fix(self, utc_secs, latitude, longitude, altitude,
+                   ground_speed):
+        self.fixes.append(utc_secs)
+        return latitude * 1000, longitude * 1000
+
+    def update_position(self, utc_secs, *args):
+        self.updates.append(utc_secs)
+
+class Clock:
+    def __init__(self):
+        self.tim = 0.0
+
+    def __call__(self):
+        return self.tim
+
+class TestClass:
+    def setup(self):
+        self.flight = Flight()
+        self.filter = freenav.fixfilter.FixFilter(self.flight, 1.0)
+
+    def update(self, utc_secs, latitude=0, longitude=0):
+        return self.filter.update(utc_secs, latitude, longitude, 0, 0, 0, 0, 1)
+
+    def test_decimate(self):
+        # 5Hz fixes, with some time jitter
+        for n in range(26):
+            self.update(1000 + n * 0.2 + (n % 2) * 0.01)
+
+        nose.tools.assert_equal(len(self.flight.fixes), 26)
+        nose.tools.assert_equal([int(round(t)) for t in self.flight.updates],
+                                range(1000, 1006))
+
+    def test_time_reset(self):
+        self.update(1000)
+        self.update(1000.5)
+        nose.tools.assert_true(self.update(900))
+
+    def test_interpolate(self):
+        nose.tools.assert_equal(self.filter.get_position(1000), None)
+
+        self.update(1000, 0, 0)
+        self.update(1001, 1, 2)
+        self.update(1002, 2, 2)
+
+        nose.tools.assert_equal(self.filter.get_position(1000.5), (500, 1000))
+        nose.tools.assert_equal(self.filter.get_position(1001.5), (1500, 2000))
+
+        # Extrapolation is limited
+        nose.tools.assert_equal(self.filter.get_position(1003), (3000, 2000))
+        nose.tools.assert_equal(self.filter.get_position(1010), (4000, 2000))
+
+class TestDisplay:
+    def setup(self):
+        self.flight = Flight()
+        self.clock = Clock()
+        self.filter = freenav.fixfilter.FixFilter(self.flight, 1.0,
+                                                  clock=self.clock)
+
+        # Scheduler with expose made as soon as it's queued, and the view
+        # position updated at the start of each frame
+        self.render = freenav.render.RenderScheduler(
+                self.expose, frame_rate=10, clock=self.clock,
+                timeout_add=lambda msecs, func: None)
+        self.render.add_frame_func(self.frame_position)
+        self.view_positions = []
+
+    def expose(self):
+        self.render.begin()
+        self.render.end()
+
+    def frame_position(self):
+        self.view_positions.append(self.filter.get_display_position())
+
+    def test_display(self):
+        # 4Hz fixes, received 0.1s late, moving 40m/s
+        for n in range(9):
+            utc = 1000 + n * 0.25
+            self.clock.tim = 5000.1 + n * 0.25
+            self.filter.update(utc, n * 0.01, 0, 0, 0, 0, 0, 1)
+            self.render.request()
+
+        nose.tools.assert_equal(self.flight.updates, [1000, 1001, 1002])
+
+        # View gets positions between the decimated fixes
+        nose.tools.assert_equal(len(self.view_positions), 9)
+        for n, (x, y) in enumerate(self.view_positions):
+            nose.tools.assert_almost_equal(x, n * 10)
+
+        # After the latest fix the position is extrapolated
+        self.clock.tim = 5002.25
+        self.view_positions = []
+        self.render.request()
+        nose.tools.assert_almost_equal(self.view_positions[0][0], 86)
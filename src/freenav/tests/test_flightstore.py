@@ -0,0 +1,62 @@
+import nose.tools
+
+import freenav.flightstore
+
+START_TIME = 1200000000
+
+class TestClass:
+    def setup(self):
+        self.store = freenav.flightstore.FlightStore(max_fixes=1000)
+        for t in range(500):
+            self.store.append(START_TIME + t, t * 20, 0, 500 + t, None,
+                              20.0, 1.5)
+
+    def test_fix(self):
+        fix = self.store.get_fix(10)
+        nose.tools.assert_equal(fix['utc'], START_TIME + 10)
+        nose.tools.assert_equal((fix['x'], fix['y']), (200, 0))
+        nose.tools.assert_equal(fix['gps_alt'], 510)
+        nose.tools.assert_equal(fix['pressure_alt'], None)
+        nose.tools.assert_almost_equal(fix['track'], 1.5, 6)
+
+        # Repeated fixes are ignored
+        self.store.append(START_TIME + 499, 0, 0, 0, 0, 0, 0)
+        nose.tools.assert_equal(len(self.store), 500)
+
+    def test_time_reset(self):
+        # Store restarts if time goes backwards
+        self.store.append(START_TIME, 0, 0, 0, 0, 0, 0)
+        nose.tools.assert_equal(len(self.store), 1)
+        self.store.append(START_TIME + 1, 20, 0, 0, 0, 0, 0)
+        nose.tools.assert_equal(len(self.store), 2)
+        nose.tools.assert_equal(self.store.query_area(-10, -10, 30, 10),
+                                [0, 1])
+
+    def test_time(self):
+        fixes = self.store.get_fixes(START_TIME + 100.5, START_TIME + 110)
+        nose.tools.assert_equal([f['x'] for f in fixes],
+                                range(2020, 2201, 20))
+
+    def test_area(self):
+        indices = self.store.query_area(4990, -10, 6010, 10)
+        nose.tools.assert_equal(indices, range(250, 301))
+
+        indices = self.store.query_area(4990, -10, 6010, 10,
+                                        START_TIME, START_TIME + 260)
+        nose.tools.assert_equal(indices, range(250, 261))
+
+    def test_budget(self):
+        # Ten hours at 10Hz
+        store = freenav.flightstore.FlightStore()
+        for t in range(36000 * 10):
+            store.append(START_TIME + t / 10.0, t, t, 0, 0, 0, 0)
+
+        nose.tools.assert_true(len(store) <= freenav.flightstore.MAX_FIXES)
+        nose.tools.assert_true(len(store) > freenav.flightstore.MAX_FIXES / 2)
+        nose.tools.assert_equal(store.get_fix(-1)['utc'],
+                                START_TIME + 35999.9)
+
+        # Spatial index is consistent after decimation
+        n = len(store) / 2
+        x = store.xs[n]
+        nose.tools.assert_equal(store.query_area(x, x, x, x), [n])
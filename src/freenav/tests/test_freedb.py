@@ -0,0 +1,82 @@
+import math
+
+import nose.tools
+
+import freenav.freedb
+
+PARALLEL1 = math.radians(49)
+PARALLEL2 = math.radians(55)
+REF_LAT = math.radians(52)
+REF_LON = math.radians(0)
+
+class TestClass:
+    def setup(self):
+        self.db = freenav.freedb.Freedb(':memory:')
+        self.db.create(PARALLEL1, PARALLEL2, REF_LAT, REF_LON)
+
+        self.db.insert_airspace('A1', 'Near', 'SFC', 'FL065',
+                                -1000, -1000, 1000, 1000)
+        self.db.insert_airspace('A2', 'Far', 'SFC', 'FL065',
+                                50000, 50000, 60000, 60000)
+        self.db.insert_airspace('A3', 'Big', '3500ALT', 'FL195',
+                                -100000, -100000, 100000, 100000)
+
+    def test_area_airspace(self):
+        airspace = self.db.get_area_airspace(0, 0, 4000, 4000)
+        ids = sorted([a['id'] for a in airspace])
+        nose.tools.assert_equal(ids, ['A1', 'A3'])
+
+        airspace = self.db.get_area_airspace(55000, 55000, 1000, 1000)
+        ids = sorted([a['id'] for a in airspace])
+        nose.tools.assert_equal(ids, ['A2', 'A3'])
+
+    def test_delete_airspace(self):
+        self.db.delete_airspace()
+        airspace = self.db.get_area_airspace(0, 0, 4000, 4000)
+        nose.tools.assert_equal(airspace, [])
+
+    def test_index_migration(self):
+        # Simulate an old database without the R*Tree index
+        self.db.cursor.execute('DROP TABLE Airspace_Index')
+        nose.tools.assert_false(self.db.has_table('Airspace_Index'))
+
+        self.db.create_airspace_index()
+        airspace = self.db.get_area_airspace(55000, 55000, 1000, 1000)
+        ids = sorted([a['id'] for a in airspace])
+        nose.tools.assert_equal(ids, ['A2', 'A3'])
+
+    def test_area_waypoints(self):
+        self.db.insert_waypoint('Inside', 'WP1', 100, 100, 0, 0, 0, '', '')
+        self.db.insert_waypoint('Outside', 'WP2', 3000, 100, 0, 0, 0, '', '')
+        self.db.insert_waypoint('Edge', 'WP3', 2000, 100, 0, 0, 0, '', '')
+
+        wps = self.db.get_area_waypoint_list(0, 0, 4000, 4000)
+        nose.tools.assert_equal([wp['id'] for wp in wps], ['WP1'])
+
+    def test_nearest_landables(self):
+        for n in range(100):
+            self.db.insert_landable('Field', 'F%d' % n,
+                                    (n % 10) * 7000, (n / 10) * 7000, 0)
+
+        landables = self.db.get_nearest_landables(15000, 20000, 3)
+        ids = [l['id'] for l in landables]
+        nose.tools.assert_equal(ids[0], 'F32')
+        nose.tools.assert_equal(sorted(ids[1:]), ['F22', 'F33'])
+
+        # Check against brute force sort
+        landables = self.db.get_landable_list()
+        landables.sort(key=lambda l: (l['x'] + 123456) ** 2 + l['y'] ** 2)
+        nearest = self.db.get_nearest_landables(-123456, 0)
+        nose.tools.assert_equal(nearest[0]['id'], landables[0]['id'])
+
+    def test_airspace_geometry(self):
+        self.db.insert_airspace_line('A1', 0, 0, 10, 10)
+        self.db.insert_airspace_line('A1', 10, 10, 0, 0)
+        self.db.insert_airspace_circle('A2', 55000, 55000, 5000)
+
+        lines, arcs = self.db.get_airspace_geometry(['A1', 'A2', 'A3'])
+        nose.tools.assert_equal(len(lines['A1']), 2)
+        nose.tools.assert_equal(lines['A2'], [])
+        nose.tools.assert_equal(len(arcs['A2']), 1)
+        nose.tools.assert_equal(arcs['A2'][0]['radius'], 5000)
+        nose.tools.assert_equal(arcs['A3'], [])
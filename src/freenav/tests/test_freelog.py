@@ -0,0 +1,58 @@
+import nose.tools
+
+import freenav.freelog
+
+class TestClass:
+    def setup(self):
+        self.log = freenav.freelog.FreeLog(max_duration=100)
+        self.log.start()
+
+    def test_ring(self):
+        for t in range(300):
+            self.log.update(t * 10, 0, 1000 + t)
+
+        nose.tools.assert_equal(len(self.log), 101)
+        nose.tools.assert_equal(self.log[0], (1199, (1990, 0)))
+        nose.tools.assert_equal(self.log[-1], (1299, (2990, 0)))
+        nose.tools.assert_equal(list(self.log)[50], (1249, (2490, 0)))
+
+    def test_interval(self):
+        self.log.update(0, 0, 1000)
+        self.log.update(10, 0, 1000.5)
+        self.log.update(20, 0, 1001)
+        nose.tools.assert_equal(len(self.log), 2)
+
+    def test_stop(self):
+        self.log.update(0, 0, 1000)
+        self.log.stop()
+        self.log.update(10, 0, 1001)
+        nose.tools.assert_equal(len(self.log), 1)
+
+    def test_set_duration(self):
+        for t in range(100):
+            self.log.update(t, 0, 1000 + t)
+
+        self.log.set_duration(20)
+        nose.tools.assert_equal(len(self.log), 21)
+        nose.tools.assert_equal(self.log[-1], (1099, (99, 0)))
+
+        self.log.update(100, 0, 1100)
+        nose.tools.assert_equal(self.log[0], (1080, (80, 0)))
+
+    def test_display_track(self):
+        for t in range(50):
+            self.log.update(t * 10, 0, 1000 + t)
+
+        xs, ys = self.log.get_display_track(35)
+        nose.tools.assert_equal(list(xs), [0, 40, 80, 120, 160, 200, 240,
+                                           280, 320, 360, 400, 440, 480, 490])
+
+        # Incremental update
+        for t in range(50, 121):
+            self.log.update(t * 10, 0, 1000 + t)
+        xs, ys = self.log.get_display_track(35)
+        nose.tools.assert_equal(list(xs), range(200, 1201, 40))
+
+        # Same as decimating the whole log in one pass
+        self.log.display_tolerance = None
+        nose.tools.assert_equal(self.log.get_display_track(35), (xs, ys))
@@ -0,0 +1,122 @@
+import math
+
+import nose.tools
+
+import freenav.freedb
+import freenav.mapcache
+
+PARALLEL1 = math.radians(49)
+PARALLEL2 = math.radians(55)
+REF_LAT = math.radians(52)
+REF_LON = math.radians(0)
+
+# Scale (in metres per pixel) and size of view
+SCALE = 25
+WIDTH = 480 * SCALE
+HEIGHT = 600 * SCALE
+
+class Flight:
+    def __init__(self, db):
+        self.db = db
+
+class TestClass:
+    def setup(self):
+        db = freenav.freedb.Freedb(':memory:')
+        db.create(PARALLEL1, PARALLEL2, REF_LAT, REF_LON)
+
+        for n in range(-50, 50):
+            db.insert_waypoint('WP', 'WP%d' % n, n * 2000, 0, 0, 0, 0, '', '')
+
+        db.insert_airspace('A1', 'Square', 'SFC', 'FL065',
+                           -1000, -1000, 1000, 1000)
+        db.insert_airspace_line('A1', -1000, -1000, 1000, -1000)
+        db.insert_airspace_line('A1', 1000, -1000, 1000, 1000)
+        db.insert_airspace_line('A1', 1000, 1000, -1000, 1000)
+        db.insert_airspace_line('A1', -1000, 1000, -1000, -1000)
+
+        db.insert_airspace('A2', 'Circle', 'SFC', 'FL065',
+                           50000, -5000, 60000, 5000)
+        db.insert_airspace_circle('A2', 55000, 0, 5000)
+
+        self.mapcache = freenav.mapcache.MapCache(Flight(db))
+
+    def test_view(self):
+        self.mapcache.reload(0, 0, WIDTH, HEIGHT, SCALE)
+
+        wp_ids = set([wp['id'] for wp in self.mapcache.wps])
+        for n in range(-3, 4):
+            nose.tools.assert_true(('WP%d' % n) in wp_ids)
+
+        as_ids = [a['id'] for a in self.mapcache.airspace]
+        nose.tools.assert_equal(as_ids, ['A1'])
+        nose.tools.assert_equal(len(self.mapcache.airspace_lines['A1']), 4)
+
+        info = self.mapcache.get_airspace_info(0, 0)
+        nose.tools.assert_equal(info, [('Square', 'SFC', 'FL065')])
+        info = self.mapcache.get_airspace_info(1500, 0)
+        nose.tools.assert_equal(info, [])
+
+    def test_pan(self):
+        self.mapcache.update(0, 0, WIDTH, HEIGHT, SCALE)
+        tiles = set(self.mapcache.tiles)
+
+        # Small movement stays on the same tiles
+        self.mapcache.update(500, 0, WIDTH, HEIGHT, SCALE)
+        nose.tools.assert_equal(set(self.mapcache.tiles), tiles)
+
+        self.mapcache.update(55000, 0, WIDTH, HEIGHT, SCALE)
+        as_ids = [a['id'] for a in self.mapcache.airspace]
+        nose.tools.assert_equal(as_ids, ['A2'])
+        info = self.mapcache.get_airspace_info(55000, 0)
+        nose.tools.assert_equal(info, [('Circle', 'SFC', 'FL065')])
+
+    def test_zoom(self):
+        # Points just inside the circle are inside at every scale
+        for scale in (SCALE, 300):
+            self.mapcache.update(55000, 0, 480 * scale, 600 * scale, scale)
+            for n in range(72):
+                ang = math.radians(n * 5 + 2.5)
+                info = self.mapcache.get_airspace_info(
+                    55000 + 4990 * math.sin(ang), 4990 * math.cos(ang))
+                nose.tools.assert_equal(info, [('Circle', 'SFC', 'FL065')])
+
+    def test_eviction(self):
+        self.mapcache.max_size = 0
+        self.mapcache.update(0, 0, WIDTH, HEIGHT, SCALE)
+        self.mapcache.update(55000, 0, WIDTH, HEIGHT, SCALE)
+
+        # Only the view tiles should remain
+        nose.tools.assert_equal(set(self.mapcache.tiles),
+                                set(self.mapcache.view_keys))
+        nose.tools.assert_equal(self.mapcache.geometry.keys(), ['A2'])
+
+    def test_background_load(self):
+        requests = []
+        class Loader:
+            def request(self, keys):
+                requests.extend(keys)
+        self.mapcache.loader = Loader()
+
+        self.mapcache.update(0, 0, WIDTH, HEIGHT, SCALE)
+        nose.tools.assert_equal(requests, self.mapcache.view_keys)
+        nose.tools.assert_equal(self.mapcache.wps, [])
+
+        # Tiles arrive from the loader
+        db = self.mapcache.flight.db
+        for key in requests:
+            tile = freenav.mapcache.load_tile(db, key)
+            nose.tools.assert_true(self.mapcache.add_loaded_tile(key, tile))
+
+        as_ids = [a['id'] for a in self.mapcache.airspace]
+        nose.tools.assert_equal(as_ids, ['A1'])
+        nose.tools.assert_true(len(self.mapcache.wps) > 0)
+
+    def test_paths(self):
+        self.mapcache.update(55000, 0, WIDTH, HEIGHT, SCALE)
+        paths = self.mapcache.get_paths('A2')
+        nose.tools.assert_equal(len(paths), 1)
+
+        # Fewer points at wide zoom
+        self.mapcache.update(55000, 0, WIDTH * 16, HEIGHT * 16, SCALE * 16)
+        wide_paths = self.mapcache.get_paths('A2')
+        nose.tools.assert_true(len(wide_paths[0]) < len(paths[0]))
@@ -0,0 +1,132 @@
+import calendar
+import math
+import time
+
+import nose.tools
+
+import freenav.nmeaparser
+
+RMC = "$GPRMC,120000,A,5200.000,N,00100.000,W,50.0,90.0,150610,0.0,E*6E\r\n"
+GGA = "$GPGGA,120001,5200.000,N,00100.000,W,1,08,1.0,500,M,0.0,M,,*76\r\n"
+GRMZ = "$PGRMZ,1000,F,2*0B\r\n"
+LXWP0 = ("$LXWP0,Y,119.4,1717.6,0.02,0.02,0.02,0.02,0.02,0.02,,000,107.2"
+         "*5B\r\n")
+
+class TestClass:
+    def setup(self):
+        self.parser = freenav.nmeaparser.NmeaParser()
+
+    def test_sentences(self):
+        signals = self.parser.parse(GGA + RMC + GRMZ)
+        nose.tools.assert_equal(signals, set(['new-position', 'new-pressure']))
+        nose.tools.assert_almost_equal(self.parser.longitude,
+                                       math.radians(-1))
+        nose.tools.assert_almost_equal(self.parser.track, math.radians(90))
+        nose.tools.assert_almost_equal(self.parser.pressure_alt, 304.8)
+
+    def test_air_speed(self):
+        signals = self.parser.parse(LXWP0)
+        nose.tools.assert_equal(signals, set(['new-airspeed']))
+        nose.tools.assert_almost_equal(self.parser.air_speed, 119.4 / 3.6)
+
+        signals = self.parser.parse("$LXWP0,N,,1717.6,0.02,,,,,,,,*69\r\n")
+        nose.tools.assert_equal(signals, set())
+
+    def test_split(self):
+        data = RMC + GGA
+        for n in range(0, len(data), 7):
+            self.parser.parse(data[n:n + 7])
+
+        nose.tools.assert_equal(self.parser.gps_altitude, 500)
+        nose.tools.assert_equal(len(self.parser.buf), 0)
+
+    def test_tail(self):
+        self.parser.parse(GRMZ + GRMZ[:10])
+        nose.tools.assert_equal(str(self.parser.buf), GRMZ[:10])
+
+    def test_burst(self):
+        signals = self.parser.parse(GRMZ * 10000)
+        nose.tools.assert_equal(signals, set(['new-pressure']))
+        nose.tools.assert_equal(len(self.parser.buf), 0)
+
+    def test_checksum_error(self):
+        signals = self.parser.parse(GRMZ.replace('1000', '2000'))
+        nose.tools.assert_equal(signals, set())
+
+    def test_no_fix(self):
+        # Short GGA without a fix is ignored, not malformed
+        self.parser.proc_gga("GPGGA,120001,,,,,0,00".split(','))
+        nose.tools.assert_equal(self.parser.gps_altitude, 0)
+
+    def test_expect(self):
+        calls = []
+        self.parser.expect('PFLAC,S', lambda: calls.append(1))
+        self.parser.parse(GRMZ + '$PFLAC,S,')
+        nose.tools.assert_equal(calls, [1])
+
+class TestDecode:
+    """Checksums and decoding against fixed values. Timings are compared
+       with the original implementation by utils/bench_nmea.py"""
+    def setup(self):
+        self.parser = freenav.nmeaparser.NmeaParser()
+
+    def test_checksum(self):
+        calc_checksum_str = freenav.nmeaparser.calc_checksum_str
+        nose.tools.assert_equal(calc_checksum_str(
+            "GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,545.4,M,46.9,M,,"),
+            "47")
+        nose.tools.assert_equal(calc_checksum_str(
+            "GPRMC,123519,A,4807.038,N,01131.000,E,022.4,084.4,230394,003.1,"
+            "W"), "6A")
+        nose.tools.assert_equal(calc_checksum_str(""), "00")
+
+        # Every length, including those too long for the word at a time
+        # calculation
+        for n in range(1, 200):
+            nose.tools.assert_equal(calc_checksum_str("A" * n),
+                                    ["00", "41"][n % 2])
+
+    def test_gga(self):
+        self.parser.parse("$GPGGA,123519,4807.038,N,01131.000,E,1,08,0.9,"
+                          "545.4,M,46.9,M,,*47\r\n")
+        nose.tools.assert_equal(self.parser.latitude,
+                                math.radians(48 + 7.038 / 60))
+        nose.tools.assert_equal(self.parser.longitude,
+                                math.radians(11 + 31.0 / 60))
+        nose.tools.assert_equal(self.parser.fix_quality, 1)
+        nose.tools.assert_equal(self.parser.num_satellites, 8)
+        nose.tools.assert_equal(self.parser.gps_altitude, 545.4)
+
+    def test_west(self):
+        self.parser.parse(GGA)
+        nose.tools.assert_equal(self.parser.latitude, math.radians(52))
+        nose.tools.assert_equal(self.parser.longitude, -math.radians(1))
+
+class TestTime:
+    def setup(self):
+        self.parser = freenav.nmeaparser.NmeaParser()
+        self.parser.date = "150610"
+
+    def test_time(self):
+        for tim in ("000000", "120000", "123456", "235959"):
+            self.parser.set_time(tim)
+            tm = time.strptime("150610" + tim, "%d%m%y%H%M%S")
+            nose.tools.assert_equal(self.parser.time, calendar.timegm(tm))
+
+    def test_fraction(self):
+        self.parser.set_time("123456.25")
+        tm = time.strptime("150610123456", "%d%m%y%H%M%S")
+        nose.tools.assert_equal(self.parser.time, calendar.timegm(tm) + 0.25)
+
+    def test_rollover(self):
+        self.parser.set_time("235959")
+        tim = self.parser.time
+
+        # GGA after midnight, before RMC with the new date
+        self.parser.set_time("000001")
+        nose.tools.assert_equal(self.parser.time, tim + 2)
+
+        # RMC with the new date
+        self.parser.date = "160610"
+        self.parser.set_time("000002")
+        nose.tools.assert_equal(self.parser.time, tim + 3)
@@ -52,3 +52,68 @@ class TestClass:
             course1 = 2 * math.pi - course1
 
         nose.tools.assert_almost_equal(course, course1)
+
+    def test_forward_reverse_many(self):
+        lats = [LAT1, LAT2, REF_LAT]
+        lons = [LON1, LON2, REF_LON]
+        xs, ys = self.proj.forward_many(lats, lons)
+
+        for lat, lon, x, y in zip(lats, lons, xs, ys):
+            x1, y1 = self.proj.forward(lat, lon)
+            nose.tools.assert_almost_equal(x, x1, places=6)
+            nose.tools.assert_almost_equal(y, y1, places=6)
+
+        lats1, lons1 = self.proj.reverse_many(xs, ys)
+        for lat, lon, lat1, lon1 in zip(lats, lons, lats1, lons1):
+            nose.tools.assert_almost_equal(lat, lat1)
+            nose.tools.assert_almost_equal(lon, lon1)
+
+    def test_many_fallback(self):
+        numpy = freenav.projection.numpy
+        freenav.projection.numpy = None
+        try:
+            xs, ys = self.proj.forward_many([LAT1, LAT2], [LON1, LON2])
+            lats, lons = self.proj.reverse_many(xs, ys)
+        finally:
+            freenav.projection.numpy = numpy
+
+        nose.tools.assert_almost_equal(xs[0], self.proj.forward(LAT1, LON1)[0])
+        nose.tools.assert_almost_equal(lats[1], LAT2)
+        nose.tools.assert_almost_equal(lons[1], LON2)
+
+    def test_planar(self):
+        x1, y1 = self.proj.forward(LAT1, LON1)
+        x2, y2 = x1 + 60000, y1 + 80000
+
+        gc_dist = self.proj.dist(x1, y1, x2, y2)
+        gc_course = self.proj.course(x1, y1, x2, y2)
+
+        self.proj.set_planar_limit()
+        dist = self.proj.dist(x1, y1, x2, y2)
+        nose.tools.assert_not_equal(dist, gc_dist)
+        nose.tools.assert_true(abs(dist - gc_dist) < gc_dist * 0.00003)
+        course = self.proj.course(x1, y1, x2, y2)
+        nose.tools.assert_true(abs(course - gc_course) < math.radians(0.1))
+
+    def test_planar_fallback(self):
+        x1, y1 = self.proj.forward(LAT1, LON1)
+        x2, y2 = self.proj.forward(LAT2, LON2)
+
+        self.proj.set_planar_limit()
+        nose.tools.assert_equal(self.proj.dist(x1, y1, x2, y2),
+                                self.proj.great_circle_dist(x1, y1, x2, y2))
+
+    def test_reverse_cache(self):
+        x, y = [int(p) for p in self.proj.forward(LAT1, LON1)]
+        latlon = self.proj.reverse(x, y)
+
+        self.proj.set_reverse_cache(2)
+        nose.tools.assert_equal(self.proj.reverse(x, y), latlon)
+        nose.tools.assert_equal(self.proj.reverse(x, y), latlon)
+        nose.tools.assert_equal(len(self.proj.reverse_cache), 1)
+
+        # Cache is cleared when full
+        self.proj.reverse(x + 1, y)
+        self.proj.reverse(x + 2, y)
+        nose.tools.assert_equal(len(self.proj.reverse_cache), 1)
+        nose.tools.assert_equal(self.proj.reverse(x, y), latlon)
@@ -0,0 +1,93 @@
+import nose.tools
+
+import freenav.render
+
+class Clock:
+    def __init__(self):
+        self.tim = 1000.0
+
+    def __call__(self):
+        return self.tim
+
+class TestClass:
+    def setup(self):
+        self.clock = Clock()
+        self.timeouts = []
+        self.exposes = []
+        self.render = freenav.render.RenderScheduler(
+                self.queue_draw, frame_rate=5, budget=0.5, clock=self.clock,
+                timeout_add=self.timeout_add)
+
+    def queue_draw(self):
+        self.exposes.append(self.clock())
+
+    def timeout_add(self, msecs, func):
+        self.timeouts.append((self.clock() + msecs / 1000.0, func))
+        return len(self.timeouts)
+
+    def run_timeouts(self):
+        timeouts, self.timeouts = self.timeouts, []
+        for tim, func in timeouts:
+            self.clock.tim = max(self.clock.tim, tim)
+            func()
+
+    def expose(self, duration, layers=()):
+        self.render.begin()
+        for name, tim in layers:
+            self.render.draw(name, self.advance, tim)
+        self.advance(duration - sum([tim for _n, tim in layers]))
+        self.render.end()
+
+    def advance(self, tim):
+        self.clock.tim += tim
+
+    def test_coalesce(self):
+        for n in range(10):
+            self.render.request()
+        nose.tools.assert_equal(len(self.exposes), 1)
+
+        # Requests during the frame are merged into the next one
+        self.expose(0.01)
+        for n in range(10):
+            self.render.request()
+            self.advance(0.01)
+        nose.tools.assert_equal(len(self.exposes), 1)
+        nose.tools.assert_equal(len(self.timeouts), 1)
+
+        self.run_timeouts()
+        nose.tools.assert_equal(len(self.exposes), 2)
+        nose.tools.assert_almost_equal(self.exposes[1] - self.exposes[0],
+                                       0.2, 2)
+
+    def test_frame_rate(self):
+        self.render.request()
+        self.expose(0.01)
+        self.advance(0.25)
+
+        # Past the frame interval, so draw immediately
+        self.render.request()
+        nose.tools.assert_equal(len(self.exposes), 2)
+        nose.tools.assert_equal(self.timeouts, [])
+
+    def test_budget(self):
+        # Slow frame defers the next one to keep within budget
+        self.render.request()
+        self.expose(0.5)
+        self.render.request()
+        nose.tools.assert_equal(len(self.exposes), 1)
+
+        self.run_timeouts()
+        nose.tools.assert_equal(len(self.exposes), 2)
+        nose.tools.assert_almost_equal(self.exposes[1] - self.exposes[0],
+                                       1.0, 2)
+
+    def test_layer_times(self):
+        for n in range(200):
+            self.render.request()
+            self.run_timeouts()
+            self.expose(0.05, [('map', 0.03), ('glider', 0.01)])
+
+        times = self.render.get_layer_times()
+        nose.tools.assert_almost_equal(times['map'], 0.03)
+        nose.tools.assert_almost_equal(times['glider'], 0.01)
+        nose.tools.assert_almost_equal(self.render.frame_time, 0.05)
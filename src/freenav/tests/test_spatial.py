@@ -0,0 +1,32 @@
+import nose.tools
+
+import freenav.spatial
+
+class TestClass:
+    def setup(self):
+        self.grid = freenav.spatial.RectGrid(10)
+
+    def test_place(self):
+        nose.tools.assert_true(self.grid.place(0, 0, 25, 8))
+
+        # Overlaps first rectangle
+        nose.tools.assert_false(self.grid.place(20, 5, 40, 15))
+
+        # Touching is allowed
+        nose.tools.assert_true(self.grid.place(25, 0, 40, 8))
+        nose.tools.assert_true(self.grid.place(-20, -20, -5, -5))
+
+        self.grid.clear()
+        nose.tools.assert_true(self.grid.place(20, 5, 40, 15))
+
+class TestGridIndex:
+    def setup(self):
+        self.index = freenav.spatial.GridIndex(100)
+        for n in range(10):
+            self.index.insert(n * 70, 0, n)
+
+    def test_nearest(self):
+        nose.tools.assert_equal(self.index.nearest(150, 10, 2), [2, 3])
+
+    def test_query(self):
+        nose.tools.assert_equal(self.index.query(0, -1, 200, 1), [1, 2])
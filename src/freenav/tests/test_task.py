@@ -67,3 +67,68 @@ class TestClass:
         glide = self.task.get_glide()
         ld = 50000 * math.sqrt(2) / (1000 - glide['height'])
         nose.tools.assert_almost_equal(ld, 38.3, 1)
+
+    def test_tp_glides(self):
+        self.task.start(0, 0, 1000, 0)
+        self.task.task_position(0, 0, 1000, 0)
+        nose.tools.assert_false(self.task.tp_glides_dirty)
+
+        # Cumulative glides from each TP to the finish
+        h1, t1 = self.task.calculate_glide(0, 0, 50000, 0)
+        h2, t2 = self.task.calculate_glide(50000, 0, 50000, 50000)
+        nose.tools.assert_almost_equal(self.task.tp_height_loss[0], h1 + h2)
+        nose.tools.assert_almost_equal(self.task.tp_glide_time[1], t2)
+        nose.tools.assert_equal(self.task.tp_height_loss[2], 0)
+
+        # Small wind changes don't need re-calculation
+        self.task.set_wind({'speed': 0.3, 'direction': 1.0})
+        nose.tools.assert_false(self.task.tp_glides_dirty)
+        self.task.set_wind({'speed': 5, 'direction': 1.0})
+        nose.tools.assert_true(self.task.tp_glides_dirty)
+
+        self.task.task_position(0, 0, 1000, 0)
+        self.task.set_wind({'speed': 5, 'direction': 1.05})
+        nose.tools.assert_false(self.task.tp_glides_dirty)
+
+    def test_ete(self):
+        self.task.task_air_speed = 25.0
+
+        # No height, all at task speed
+        ete = self.task.calculate_ete(0, 0, 0, 1)
+        nose.tools.assert_almost_equal(ete, 100000 / 25.0)
+
+        legs = self.task.get_ete_legs()
+        nose.tools.assert_equal([leg['id'] for leg in legs], ['TP2', 'TP3'])
+        nose.tools.assert_almost_equal(sum([leg['time'] for leg in legs]),
+                                       ete)
+
+        # Enough height to glide the whole task
+        self.task.calculate_glide_to_finish(0, 0, 10000, 1)
+        ete = self.task.calculate_ete(0, 0, 10000, 1)
+        nose.tools.assert_almost_equal(ete, self.task.get_glide()['ete'])
+        nose.tools.assert_almost_equal(self.task.get_ete_legs()[-1]['height'],
+                                       self.task.get_glide()['height'])
+
+        # Part way, glide starts on the first leg
+        height = self.task.tp_height_loss[1] + 100
+        ete = self.task.calculate_ete(0, 0, height, 1)
+        legs = self.task.get_ete_legs()
+        nose.tools.assert_almost_equal(legs[0]['height'],
+                                       self.task.tp_height_loss[1])
+        nose.tools.assert_almost_equal(legs[1]['height'], 0)
+
+    def test_ete_legs_reset(self):
+        self.task.start(0, 0, 1000, 10000)
+        self.task.task_position(30000, 0, 1000, 11000)
+        nose.tools.assert_equal(self.task.get_ete_legs()[0]['id'], 'TP2')
+
+        # Legs are stale after a turnpoint change
+        self.task.next_turnpoint(30000, 0, 1000, 11010)
+        nose.tools.assert_equal(self.task.get_ete_legs(), [])
+
+        # and when the ETE isn't calculated
+        self.task.task_position(30000, 30000, 1000, 12100)
+        nose.tools.assert_equal(self.task.get_ete_legs()[0]['id'], 'TP3')
+        self.task.set_wind({'speed': 100, 'direction': 0})
+        self.task.task_position(30000, 30000, 1000, 12200)
+        nose.tools.assert_equal(self.task.get_ete_legs(), [])
@@ -0,0 +1,88 @@
+import math
+import random
+
+import nose.tools
+
+import freenav.thermal
+
+START_TIME = 1200000000
+
+def circling(duration, rate, radius=150.0, period=25.0, wind=(5.0, 0.0),
+             climb=2.0):
+    """Return list of x, y, z, utc for a climb circling in a steady wind"""
+    fixes = []
+    for n in range(int(duration * rate)):
+        t = float(n) / rate
+        ang = 2 * math.pi * t / period
+        fixes.append((radius * math.sin(ang) + wind[0] * t,
+                      radius * math.cos(ang) + wind[1] * t,
+                      500 + climb * t,
+                      START_TIME + t))
+    return fixes
+
+class TestClass:
+    def setup(self):
+        self.calc = freenav.thermal.ThermalCalculator()
+
+    def update(self, fixes):
+        """Update calculator with fixes, return number of new winds"""
+        return len([fix for fix in fixes if self.calc.update(*fix)])
+
+    def test_wind(self):
+        # Vectors are at 1Hz, so the turn is sampled every 14.4 degrees
+        self.update(circling(300, 5))
+
+        nose.tools.assert_almost_equal(self.calc.wind_speed, 5.0, 1)
+        nose.tools.assert_almost_equal(self.calc.wind_direction, math.pi / 2,
+                                       delta=0.02)
+        nose.tools.assert_almost_equal(self.calc.thermal_average, 2.0, 1)
+
+    def test_direction(self):
+        # Wind from the north east, blowing to the south west
+        num_winds = self.update(circling(200, 1, wind=(-3.0, -4.0),
+                                         climb=1.5))
+
+        # One wind per turn, less the first
+        nose.tools.assert_true(num_winds >= 6)
+        nose.tools.assert_almost_equal(self.calc.wind_speed, 5.0, 1)
+        nose.tools.assert_almost_equal(self.calc.wind_direction,
+                                       math.atan2(-3, -4), 1)
+        nose.tools.assert_almost_equal(self.calc.thermal_average, 1.5, 1)
+
+    def test_noise(self):
+        # 5Hz fixes with GPS noise
+        random.seed(1)
+        fixes = [(x + random.gauss(0, 0.3), y + random.gauss(0, 0.3), z, utc)
+                 for x, y, z, utc in circling(200, 5)]
+
+        nose.tools.assert_true(self.update(fixes) >= 6)
+        nose.tools.assert_almost_equal(self.calc.wind_speed, 5.0, delta=0.2)
+        nose.tools.assert_almost_equal(self.calc.wind_direction, math.pi / 2,
+                                       delta=0.05)
+
+    def test_thermal_stop(self):
+        self.update(circling(100, 1))
+        nose.tools.assert_true(self.calc.thermal_start is not None)
+
+        # Glide straight out of the thermal
+        x, y, z, utc = circling(100, 1)[-1]
+        self.update([(x + n * 30, y, z - n, utc + n) for n in range(1, 100)])
+        nose.tools.assert_true(self.calc.thermal_start is None)
+
+    def test_reverse(self):
+        self.update(circling(200, 1))
+
+        # Circle the other way in a different wind, earlier drift is
+        # discarded
+        fixes = [(x + 5000, y, z, utc + 400) for x, y, z, utc in
+                 circling(200, 1, period=-20, wind=(0.0, 3.0))]
+        self.update(fixes)
+        nose.tools.assert_almost_equal(self.calc.wind_speed, 3.0, 1)
+        nose.tools.assert_almost_equal(self.calc.wind_direction, 0, 2)
+
+    def test_capacity(self):
+        # Circling too slowly at high rate to fill the store
+        calc = freenav.thermal.ThermalCalculator(capacity=20)
+        for x, y, z, utc in circling(100, 10, period=60):
+            calc.update(x, y, z, utc)
+            nose.tools.assert_true(calc.tail - calc.head <= 20)
@@ -0,0 +1,99 @@
+import math
+
+import nose.tools
+
+import freenav.wind
+
+START_TIME = 1200000000
+
+def circling(duration, rate, period=25.0, tas=35.0, wind=(5.0, -3.0)):
+    """Return list of x, y, utc for circling in a steady wind"""
+    radius = tas * period / (2 * math.pi)
+    fixes = []
+    for n in range(int(duration * rate)):
+        t = float(n) / rate
+        ang = 2 * math.pi * t / period
+        fixes.append((radius * math.sin(ang) + wind[0] * t,
+                      radius * math.cos(ang) + wind[1] * t,
+                      START_TIME + t))
+    return fixes
+
+class TestClass:
+    def setup(self):
+        self.wind = freenav.wind.CircleFitWind()
+
+    def test_wind(self):
+        first = None
+        for x, y, utc in circling(60, 1):
+            if self.wind.update(x, y, 0, utc) and first is None:
+                first = utc - START_TIME
+
+        # Wind is available well before a whole turn
+        nose.tools.assert_true(first < 25)
+
+        nose.tools.assert_almost_equal(self.wind.wind_speed,
+                                       math.hypot(5, 3), 3)
+        nose.tools.assert_almost_equal(self.wind.wind_direction,
+                                       math.atan2(5, -3), 3)
+
+    def test_straight(self):
+        for t in range(60):
+            nose.tools.assert_false(self.wind.update(t * 30, 0, 0, t))
+
+    def test_high_rate(self):
+        for x, y, utc in circling(60, 10):
+            self.wind.update(x, y, 0, utc)
+
+        nose.tools.assert_almost_equal(self.wind.wind_speed,
+                                       math.hypot(5, 3), 3)
+
+    def test_reverse(self):
+        for x, y, utc in circling(40, 1):
+            self.wind.update(x, y, 0, utc)
+
+        # Turn the other way in a new wind
+        for x, y, utc in circling(60, 1, period=-25, wind=(0, 0)):
+            self.wind.update(x + 1000, y, 0, utc + 40)
+        nose.tools.assert_almost_equal(self.wind.wind_speed, 0, 3)
+
+class TestAirSpeed:
+    def setup(self):
+        self.wind = freenav.wind.AirSpeedWind()
+
+    def fly(self, heading, duration, start, tas=30.0, wind=(5.0, -3.0)):
+        """Fly straight at given heading (degrees)"""
+        heading = math.radians(heading)
+        vx = tas * math.sin(heading) + wind[0]
+        vy = tas * math.cos(heading) + wind[1]
+        for t in range(duration):
+            self.wind.update(start + t, math.hypot(vx, vy),
+                             math.atan2(vx, vy) % (2 * math.pi), tas)
+
+    def test_legs(self):
+        self.fly(0, 60, 0)
+
+        # A single leg only fixes the wind to a circle, radius TAS,
+        # around the ground velocity
+        wx = self.wind.wind_speed * math.sin(self.wind.wind_direction)
+        wy = self.wind.wind_speed * math.cos(self.wind.wind_direction)
+        nose.tools.assert_almost_equal(math.hypot(5 - wx, 27 - wy), 30, 1)
+
+        self.fly(120, 60, 100)
+        self.fly(240, 60, 200)
+        wx = self.wind.wind_speed * math.sin(self.wind.wind_direction)
+        wy = self.wind.wind_speed * math.cos(self.wind.wind_direction)
+        nose.tools.assert_true(math.hypot(wx - 5, wy + 3) < 0.5)
+
+    def test_turning(self):
+        self.wind.update(0, 30, 0, 30)
+        nose.tools.assert_false(self.wind.update(1, 30, 0.5, 30))
+
+    def test_set_wind(self):
+        self.wind.set_wind(10, 1.0)
+        nose.tools.assert_equal(self.wind.wind_speed, 10)
+
+        # Flying across the wind, with no wind component along track
+        tas = math.hypot(30, 10)
+        self.wind.update(0, 30, 1.0 + math.pi / 2, tas)
+        self.wind.update(1, 30, 1.0 + math.pi / 2, tas)
+        nose.tools.assert_almost_equal(self.wind.wind_speed, 10, 3)
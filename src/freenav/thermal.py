@@ -1,5 +1,6 @@
 """This module provides thermal/wind calculations for the freenav program"""
 
+import array
 import collections
 import math
 
@@ -7,15 +8,45 @@ MAX_CIRCLE_TIME = 35
 MAX_DRIFT_TIME = 90
 THERMAL_TIMEOUT = 60
 
+# Vectors are calculated over at least this time, in seconds, less an
+# allowance for jitter in fix times. Shorter vectors at high fix rates are
+# mostly position noise
+VECTOR_TIME = 1.0
+TIME_TOLERANCE = 0.05
+
+# Capacity of the vector store, enough for MAX_CIRCLE_TIME with a margin
+VECTOR_CAPACITY = 64
+
 class ThermalCalculator:
-    """Calculate wind drift and total climb average whilst thermalling"""
-    def __init__(self):
+    """Calculate wind drift and total climb average whilst thermalling.
+
+       Vectors are held in a ring buffer of arrays, indexed by a sequence
+       number which is reset with the store. Positions and times are stored
+       relative to the first vector, together with prefix sums so averages
+       and the quarter turn position don't need a walk of the store"""
+    def __init__(self, capacity=VECTOR_CAPACITY):
+        self.capacity = capacity
+        self.xs = array.array('d', [0]) * capacity
+        self.ys = array.array('d', [0]) * capacity
+        self.zs = array.array('d', [0]) * capacity
+        self.tims = array.array('d', [0]) * capacity
+        self.turn_angles = array.array('d', [0]) * capacity
+
+        # Prefix sums, to and including each vector
+        self.x_sums = array.array('d', [0]) * capacity
+        self.y_sums = array.array('d', [0]) * capacity
+        self.tim_sums = array.array('d', [0]) * capacity
+        self.angle_sums = array.array('d', [0]) * capacity
+
         self.drift_store = collections.deque()
-        self.vector_store = collections.deque()
-        self.vector_store.append({'x': 0, 'y': 0, 'dx': 0, 'dy': 0, 'mag': 0,
-                                  'turn_angle': 0, 'tim': 0})
-        self.turn_direction = 0
-        self.turn_angle_acc = 0
+
+        # Previous vector
+        self.x = self.y = 0
+        self.dx = self.dy = 0
+        self.mag = 0
+        self.tim = None
+
+        self.reset_vector_store(0, 0, 0, 0, 0, 0)
 
         self.wind_speed = 0
         self.wind_direction = 0
@@ -24,24 +55,70 @@ class ThermalCalculator:
         self.thermal_update_time = 0
         self.thermal_average = 0
 
-    def reset_vector_store(self, turn_direction, vec):
+    def reset_vector_store(self, turn_direction, x, y, z, tim, turn_angle):
         """Re-initialise vector store and zero-ise angle accumulator"""
-        self.vector_store.clear()
+        self.ref_x = x
+        self.ref_y = y
+        self.ref_tim = tim
+
+        # Store holds sequence numbers head to tail - 1. The base sums are
+        # the prefix sums before the head
+        self.head = self.tail = 0
+        self.base_x = self.base_y = self.base_tim = self.base_angle = 0
         self.turn_angle_acc = 0
 
-        self.vector_store.append(vec)
+        self.append_vector(x, y, z, tim, turn_angle)
         self.turn_direction = turn_direction
 
-    def update_vector_store(self, vec):
+    def append_vector(self, x, y, z, tim, turn_angle):
+        """Add vector to the ring buffer"""
+        if (self.tail - self.head) == self.capacity:
+            self.drop_vector()
+
+        x -= self.ref_x
+        y -= self.ref_y
+        tim -= self.ref_tim
+
+        i = self.tail % self.capacity
+        if self.tail == self.head:
+            prev_x, prev_y = self.base_x, self.base_y
+            prev_tim, prev_angle = self.base_tim, self.base_angle
+        else:
+            j = (self.tail - 1) % self.capacity
+            prev_x, prev_y = self.x_sums[j], self.y_sums[j]
+            prev_tim, prev_angle = self.tim_sums[j], self.angle_sums[j]
+
+        self.xs[i] = x
+        self.ys[i] = y
+        self.zs[i] = z
+        self.tims[i] = tim
+        self.turn_angles[i] = turn_angle
+        self.x_sums[i] = prev_x + x
+        self.y_sums[i] = prev_y + y
+        self.tim_sums[i] = prev_tim + tim
+        self.angle_sums[i] = prev_angle + turn_angle
+        self.tail += 1
+
+    def drop_vector(self):
+        """Drop oldest vector"""
+        i = self.head % self.capacity
+        self.base_x = self.x_sums[i]
+        self.base_y = self.y_sums[i]
+        self.base_tim = self.tim_sums[i]
+        self.base_angle = self.angle_sums[i]
+        self.turn_angle_acc -= self.turn_angles[i]
+        self.head += 1
+
+    def update_vector_store(self, x, y, z, tim, turn_angle):
         """Add new vector and drop any expired data. Return True if data was
            dropped"""
-        self.vector_store.append(vec)
-        self.turn_angle_acc += vec['turn_angle']
+        drop = (self.tail - self.head) == self.capacity
+        self.append_vector(x, y, z, tim, turn_angle)
+        self.turn_angle_acc += turn_angle
 
-        drop = False
-        while (vec['tim'] - self.vector_store[0]['tim']) > MAX_CIRCLE_TIME:
-            dropped_vec = self.vector_store.popleft()
-            self.turn_angle_acc -= dropped_vec['turn_angle']
+        tim -= self.ref_tim
+        while (tim - self.tims[self.head % self.capacity]) > MAX_CIRCLE_TIME:
+            self.drop_vector()
             drop = True
 
         return drop
@@ -52,42 +129,48 @@ class ThermalCalculator:
         while (drift['tim'] - self.drift_store[0]['tim']) > MAX_DRIFT_TIME:
             self.drift_store.popleft()
 
-    def thermal_calc(self, vec):
+    def thermal_calc(self, z, tim):
         """Calculate total thermal average so far"""
-        self.thermal_average = ((vec['z'] - self.thermal_start['z']) /
-                                (vec['tim'] - self.thermal_start['tim']))
-        self.thermal_update_time = vec['tim']
+        self.thermal_average = ((z - self.thermal_start['z']) /
+                                (tim - self.thermal_start['tim']))
+        self.thermal_update_time = tim
+
+    def quarter_turn(self):
+        """Return sequence number of the first vector at which the turn from
+           the start of the store exceeds a quarter turn"""
+        # Binary search on the (non-decreasing) turn angle prefix sums
+        lo, hi = self.head, self.tail - 1
+        limit = math.pi / 2
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.angle_sums[mid % self.capacity] - self.base_angle > limit:
+                hi = mid
+            else:
+                lo = mid + 1
+        return lo
 
-    def thermal_start_stop(self, vec):
+    def thermal_start_stop(self, tim):
         """Test for thermal start and stop"""
         if ((self.thermal_start is None) or
-            (vec['tim'] - self.thermal_update_time) > THERMAL_TIMEOUT):
+            (tim - self.thermal_update_time) > THERMAL_TIMEOUT):
             # Thermal "start" if we've turned 180 degrees
             if (self.turn_angle_acc > math.pi):
                 # Find position quarter of a turn ago and call that the start
-                acc = 0
-                for vec in self.vector_store:
-                    acc += vec['turn_angle']
-                    if acc > (math.pi / 2):
-                        break
-                self.thermal_start = vec
-                self.thermal_update_time = vec['tim']
+                i = self.quarter_turn() % self.capacity
+                start_tim = self.ref_tim + self.tims[i]
+                self.thermal_start = {'z': self.zs[i], 'tim': start_tim}
+                self.thermal_update_time = start_tim
             else:
                 self.thermal_start = None
 
     def wind_calc(self):
         """Calculated wind speed and direction from drift values"""
         # Calculate average position/time of vector store
-        xacc = yacc = tacc = 0
-        for vec in self.vector_store:
-            xacc += vec['x']
-            yacc += vec['y']
-            tacc += vec['tim']
-
-        vlen = len(self.vector_store)
-        xavg = xacc / vlen
-        yavg = yacc / vlen
-        tavg = tacc / vlen
+        i = (self.tail - 1) % self.capacity
+        vlen = self.tail - self.head
+        xavg = self.ref_x + (self.x_sums[i] - self.base_x) / vlen
+        yavg = self.ref_y + (self.y_sums[i] - self.base_y) / vlen
+        tavg = self.ref_tim + (self.tim_sums[i] - self.base_tim) / vlen
 
         # Add new drift measurement
         self.update_drift_store({'x': xavg, 'y': yavg, 'tim': tavg})
@@ -101,63 +184,70 @@ class ThermalCalculator:
             self.wind_speed = math.hypot(dx, dy) / dt
             self.wind_direction = math.atan2(dx, dy)
 
-    def drift_update(self, turn_direction, vec):
+    def drift_update(self, turn_direction, x, y, z, tim, turn_angle):
         """Update the wind drift calculation with a new vector"""
         if turn_direction != self.turn_direction:
             # Turn direction has changed so restart
             self.drift_store.clear()
-            self.reset_vector_store(turn_direction, vec)
+            self.reset_vector_store(turn_direction, x, y, z, tim, turn_angle)
             return
 
         # Add new vector, if we need to drop old vectors then restart drift
         # calculation
-        if self.update_vector_store(vec):
+        if self.update_vector_store(x, y, z, tim, turn_angle):
             self.drift_store.clear()
 
         # If we've accumated 360 degrees of turn then update wind calculation
         if self.turn_angle_acc >= (2 * math.pi):
             self.wind_calc()
-            self.thermal_calc(vec)
-            self.reset_vector_store(turn_direction, vec)
+            self.thermal_calc(z, tim)
+            self.reset_vector_store(turn_direction, x, y, z, tim,
+                                    turn_angle)
             new_wind = True
         else:
             new_wind = False
 
-        self.thermal_start_stop(vec)
+        self.thermal_start_stop(tim)
 
         return new_wind
 
     def update(self, x, y, z, utc_secs):
         """Main update function"""
+        if (self.tim is not None and
+            0 <= (utc_secs - self.tim) < (VECTOR_TIME - TIME_TOLERANCE)):
+            return False
+
         x = float(x)
         y = float(y)
         z = float(z)
 
         # Calculate vector from previous point
-        vec = self.vector_store[-1]
-        dx = x - vec['x']
-        dy = y - vec['y']
+        dx = x - self.x
+        dy = y - self.y
         mag = math.hypot(dx, dy)
 
         # Sign of cross product between this and previous vector gives turn
         # direction
-        cross_prod = (vec['dx'] * dy) - (dx * vec['dy'])
+        cross_prod = (self.dx * dy) - (dx * self.dy)
         if cross_prod > 0:
             turn_direction = 1
         else:
             turn_direction = -1
 
         # Calculate external angle between this and previous vector
-        dot_prod = (vec['dx'] * dx + vec['dy'] * dy)
-        denom = mag * vec['mag']
+        dot_prod = (self.dx * dx + self.dy * dy)
+        denom = mag * self.mag
         if denom == 0:
             turn_angle = 0
         else:
             cos_turn_angle = min(dot_prod / denom, 1.0)
             turn_angle = math.acos(cos_turn_angle)
 
-        new_vec = {'x': x , 'y': y, 'z': z, 'dx': dx, 'dy': dy, 'mag': mag,
-                   'turn_angle': turn_angle, 'tim': utc_secs}
+        self.x, self.y = x, y
+        self.dx, self.dy = dx, dy
+        self.mag = mag
+        self.tim = utc_secs
 
-        new_wind = self.drift_update(turn_direction, new_vec)
+        new_wind = self.drift_update(turn_direction, x, y, z, utc_secs,
+                                     turn_angle)
         return new_wind
@@ -0,0 +1,239 @@
+"""This module provides circle fit and straight flight wind calculations for
+the freenav program.
+
+Whilst circling at constant air speed the ground velocity vectors lie on a
+circle, centred on the wind vector, with radius equal to the air speed. The
+circle is fitted by (algebraic) least squares to the velocities in a sliding
+time window. The sums needed for the fit are updated as velocities enter and
+leave the window, so each fix costs the same however long the window is.
+"""
+
+import collections
+import math
+
+# Length of the sliding window, in seconds
+WINDOW_TIME = 30
+
+# Velocities are calculated over at least this time, in seconds, to limit
+# the effect of position noise at high fix rates
+VELOCITY_TIME = 1.0
+
+# Minimum number of velocities, and total turn, for a fit
+MIN_POINTS = 8
+MIN_TURN = 1.5 * math.pi
+
+# Reject fits with RMS error (m/s) larger than this
+MAX_RMS_ERROR = 2.0
+
+# Straight flight is slower turning than this, in radians per second
+MAX_TURN_RATE = math.radians(4)
+
+# Minimum ground speed for straight flight wind, in m/s
+MIN_GROUND_SPEED = 10
+
+# Variances of the starting wind components and of air speed, in (m/s)^2,
+# and wind process noise in (m/s)^2 per second
+WIND_VARIANCE = 9.0
+AIR_SPEED_VARIANCE = 1.0
+WIND_PROCESS_NOISE = 0.01
+
+class CircleFitWind:
+    """Wind from least squares circle fit to ground velocity vectors. Has
+       the same update interface as thermal.ThermalCalculator"""
+    def __init__(self, window_time=WINDOW_TIME):
+        """Class initialisation"""
+        self.window_time = window_time
+        self.velocities = collections.deque()
+
+        # Recent fixes, and previous velocity
+        self.fixes = collections.deque()
+        self.vx = None
+        self.vy = None
+
+        self.clear_sums()
+
+        self.wind_speed = 0
+        self.wind_direction = 0
+        self.air_speed = 0
+
+    def clear_sums(self):
+        """Zero the least squares sums"""
+        self.n = 0
+        self.sx = self.sy = self.sz = 0.0
+        self.sxx = self.syy = self.sxy = 0.0
+        self.sxz = self.syz = self.szz = 0.0
+        self.turn = 0.0
+
+    def add_sums(self, vx, vy, turn, sign):
+        """Add (sign=1) or remove (sign=-1) a velocity from the sums"""
+        vz = vx * vx + vy * vy
+        self.n += sign
+        self.sx += sign * vx
+        self.sy += sign * vy
+        self.sz += sign * vz
+        self.sxx += sign * vx * vx
+        self.syy += sign * vy * vy
+        self.sxy += sign * vx * vy
+        self.sxz += sign * vx * vz
+        self.syz += sign * vy * vz
+        self.szz += sign * vz * vz
+        self.turn += sign * turn
+
+    def update(self, x, y, z, utc_secs):
+        """Add a new fix. Return True if there's a new wind value"""
+        x = float(x)
+        y = float(y)
+
+        if self.fixes and utc_secs <= self.fixes[-1][2]:
+            return False
+        self.fixes.append((x, y, utc_secs))
+
+        # Velocity from the latest fix at least VELOCITY_TIME ago
+        while (len(self.fixes) > 2 and
+               (utc_secs - self.fixes[1][2]) >= VELOCITY_TIME):
+            self.fixes.popleft()
+        x0, y0, tim0 = self.fixes[0]
+        dt = utc_secs - tim0
+        if dt < VELOCITY_TIME:
+            return False
+
+        vx = (x - x0) / dt
+        vy = (y - y0) / dt
+        tim = utc_secs - dt / 2
+
+        # Signed turn from the previous velocity
+        if self.vx is None:
+            turn = 0.0
+        else:
+            turn = math.atan2(self.vx * vy - self.vy * vx,
+                              self.vx * vx + self.vy * vy)
+        self.vx, self.vy = vx, vy
+
+        self.velocities.append((tim, vx, vy, turn))
+        self.add_sums(vx, vy, turn, 1)
+
+        while (tim - self.velocities[0][0]) > self.window_time:
+            _tim, vx0, vy0, turn0 = self.velocities.popleft()
+            self.add_sums(vx0, vy0, turn0, -1)
+
+        if self.n < MIN_POINTS or abs(self.turn) < MIN_TURN:
+            return False
+
+        return self.fit()
+
+    def fit(self):
+        """Solve for the circle, return True if it's a good fit"""
+        # Normal equations for vx^2 + vy^2 + D.vx + E.vy + F = 0
+        a11, a12, a13 = self.sxx, self.sxy, self.sx
+        a22, a23 = self.syy, self.sy
+        a33 = float(self.n)
+        b1, b2, b3 = -self.sxz, -self.syz, -self.sz
+
+        det = (a11 * (a22 * a33 - a23 * a23) -
+               a12 * (a12 * a33 - a23 * a13) +
+               a13 * (a12 * a23 - a22 * a13))
+        if det == 0:
+            return False
+
+        d = (b1 * (a22 * a33 - a23 * a23) -
+             a12 * (b2 * a33 - a23 * b3) +
+             a13 * (b2 * a23 - a22 * b3)) / det
+        e = (a11 * (b2 * a33 - a23 * b3) -
+             b1 * (a12 * a33 - a23 * a13) +
+             a13 * (a12 * b3 - b2 * a13)) / det
+        f = (a11 * (a22 * b3 - b2 * a23) -
+             a12 * (a12 * b3 - b2 * a13) +
+             b1 * (a12 * a23 - a22 * a13)) / det
+
+        wx = -d / 2
+        wy = -e / 2
+        r2 = wx * wx + wy * wy - f
+        if r2 <= 0:
+            return False
+
+        # Mean squared algebraic error, divided by (2r)^2 to approximate the
+        # distance error
+        sse = (self.szz + d * d * self.sxx + e * e * self.syy +
+               f * f * self.n + 2 * d * self.sxz + 2 * e * self.syz +
+               2 * f * self.sz + 2 * d * e * self.sxy + 2 * d * f * self.sx +
+               2 * e * f * self.sy)
+        rms_error = math.sqrt(max(sse, 0) / self.n / (4 * r2))
+        if rms_error > MAX_RMS_ERROR:
+            return False
+
+        self.wind_speed = math.hypot(wx, wy)
+        self.wind_direction = math.atan2(wx, wy)
+        self.air_speed = math.sqrt(r2)
+        return True
+
+class AirSpeedWind:
+    """Wind from ground speed and track, and air speed, in straight flight.
+
+       Air speed is the length of the ground velocity less the wind, which
+       is estimated with an extended Kalman filter starting from the last
+       circling wind. On a single track only the wind component along track
+       is observed, the cross track component changes once the track does"""
+    def __init__(self):
+        """Class initialisation"""
+        self.prev_track = None
+        self.prev_tim = None
+
+        self.wind_speed = 0
+        self.wind_direction = 0
+        self.set_wind(0, 0)
+
+    def set_wind(self, speed, direction):
+        """Restart the estimate from the given wind"""
+        self.wx = speed * math.sin(direction)
+        self.wy = speed * math.cos(direction)
+        self.cov = [WIND_VARIANCE, 0.0, WIND_VARIANCE]
+
+        self.wind_speed = speed
+        self.wind_direction = direction
+
+    def update(self, utc_secs, ground_speed, track, air_speed):
+        """Add a new fix. Return True if there's a new wind value"""
+        prev_track, prev_tim = self.prev_track, self.prev_tim
+        self.prev_track, self.prev_tim = track, utc_secs
+
+        if (prev_tim is None or utc_secs <= prev_tim or
+            ground_speed < MIN_GROUND_SPEED):
+            return False
+
+        # Only use straight flight
+        dt = utc_secs - prev_tim
+        turn = (track - prev_track + math.pi) % (2 * math.pi) - math.pi
+        if abs(turn) / dt > MAX_TURN_RATE:
+            return False
+
+        # Predicted air velocity
+        ax = ground_speed * math.sin(track) - self.wx
+        ay = ground_speed * math.cos(track) - self.wy
+        pred = math.hypot(ax, ay)
+        if pred == 0:
+            return False
+
+        # Prediction, wind is a random walk. Covariance is symmetric so
+        # just store pxx, pxy, pyy
+        pxx, pxy, pyy = self.cov
+        pxx += WIND_PROCESS_NOISE * dt
+        pyy += WIND_PROCESS_NOISE * dt
+
+        # Correction, measurement gradient with respect to the wind is minus
+        # the unit air velocity
+        hx = -ax / pred
+        hy = -ay / pred
+        phx = pxx * hx + pxy * hy
+        phy = pxy * hx + pyy * hy
+        s = hx * phx + hy * phy + AIR_SPEED_VARIANCE
+        kx = phx / s
+        ky = phy / s
+
+        err = air_speed - pred
+        self.wx += kx * err
+        self.wy += ky * err
+        self.cov = [pxx - kx * phx, pxy - kx * phy, pyy - ky * phy]
+
+        self.wind_speed = math.hypot(self.wx, self.wy)
+        self.wind_direction = math.atan2(self.wx, self.wy)
+        return True
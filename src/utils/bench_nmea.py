@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+"""Measure NMEA parser throughput in sentences per second, and compare
+checksum and GGA decoding with the original implementation"""
+
+import math
+import optparse
+import time
+
+import freenav.nmeaparser
+
+# Typical one second burst from a FLARM
+SENTENCES = [
+    "$GPRMC,120000,A,5200.000,N,00100.000,W,50.0,90.0,150610,0.0,E",
+    "$GPGGA,120000,5200.000,N,00100.000,W,1,08,1.0,500,M,0.0,M,,",
+    "$PGRMZ,1000,F,2",
+    "$PFLAU,2,1,2,1,0,,0,,",
+    "$PFLAA,0,-1234,1234,220,2,DD8F12,180,,30,-1.4,1"]
+
+def make_data(num):
+    """Generate num sentences of NMEA data"""
+    lines = []
+    for n in range(num):
+        body = SENTENCES[n % len(SENTENCES)][1:]
+        lines.append("$%s*%s\r\n" %
+                     (body, freenav.nmeaparser.calc_checksum_str(body)))
+    return ''.join(lines)
+
+def legacy_checksum_str(data_str):
+    """Character at a time checksum, as originally implemented"""
+    csum = 0
+    for c in data_str:
+        csum = csum ^ ord(c)
+    return "%02X" % csum
+
+def legacy_decode_gga(body):
+    """Decode GGA sentence body, as originally implemented"""
+    fields = body.split(',')
+    lat = fields[2]
+    latitude = math.radians(int(lat[:2]) + float(lat[2:]) / 60)
+    lon = fields[4]
+    longitude = math.radians(int(lon[:3]) + float(lon[3:]) / 60)
+    if fields[5] == 'W':
+        longitude = -longitude
+
+    return (latitude, longitude, int(fields[6]), int(fields[7]),
+            float(fields[9]))
+
+def decode_gga(body):
+    """Decode GGA sentence body"""
+    _tim, lat, lon, ew, quality, num_sats, alt = \
+            freenav.nmeaparser.GGA_FIELDS(body.split(','))
+    return (freenav.nmeaparser.decode_lat(lat),
+            freenav.nmeaparser.decode_lon(lon, ew),
+            freenav.nmeaparser.SMALL_INTS[quality],
+            freenav.nmeaparser.SMALL_INTS[num_sats], float(alt))
+
+def time_func(func, args, repeat=5):
+    """Return best time per call of func over all args"""
+    times = []
+    for n in range(repeat):
+        tim = time.time()
+        for arg in args:
+            func(arg)
+        times.append(time.time() - tim)
+    return min(times) / len(args)
+
+def compare_legacy(num):
+    """Print per sentence times of the original and current checksum and
+       GGA decoding"""
+    bodies = []
+    for n in range(num):
+        bodies.append("GPGGA,12%04d,52%02d.%03d,N,00%d%02d.%03d,W,1,%02d,1.0,"
+                      "%d,M,0.0,M,," % (n % 10000, n % 60, n % 1000, n % 10,
+                                        (n * 3) % 60, (n * 11) % 1000, n % 13,
+                                        n % 1000))
+
+    for name, legacy_func, func in (
+            ('checksum', legacy_checksum_str,
+             freenav.nmeaparser.calc_checksum_str),
+            ('checksum+gga',
+             lambda b: (legacy_checksum_str(b), legacy_decode_gga(b)),
+             lambda b: (freenav.nmeaparser.calc_checksum_str(b),
+                        decode_gga(b)))):
+        legacy_time = time_func(legacy_func, bodies)
+        new_time = time_func(func, bodies)
+        print "%-12s legacy %.2fus, new %.2fus, speedup %.1f" % (
+            name, legacy_time * 1e6, new_time * 1e6, legacy_time / new_time)
+
+def main():
+    parser = optparse.OptionParser("usage: %prog [options] [nmea_log]")
+    parser.add_option('-n', '--num', type='int', default=100000,
+                      help='Number of generated sentences')
+    parser.add_option('-c', '--chunk', type='int', default=1024,
+                      help='Size of data chunks passed to the parser')
+    parser.add_option('-l', '--legacy', action='store_true', default=False,
+                      help='Compare with original checksum and GGA decoding')
+    (options, args) = parser.parse_args()
+
+    if options.legacy:
+        compare_legacy(min(options.num, 10000))
+        return
+
+    if args:
+        data = open(args[0]).read()
+    else:
+        data = make_data(options.num)
+    num_sentences = data.count("\r\n")
+
+    nmea_parser = freenav.nmeaparser.NmeaParser()
+    tim = time.time()
+    if options.chunk:
+        for n in range(0, len(data), options.chunk):
+            nmea_parser.parse(data[n:n + options.chunk])
+    else:
+        nmea_parser.parse(data)
+    tim = time.time() - tim
+
+    print "%d sentences in %.2fs, %d sentences/s" % (
+        num_sentences, tim, num_sentences / tim)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""Compare speed and accuracy of planar and great circle distance and
+course calculations over the UK projection"""
+
+import math
+import optparse
+import random
+import time
+
+import freenav.projection
+
+from make_db import PARALLEL1, PARALLEL2, REF_LAT, REF_LON
+
+# Area covered by the projection, in degrees
+LAT_RANGE = (49.5, 59.0)
+LON_RANGE = (-7.0, 2.0)
+
+DISTANCES = [10000, 50000, 100000, 150000, 200000, 300000, 500000]
+
+def make_legs(proj, dist, num):
+    """Generate random legs of given projected length"""
+    legs = []
+    for n in range(num):
+        lat = math.radians(random.uniform(*LAT_RANGE))
+        lon = math.radians(random.uniform(*LON_RANGE))
+        x1, y1 = proj.forward(lat, lon)
+
+        ang = random.uniform(0, 2 * math.pi)
+        legs.append((x1, y1,
+                     x1 + dist * math.sin(ang), y1 + dist * math.cos(ang)))
+    return legs
+
+def time_calc(func, legs):
+    """Return time, in microseconds, per call of func"""
+    tim = time.time()
+    for leg in legs:
+        func(*leg)
+    return (time.time() - tim) * 1e6 / len(legs)
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('-n', '--num', type='int', default=10000,
+                      help='Number of legs for each distance')
+    (options, args) = parser.parse_args()
+
+    random.seed(0)
+    proj = freenav.projection.Lambert(PARALLEL1, PARALLEL2, REF_LAT, REF_LON)
+
+    print "%8s %10s %10s %10s %10s %10s %10s" % (
+        "Dist(km)", "Dist err%", "Course err", "GC dist", "Planar", "GC crs",
+        "Planar")
+    for dist in DISTANCES:
+        legs = make_legs(proj, dist, options.num)
+
+        dist_err = course_err = 0
+        for leg in legs:
+            gc_dist = proj.great_circle_dist(*leg)
+            dist_err = max(dist_err,
+                           abs(proj.planar_dist(*leg) - gc_dist) / gc_dist)
+
+            err = (proj.planar_course(*leg) - proj.great_circle_course(*leg))
+            err = abs((err + math.pi) % (2 * math.pi) - math.pi)
+            course_err = max(course_err, err)
+
+        print "%8d %10.5f %10.4f %10.2f %10.2f %10.2f %10.2f" % (
+            dist / 1000, dist_err * 100, math.degrees(course_err),
+            time_calc(proj.great_circle_dist, legs),
+            time_calc(proj.planar_dist, legs),
+            time_calc(proj.great_circle_course, legs),
+            time_calc(proj.planar_course, legs))
+
+    print
+    print "Errors are maxima, times in microseconds per call. Planar",
+    print "calculations are used up to %d km" % (
+        freenav.projection.PLANAR_MAX_DIST / 1000)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""Compare thermal drift and circle fit wind calculations on IGC logs"""
+
+import bisect
+import calendar
+import math
+import optparse
+import random
+import time
+
+import freenav.projection
+import freenav.replay
+import freenav.thermal
+import freenav.wind
+
+from make_db import PARALLEL1, PARALLEL2, REF_LAT, REF_LON
+
+ENGINES = [('drift', freenav.thermal.ThermalCalculator),
+           ('circle', freenav.wind.CircleFitWind)]
+
+def read_igc(filename):
+    """Return list of x, y, altitude, utc fixes from IGC file"""
+    proj = freenav.projection.Lambert(PARALLEL1, PARALLEL2, REF_LAT, REF_LON)
+
+    fixes = [freenav.replay.igc_parse(rec) for rec in open(filename)
+             if rec[0] == 'B']
+    xs, ys = proj.forward_many([fix[1] for fix in fixes],
+                               [fix[2] for fix in fixes])
+
+    # Allow for flights past midnight
+    utcs = []
+    day = 0
+    for dt, _lat, _lon, _gps_alt, _pressure_alt in fixes:
+        utc = calendar.timegm(dt.timetuple()) + day
+        if utcs and utc < utcs[-1]:
+            day += 86400
+            utc += 86400
+        utcs.append(utc)
+
+    return [(x, y, fix[3], utc) for x, y, fix, utc in zip(xs, ys, fixes, utcs)]
+
+def make_flight(rate, noise):
+    """Generate flight with alternating cruise and climbs, in a 5m/s wind"""
+    fixes = []
+    x = y = z = 0.0
+    tas = 30.0
+    wind = (4.0, 3.0)
+    heading = 0.0
+    for n in range(int(3600 * rate)):
+        t = float(n) / rate
+        circling = (t % 600) > 300
+        if circling:
+            heading += 2 * math.pi / 25 / rate
+            z += 2.0 / rate
+        else:
+            z -= 1.0 / rate
+
+        x += (tas * math.sin(heading) + wind[0]) / rate
+        y += (tas * math.cos(heading) + wind[1]) / rate
+        fixes.append((x + random.gauss(0, noise), y + random.gauss(0, noise),
+                      z, t))
+    return fixes
+
+def run_engine(engine, fixes):
+    """Run engine over fixes, return list of (utc, wx, wy) wind estimates
+       and time per fix"""
+    winds = []
+    tim = time.time()
+    for x, y, z, utc in fixes:
+        if engine.update(x, y, z, utc):
+            winds.append((utc,
+                          engine.wind_speed * math.sin(engine.wind_direction),
+                          engine.wind_speed * math.cos(engine.wind_direction)))
+    tim = time.time() - tim
+    return winds, tim / len(fixes)
+
+def compare(winds1, winds2):
+    """Return mean and max vector difference between each of winds1 and the
+       latest of winds2"""
+    times2 = [w[0] for w in winds2]
+    diffs = []
+    for utc, wx, wy in winds1:
+        n = bisect.bisect_right(times2, utc) - 1
+        if n >= 0:
+            diffs.append(math.hypot(wx - winds2[n][1], wy - winds2[n][2]))
+
+    if not diffs:
+        return None, None
+    return sum(diffs) / len(diffs), max(diffs)
+
+def main():
+    parser = optparse.OptionParser("usage: %prog [options] [igc_file...]")
+    parser.add_option('-r', '--rate', type='float', default=1.0,
+                      help='Fix rate of generated flight')
+    parser.add_option('-n', '--noise', type='float', default=1.0,
+                      help='Position noise (m) of generated flight')
+    (options, args) = parser.parse_args()
+
+    if args:
+        flights = [(f, read_igc(f)) for f in args]
+    else:
+        flights = [('generated', make_flight(options.rate, options.noise))]
+
+    for name, fixes in flights:
+        print "%s: %d fixes" % (name, len(fixes))
+        results = {}
+        for engine_name, engine_class in ENGINES:
+            winds, tim = run_engine(engine_class(), fixes)
+            results[engine_name] = winds
+
+            if winds:
+                latency = "%.0fs" % (winds[0][0] - fixes[0][3])
+            else:
+                latency = "-"
+            print "  %-6s %5d estimates, first after %s, %.1fus/fix" % (
+                engine_name, len(winds), latency, tim * 1e6)
+
+        mean_diff, max_diff = compare(results['drift'], results['circle'])
+        if mean_diff is not None:
+            print "  difference mean %.2fm/s, max %.2fm/s" % (mean_diff,
+                                                             max_diff)
+
+if __name__ == '__main__':
+    main()
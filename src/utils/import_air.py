@@ -31,14 +31,44 @@ class AirProcessor():
         self.projection = projection
         self.id = 0
 
-    def add_segments(self, id, x, y, airlist):
+    def project_boundary(self, airlist):
+        """Project all the positions in a boundary in one go. Returns a list
+           of (x, y) for each point or circle centre, and a pair of (x, y)
+           for the end and centre of each arc"""
+        lats = []
+        lons = []
+        for p in airlist:
+            if isinstance(p, tnp.Arc):
+                lats.extend((p.end.lat.radians(), p.centre.lat.radians()))
+                lons.extend((p.end.lon.radians(), p.centre.lon.radians()))
+            elif isinstance(p, tnp.Circle):
+                lats.append(p.centre.lat.radians())
+                lons.append(p.centre.lon.radians())
+            else:
+                lats.append(p.lat.radians())
+                lons.append(p.lon.radians())
+
+        xs, ys = self.projection.forward_many(lats, lons)
+        xy = zip(xs, ys)
+
+        positions = []
+        n = 0
+        for p in airlist:
+            if isinstance(p, tnp.Arc):
+                positions.append((xy[n], xy[n + 1]))
+                n += 2
+            else:
+                positions.append(xy[n])
+                n += 1
+        return positions
+
+    def add_segments(self, id, x, y, airlist, positions):
         if airlist:
             p = airlist[0]
 
             if isinstance(p, tnp.Point):
                 # Insert an airspace line
-                lat, lon = p.lat.radians(), p.lon.radians()
-                x1, y1 = self.projection.forward(lat, lon)
+                x1, y1 = positions[0]
 
                 self.db.insert_airspace_line(id, x1, y1, x, y)
 
@@ -47,11 +77,7 @@ class AirProcessor():
 
             elif isinstance(p, tnp.Arc):
                 # Insert an airspace arc
-                lat, lon = p.end.lat.radians(), p.end.lon.radians()
-                x1, y1 = self.projection.forward(lat, lon)
-
-                lat, lon = p.centre.lat.radians(), p.centre.lon.radians()
-                xc, yc, = self.projection.forward(lat, lon)
+                (x1, y1), (xc, yc) = positions[0]
 
                 radius = p.radius * NM_TO_M
                 start = math.atan2(y - yc, x - xc)
@@ -71,7 +97,7 @@ class AirProcessor():
                 extent = xc - radius, yc - radius, xc + radius, yc + radius
 
             # Recursively add remaining segments
-            mm = self.add_segments(id, x1, y1, airlist[1:])
+            mm = self.add_segments(id, x1, y1, airlist[1:], positions[1:])
 
             return (min(extent[0], mm[0]),
                     min(extent[1], mm[1]),
@@ -87,13 +113,14 @@ class AirProcessor():
             self.id += 1
             id = 'A'+str(self.id)
 
+            positions = self.project_boundary(airlist)
+
             # Get the first part of the boundary
             p = airlist[0]
             if isinstance(p, tnp.Circle):
                 # Circle is a special case - it defines the boundary in a
                 # single segment
-                x, y = self.projection.forward(p.centre.lat.radians(),
-                                               p.centre.lon.radians())
+                x, y = positions[0]
                 radius = p.radius * NM_TO_M
                 self.db.insert_airspace_circle(id, x, y, radius)
 
@@ -102,8 +129,9 @@ class AirProcessor():
 
             else:
                 # If it isn't a circle it must be a point
-                x, y = self.projection.forward(p.lat.radians(), p.lon.radians())
-                extent = self.add_segments(id, x, y, airlist[1:])
+                x, y = positions[0]
+                extent = self.add_segments(id, x, y, airlist[1:],
+                                           positions[1:])
 
             self.db.insert_airspace(id, name, str(base), str(tops), *extent)
 
@@ -18,8 +18,15 @@ def import_turnpoints(db, csv_file, projection):
     reader = csv.reader(csv_file, delimiter='\t')
     header = reader.next()
 
+    wps = []
+    lats = []
+    lons = []
     for fields in reader:
         wp = dict(zip(header, fields))
+        control_p = wp['Control P']
+        if not set(control_p).intersection("ADHLYyZz"):
+            continue
+
         lat = float(wp['Latitude [degrees]']) +\
             float(wp['Latitude [decimal minutes]']) / 60
         lon = float(wp['Longitude [degrees]']) +\
@@ -27,15 +34,22 @@ def import_turnpoints(db, csv_file, projection):
         if wp['East/West'] == 'W':
             lon = -lon
 
-        x, y = projection.forward(math.radians(lat), math.radians(lon))
+        wps.append(wp)
+        lats.append(math.radians(lat))
+        lons.append(math.radians(lon))
 
-        control_p = wp['Control P']
-        if set(control_p).intersection("ADHLYyZz"):
-            db.insert_landable(wp['Name'], wp['ID'], int(x), int(y),
-                               int(int(wp['Elevation [Feet]']) * FT_TO_M))
+    xs, ys = projection.forward_many(lats, lons)
+
+    for wp, x, y in zip(wps, xs, ys):
+        db.insert_landable(wp['Name'], wp['ID'], int(x), int(y),
+                           int(int(wp['Elevation [Feet]']) * FT_TO_M))
 
 def import_landables(db, landouts_file, projection):
-    for landout in yaml.load(landouts_file):
+    landouts = yaml.load(landouts_file)
+
+    lats = []
+    lons = []
+    for landout in landouts:
         lat_str = landout['latitude']
         lon_str = landout['longitude']
 
@@ -53,8 +67,12 @@ def import_landables(db, landouts_file, projection):
         if lon_str[3] == 'W':
             lon = -lon
 
-        x, y = projection.forward(math.radians(lat), math.radians(lon))
+        lats.append(math.radians(lat))
+        lons.append(math.radians(lon))
+
+    xs, ys = projection.forward_many(lats, lons)
 
+    for landout, x, y in zip(landouts, xs, ys):
         db.insert_landable(landout['name'], landout['id'], int(x), int(y),
                           int(landout['elevation'] * FT_TO_M))
 
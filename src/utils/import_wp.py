@@ -16,6 +16,9 @@ def importwp(db, csv_file, projection):
     reader = csv.reader(csv_file, delimiter='\t')
     header = reader.next()
 
+    wps = []
+    lats = []
+    lons = []
     for fields in reader:
         wp = dict(zip(header, fields))
         lat = math.radians(float(wp['Latitude [degrees]']) +
@@ -25,8 +28,14 @@ def importwp(db, csv_file, projection):
         if wp['East/West'] == 'W':
             lon = -lon
 
-        x, y = projection.forward(lat, lon)
+        wps.append(wp)
+        lats.append(lat)
+        lons.append(lon)
 
+    # Project all the positions in one go
+    xs, ys = projection.forward_many(lats, lons)
+
+    for wp, lat, lon, x, y in zip(wps, lats, lons, xs, ys):
         control_p = wp['Control P']
         if set(control_p).intersection("ADHLYyZz"):
             landable_flag = 1